@@ -0,0 +1,142 @@
+# ============================================
+# actas.py  — NUEVO en v3
+# Motor de la hoja Actas, compartido por los dos
+# motores de importación.
+#   split_codes()  separa una celda de códigos con
+#                  expresiones precompiladas (antes: un
+#                  bucle por separador y recorridos por
+#                  carácter en cada celda)
+#   parse_codes()  split_codes() + la misma validación de
+#                  antes (3 a 50 caracteres, algún
+#                  alfanumérico, sin < > " ' \ / ? *) en
+#                  una sola regex
+#   ActaLedger     deduplica los códigos de cada lote:
+#                  cada código una sola vez, con su último
+#                  operador (igual que el upsert fila a
+#                  fila), y lo escribe de a chunk_size;
+#                  de toda la hoja solo recuerda el CI de
+#                  cada código, para informar al final los
+#                  códigos que reclaman varios operadores
+# ============================================
+
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Cualquiera de , ; | o tabulación separa códigos
+_SEPARADOR = re.compile(r'[,;|\t]')
+# Google Sheets a veces borra las comas de celdas numéricas:
+# más de 10 dígitos seguidos son varios códigos pegados
+_PEGADOS = re.compile(r'\d{11,}')
+_CODIGO = re.compile(r'(?=.{3,50}\Z)(?=.*?[^\W_])[^<>"\'\\/?*]*\Z', re.DOTALL)
+
+# Códigos en disputa que se listan uno por uno
+MAX_DISPUTAS_LISTADAS = 20
+
+
+def split_codes(cell: str, verbose: bool = True) -> List[str]:
+    """
+    Celda de la hoja → códigos, sin vacíos (comas finales). Sin
+    separador: los dígitos pegados se cortan en grupos iguales de 6 a
+    10 dígitos; si no, la celda (sin espacios) es un solo código.
+    verbose=False no avisa de los códigos pegados (delta.py ya los
+    separa sin escribir y el converter avisa al importar).
+    """
+    s = str(cell).strip()
+    if not s:
+        return []
+    if _SEPARADOR.search(s):
+        return [c for c in map(str.strip, _SEPARADOR.split(s)) if c]
+
+    s_clean = s.replace(" ", "")
+    if _PEGADOS.fullmatch(s_clean):
+        for size in range(6, 11):
+            if len(s_clean) % size == 0:
+                parts = [s_clean[i:i + size] for i in range(0, len(s_clean), size)]
+                if verbose:
+                    print(f"   ℹ️  Códigos pegados detectados → separados en "
+                          f"{len(parts)} grupos de {size} dígitos")
+                return parts
+    return [s_clean or s]
+
+
+def parse_codes(cell: str, verbose: bool = True) -> List[str]:
+    """Códigos válidos de una celda, en orden (puede haber repetidos)."""
+    return [c for c in split_codes(cell, verbose) if _CODIGO.match(c)]
+
+
+class ActaLedger:
+    """
+    Reclamos de códigos de una hoja. Un código repetido conserva su lugar
+    (el id de la primera aparición) y queda con el último operador que lo
+    reclamó, como hacía el upsert fila a fila.
+    Con write, los códigos nuevos se entregan de a chunk_size filas
+    {codigo, persona_id}; un código que ya se escribió en un lote anterior
+    y cambia de operador va a reassign como (persona_id, codigo), sin otro
+    INSERT (en acta, con AUTOINCREMENT, gastaría un id). Queda igual que
+    con un solo executemany. De toda la hoja solo se guarda
+    codigo → CI del último operador.
+    """
+
+    def __init__(
+        self,
+        write: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        reassign: Optional[Callable[[List[Tuple[int, str]]], Any]] = None,
+        chunk_size: int = 0,
+    ):
+        self.write = write
+        self.reassign = reassign
+        self.chunk_size = chunk_size
+        self.owner: Dict[str, str] = {}
+        self.pending: Dict[str, int] = {}
+        self.reassigned: Dict[str, int] = {}
+        self.disputes: Dict[str, List[str]] = {}
+        self.repeated = 0
+
+    def claim(self, codigo: str, persona_id: int, operador_ci: str):
+        previo = self.owner.get(codigo)
+        if previo is not None:
+            self.repeated += 1
+            if previo != operador_ci:
+                operadores = self.disputes.setdefault(codigo, [previo])
+                if operador_ci not in operadores:
+                    operadores.append(operador_ci)
+        self.owner[codigo] = operador_ci
+        if self.write is None:
+            return
+        if previo is None or codigo in self.pending:
+            self.pending[codigo] = persona_id
+        elif previo != operador_ci:
+            self.reassigned[codigo] = persona_id
+        if len(self.pending) + len(self.reassigned) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Escribe los códigos pendientes, en orden de primera aparición en el lote."""
+        if self.pending:
+            self.write([
+                {'codigo': codigo, 'persona_id': persona_id}
+                for codigo, persona_id in self.pending.items()
+            ])
+            self.pending = {}
+        if self.reassigned:
+            self.reassign([
+                (persona_id, codigo) for codigo, persona_id in self.reassigned.items()
+            ])
+            self.reassigned = {}
+
+    def __len__(self) -> int:
+        return len(self.owner)
+
+    def report(self):
+        if not self.disputes:
+            return
+        print(
+            f"   ⚠️  {len(self.disputes)} código(s) reclamados por más de un "
+            f"operador (queda el último):"
+        )
+        for codigo, operadores in list(self.disputes.items())[:MAX_DISPUTAS_LISTADAS]:
+            reclamos = ", ".join(f"CI {ci}" for ci in operadores)
+            print(f"      {codigo}: {reclamos} → CI {self.owner[codigo]}")
+        resto = len(self.disputes) - MAX_DISPUTAS_LISTADAS
+        if resto > 0:
+            print(f"      … y {resto} más")
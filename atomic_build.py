@@ -0,0 +1,155 @@
+# ============================================
+# atomic_build.py  — NUEVO en v3
+# Construye la base aparte y la pone en su lugar de
+# una sola vez (--atomic). Mientras se importa, el
+# generador de documentos sigue leyendo la base
+# anterior completa: nunca ve una importación a
+# medias ni espera por bloqueos.
+#
+#   1. copia la base actual (backup API) a
+#      operadores.db.build, o a memoria con --atomic memory
+#      (con --rebuild se empieza de una base vacía)
+#   2. corre la importación ahí con el perfil 'build'
+#      (sin fsync ni journal en disco)
+#   3. integrity_check + foreign_key_check
+#   4. fsync de operadores.db.build (el perfil 'build'
+#      no lo hizo), os.replace(operadores.db.build,
+#      operadores.db) y fsync del directorio
+# Si algo falla, la base en uso no se toca.
+# ============================================
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Callable, List
+from database import DatabaseManager, MEMORY
+
+
+class BuildError(Exception):
+    """La base construida aparte no pasó las verificaciones o no se pudo instalar."""
+
+
+def _sidecars(path: Path) -> List[Path]:
+    return [path.with_name(path.name + suffix) for suffix in ('-journal', '-wal', '-shm')]
+
+
+def _remove(path: Path):
+    for p in [path] + _sidecars(path):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _release_wal(live: Path):
+    """
+    Si la base en uso está en WAL, hay que vaciar y cerrar su -wal antes
+    de reemplazarla: un -wal viejo junto al archivo nuevo se aplicaría
+    encima y lo corrompería.
+    """
+    wal, journal = live.with_name(live.name + '-wal'), live.with_name(live.name + '-journal')
+    if wal.exists():
+        conn = sqlite3.connect(live)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("PRAGMA journal_mode = DELETE")
+        except sqlite3.Error as e:
+            raise BuildError(
+                f"No se pudo cerrar el WAL de {live} ({e}); "
+                "cierra los programas que la usan y vuelve a intentar"
+            )
+        finally:
+            conn.close()
+    if wal.exists() or journal.exists():
+        raise BuildError(
+            f"{live} tiene una transacción o lectores en WAL abiertos; "
+            "cierra los programas que la usan y vuelve a intentar"
+        )
+
+
+def _fsync_file(path: Path):
+    """
+    Baja a disco las páginas del archivo: construido con synchronous=OFF,
+    sin esto un corte de luz después del rename puede dejar la base en
+    uso truncada.
+    """
+    fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(directory: Path):
+    """Persiste el rename en el directorio (no aplica en Windows)."""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def build_aside(
+    live: DatabaseManager,
+    build: Callable[[DatabaseManager], bool],
+    memory: bool = False,
+    fresh: bool = False,
+) -> bool:
+    """
+    Corre build(db_aparte) sobre una copia de `live` (o una base vacía
+    con fresh=True) y, si devuelve True y la copia pasa las verificaciones,
+    la instala en lugar de live.db_path con os.replace.
+    Devuelve False si build() devolvió False (la base en uso queda igual);
+    lanza BuildError si la verificación o el reemplazo fallan.
+    """
+    target = live.db_path
+    staging = target.with_name(target.name + '.build')
+    _remove(staging)
+
+    db = DatabaseManager(MEMORY if memory else str(staging))
+    instalada = False
+    try:
+        if not fresh and target.exists():
+            print(f"  📋 Copiando {target.name} para construir aparte...")
+            live.backup_to(db)
+
+        with db.use_profile('build') as pragmas:
+            lugar = 'memoria' if memory else staging.name
+            print(f"  🏗️  Construyendo en {lugar} (journal_mode={pragmas['journal_mode']}, "
+                  f"synchronous={pragmas['synchronous']})")
+            if not build(db):
+                print("  ↩️  Construcción descartada: la base en uso no se modificó")
+                return False
+
+        if memory:
+            db.backup_to(staging)
+        conn = sqlite3.connect(staging)
+        try:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+
+        print("  🔎 Verificando integridad...")
+        problemas = DatabaseManager(str(staging)).verify()
+        if problemas:
+            for p in problemas[:20]:
+                print(f"     • {p}")
+            raise BuildError(f"La base construida tiene {len(problemas)} problema(s); no se instaló")
+
+        _fsync_file(staging)
+        _release_wal(target)
+        try:
+            os.replace(staging, target)
+        except OSError as e:
+            # En Windows falla si otro programa tiene la base abierta
+            raise BuildError(f"No se pudo reemplazar {target}: {e}")
+        _fsync_dir(target.parent)
+        instalada = True
+        print(f"  🔁 {target.name} reemplazada de forma atómica")
+        return True
+    finally:
+        db.close()
+        if not instalada:
+            _remove(staging)
@@ -0,0 +1,530 @@
+# ============================================
+# benchmark.py  — NUEVO en v3
+# Mide cómo escala run_import con datos sintéticos.
+# Genera todas las hojas de SHEET_NAMES a varios
+# tamaños (N personas, actas_factor × N códigos y una
+# geografía con reparto realista), las importa desde
+# un origen en memoria y guarda por etapa: tiempo,
+# filas/s y sentencias SQL ejecutadas. Como `todo`
+# sobre una base nueva, los índices se crean al final
+# (etapa 'indices').
+#
+#   python benchmark.py                        → 1k, 10k personas
+#   python benchmark.py --sizes 1000 10000 100000 --output bench.json
+#   python benchmark.py --compare bench_anterior.json
+#   python benchmark.py --engine staging       → motor por conjuntos
+#   python benchmark.py --latency 0.5 --pipeline
+#                          → simula 0.5 s por hoja descargada y solapa
+#                            descarga y escritura
+#   python benchmark.py --check-incremental
+#                          → la importación incremental deja la base
+#                            igual que una completa (códigos y CI que
+#                            reclaman varias filas)
+#   python benchmark.py --check-sql-budget
+#                          → ninguna etapa de una carga completa pasa
+#                            su tope de sentencias SQL (SqlTracer)
+#
+# Con --compare sale con código 1 si alguna etapa
+# se volvió más lenta que el umbral (--threshold).
+# ============================================
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import DatabaseManager
+from main import ENGINES, run_import
+from profiler import StageProfiler
+from sources import DelayedSource, MemorySource
+from sqltrace import SqlTracer
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_OUTPUT = "benchmark.json"
+
+DEPARTAMENTOS = [
+    'La Paz', 'Cochabamba', 'Santa Cruz', 'Oruro', 'Potosí',
+    'Chuquisaca', 'Tarija', 'Beni', 'Pando',
+]
+# Topes del país real: más personas no agregan provincias ni municipios
+MAX_PROVINCIAS = 112
+MAX_MUNICIPIOS = 339
+
+
+# ── DATOS SINTÉTICOS ──────────────────────────────────────────────────
+
+def generate(personas: int, actas_factor: int = 10, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Registros sintéticos con la forma de get_all_records() (números ya
+    numerizados) para todas las hojas, listos para MemorySource.
+
+    personas se reparte 80/20 entre operadores y notarios; hay ~4
+    personas por recinto, ~4 recintos por asiento, ~3 asientos por
+    municipio y ~3 municipios por provincia, con los topes del país.
+    Las actas suman actas_factor × personas códigos, repartidos entre
+    las filas de los operadores (varios códigos por celda, con coma).
+    """
+    rng = random.Random(seed)
+    operadores_n = max(1, personas * 4 // 5)
+    notarios_n = max(0, personas - operadores_n)
+
+    recintos_n = max(1, personas // 4)
+    asientos_n = max(1, recintos_n // 4)
+    municipios_n = min(MAX_MUNICIPIOS, max(1, asientos_n // 3))
+    provincias_n = min(MAX_PROVINCIAS, max(1, municipios_n // 3))
+    coordinadores_n = max(1, operadores_n // 25)
+    jefes_n = max(1, coordinadores_n // 10)
+
+    def padre(items: List[Dict[str, Any]], i: int) -> Dict[str, Any]:
+        # Cada unidad recibe al menos un hijo; el resto se reparte
+        # desparejo como en el padrón (las primeras, capitales, reciben más)
+        if i < len(items):
+            return items[i]
+        return items[int(len(items) * rng.random() ** 1.5)]
+
+    departamentos = [{'nombre': nombre} for nombre in DEPARTAMENTOS]
+    provincias = []
+    for i in range(provincias_n):
+        d = padre(departamentos, i)
+        provincias.append({
+            'departamento': d['nombre'],
+            'nombre':       f"Provincia {i + 1:03d}",
+            'es_urbano':    1 if i < len(departamentos) else 0,
+        })
+    municipios = [
+        {'provincia': padre(provincias, i)['nombre'], 'nombre': f"Municipio {i + 1:03d}"}
+        for i in range(municipios_n)
+    ]
+    asientos = [
+        {'municipio': padre(municipios, i)['nombre'], 'nombre': f"Asiento {i + 1:05d}"}
+        for i in range(asientos_n)
+    ]
+    provincia_de = {m['nombre']: m['provincia'] for m in municipios}
+    departamento_de = {p['nombre']: p['departamento'] for p in provincias}
+    recintos = []
+    for i in range(recintos_n):
+        a = padre(asientos, i)
+        provincia = provincia_de[a['municipio']]
+        recintos.append({
+            'departamento':      departamento_de[provincia],
+            'provincia':         provincia,
+            'municipio':         a['municipio'],
+            'asiento_electoral': a['nombre'],
+            'nombre':            f"U.E. {i + 1:06d}",
+            'direccion':         f"Calle {rng.randint(1, 300)} #{rng.randint(1, 2000)}",
+            'distrito':          rng.randint(1, 14),
+        })
+
+    jefes = [
+        {'nombre': f"Jefe {i + 1:03d}", 'cargo': 'Jefe de zona', 'celular': 60000000 + i}
+        for i in range(jefes_n)
+    ]
+    coordinadores = [
+        {
+            'jefe':         jefes[i % jefes_n]['nombre'],
+            'nombre':       f"Coordinador {i + 1:04d}",
+            'ci':           3000000 + i,
+            'expedido':     'LP',
+            'celular':      65000000 + i,
+            'correo':       f"coord{i + 1}@example.org",
+            'cargo':        'Coordinador',
+            'nombre_grupo': f"Grupo {i + 1:04d}",
+        }
+        for i in range(coordinadores_n)
+    ]
+
+    def persona(i: int, base: int) -> Dict[str, Any]:
+        r = recintos[i % recintos_n]
+        return {
+            'asiento_electoral': r['asiento_electoral'],
+            'recinto':           r['nombre'],
+            'nombre':            f"Persona {base + i:07d}",
+            'ci':                base + i,
+            'expedido':          rng.choice(['LP', 'CB', 'SC', 'OR', 'PT']),
+            'celular':           70000000 + base + i,
+            'correo':            f"p{base + i}@example.org",
+            'cargo':             '',
+        }
+
+    operadores = []
+    for i in range(operadores_n):
+        row = persona(i, 4000000)
+        row.update({
+            'coordinador_ci': coordinadores[i % coordinadores_n]['ci'],
+            'cargo':          'Operador',
+            'user':           f"op{i + 1}",
+            'password':       f"clave{rng.randint(1000, 9999)}",
+        })
+        operadores.append(row)
+    notarios = [dict(persona(i, 8000000), cargo='Notario') for i in range(notarios_n)]
+
+    codigos_por_operador: List[List[str]] = [[] for _ in range(operadores_n)]
+    for n in range(actas_factor * personas):
+        codigos_por_operador[n % operadores_n].append(str(100000 + n))
+    actas = [
+        {'operador_ci': operadores[i]['ci'], 'codigos': ','.join(codigos)}
+        for i, codigos in enumerate(codigos_por_operador) if codigos
+    ]
+
+    return {
+        'jefes':                jefes,
+        'coordinadores':        coordinadores,
+        'departamentos':        departamentos,
+        'provincias':           provincias,
+        'municipios':           municipios,
+        'asientos_electorales': asientos,
+        'recintos':             recintos,
+        'operadores':           operadores,
+        'notarios':             notarios,
+        'actas':                actas,
+    }
+
+
+# ── MEDICIÓN ──────────────────────────────────────────────────────────
+
+def run_size(
+    personas: int, actas_factor: int = 10, seed: int = 0, verbose: bool = False, profile: str = 'durable',
+    engine: str = 'python', latency: float = 0.0, pipeline: bool = False,
+) -> Dict[str, Any]:
+    """
+    Importa un juego sintético en una base temporal y devuelve sus métricas.
+    latency: segundos de demora simulada por hoja leída.
+    """
+    data = generate(personas, actas_factor, seed)
+    origen = MemorySource(data)
+    if latency:
+        origen = DelayedSource(origen, latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        salida = sys.stdout if verbose else io.StringIO()
+        with contextlib.redirect_stdout(salida):
+            db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+            with db.use_profile(profile):
+                db.create_schema(defer_indexes=True)
+                with StageProfiler(db) as perfil:
+                    ok = run_import(
+                        db, source=origen, medir=perfil, defer_indexes=True, engine=engine,
+                        pipeline=pipeline,
+                    )
+            stats = db.get_stats()
+    if not ok:
+        raise RuntimeError(f"La importación sintética de {personas} personas no pasó la validación")
+
+    return {
+        'personas':      personas,
+        'actas_factor':  actas_factor,
+        'rows':          {key: len(rows) for key, rows in data.items()},
+        'db_counts':     {k: stats.get(k) for k in ('persona', 'acta', 'recinto')},
+        **perfil.to_dict(),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    sizes: List[int], actas_factor: int = 10, seed: int = 0, repeat: int = 1, verbose: bool = False,
+    profile: str = 'durable', engine: str = 'python', latency: float = 0.0, pipeline: bool = False,
+) -> Dict[str, Any]:
+    """Corre todos los tamaños; con repeat > 1 se queda con la corrida más rápida."""
+    runs = []
+    for personas in sizes:
+        print(f"⏱️  {personas} personas, {actas_factor * personas} actas...")
+        mejor = None
+        for _ in range(max(1, repeat)):
+            run = run_size(personas, actas_factor, seed, verbose, profile, engine, latency, pipeline)
+            if mejor is None or run['total_seconds'] < mejor['total_seconds']:
+                mejor = run
+        print_run(mejor)
+        runs.append(mejor)
+    return {
+        'meta': {
+            'commit':    _git_commit(),
+            'fecha':     datetime.now().isoformat(timespec='seconds'),
+            'python':    platform.python_version(),
+            'sqlite':    sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'seed':      seed,
+            'repeat':    repeat,
+            'perfil':    profile,
+            'motor':     engine,
+            'latencia':  latency,
+            'pipeline':  pipeline,
+        },
+        'runs': runs,
+    }
+
+
+# ── CONSISTENCIA INCREMENTAL ──────────────────────────────────────────
+
+# Código de acta que se disputan dos filas de Actas en --check-incremental
+CODIGO_COMPARTIDO = '88888888'
+
+
+def _compartir_codigo(data: Dict[str, List[Dict[str, Any]]]):
+    """Las dos primeras filas de Actas reclaman CODIGO_COMPARTIDO (gana la segunda)."""
+    for row in data['actas'][:2]:
+        row['codigos'] += f",{CODIGO_COMPARTIDO}"
+
+
+def _escenario_editar_primera(data: Dict[str, List[Dict[str, Any]]]):
+    data['actas'][0]['codigos'] += ',77777777'
+
+
+def _escenario_quitar_de_la_segunda(data: Dict[str, List[Dict[str, Any]]]):
+    row = data['actas'][1]
+    row['codigos'] = ','.join(c for c in row['codigos'].split(',') if c != CODIGO_COMPARTIDO)
+
+
+def _compartir_ci(data: Dict[str, List[Dict[str, Any]]]):
+    """Un notario con el CI del primer operador (gana la fila de Notarios)."""
+    operador = data['operadores'][0]
+    data['notarios'].append({
+        k: operador[k] for k in ('asiento_electoral', 'recinto', 'ci', 'expedido', 'celular')
+    } | {'nombre': 'Notario con CI de operador', 'correo': '', 'cargo': 'Notario'})
+
+
+def _escenario_editar_operador(data: Dict[str, List[Dict[str, Any]]]):
+    data['operadores'][0]['celular'] += 1
+
+
+# nombre → (preparar la base, editar para la importación incremental)
+ESCENARIOS_INCREMENTALES = {
+    'código compartido, se edita la primera fila':   (_compartir_codigo, _escenario_editar_primera),
+    'código compartido, la última fila lo quita':    (_compartir_codigo, _escenario_quitar_de_la_segunda),
+    'CI en Operadores y Notarios, se edita el operador': (_compartir_ci, _escenario_editar_operador),
+}
+
+
+def _estado(db: DatabaseManager) -> Dict[str, List[tuple]]:
+    """Personas y actas por clave natural (los ids pueden diferir entre bases)."""
+    return {
+        'persona': db.query("""
+            SELECT p.ci, p.tipo, p.nombre, p.celular, r.nombre, c.ci
+            FROM persona p
+            JOIN recinto r ON r.id = p.recinto_id
+            LEFT JOIN coordinador c ON c.id = p.coordinador_id
+            ORDER BY p.ci
+        """),
+        'acta': db.query("""
+            SELECT a.codigo, p.ci FROM acta a JOIN persona p ON p.id = a.persona_id
+            ORDER BY a.codigo
+        """),
+    }
+
+
+def check_incremental(personas: int = 200, engine: str = 'python', seed: int = 0) -> List[str]:
+    """
+    Por cada escenario de ESCENARIOS_INCREMENTALES: importación completa,
+    edición e importación incremental, comparada con una importación
+    completa de los datos editados en una base nueva. Devuelve las
+    diferencias (lista vacía = iguales).
+    """
+    diferencias = []
+    for nombre, (preparar, editar) in ESCENARIOS_INCREMENTALES.items():
+        base = generate(personas, 3, seed)
+        preparar(base)
+        editada = json.loads(json.dumps(base))
+        editar(editada)
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            incremental = DatabaseManager(os.path.join(tmp, 'incremental.db'))
+            completa = DatabaseManager(os.path.join(tmp, 'completa.db'))
+            for db in (incremental, completa):
+                db.create_schema()
+            run_import(incremental, skip_validation=True, source=MemorySource(base), engine=engine)
+            run_import(incremental, skip_validation=True, source=MemorySource(editada), engine=engine)
+            run_import(completa, skip_validation=True, source=MemorySource(editada), engine=engine)
+            estados = _estado(incremental), _estado(completa)
+        for tabla in estados[0]:
+            filas_inc, filas_comp = set(estados[0][tabla]), set(estados[1][tabla])
+            if filas_inc != filas_comp:
+                diferencias.append(
+                    f"{nombre} / {tabla}: incremental {sorted(filas_inc - filas_comp)[:3]} "
+                    f"≠ completa {sorted(filas_comp - filas_inc)[:3]}"
+                )
+    return diferencias
+
+
+# ── PRESUPUESTO DE SENTENCIAS SQL ─────────────────────────────────────
+
+# Carga completa de --check-sql-budget (triggers de contador diferidos)
+SQL_BUDGET_PERSONAS = 2000
+SQL_BUDGET_ACTAS_FACTOR = 3          # 3.75 códigos por fila de Actas
+
+# Tope por fila de entrada: un upsert y una huella por fila; en Actas un
+# upsert por código (staging suma la fila de stg_actas_fila)
+SQL_BUDGET_PER_ROW: Dict[str, Dict[str, float]] = {
+    'python':  {'coordinadores': 2.2, 'recintos': 2.2, 'personas': 2.2, 'actas': 5.0},
+    'staging': {'coordinadores': 2.2, 'recintos': 2.2, 'personas': 2.2, 'actas': 6.0},
+}
+# Etapas chicas: tope fijo para SQL_BUDGET_PERSONAS personas
+SQL_BUDGET_FIXED: Dict[str, int] = {
+    'jefes':                30,
+    'departamentos':        40,
+    'provincias':           60,
+    'municipios':           120,
+    'asientos_electorales': 300,
+}
+
+
+def check_sql_budget(engine: str = 'python', seed: int = 0) -> List[str]:
+    """
+    Importa SQL_BUDGET_PERSONAS personas con SqlTracer como medidor y
+    devuelve las etapas que pasan su tope (SQL_BUDGET_PER_ROW y
+    SQL_BUDGET_FIXED) y los posibles N+1; lista vacía = dentro del
+    presupuesto.
+    """
+    data = generate(SQL_BUDGET_PERSONAS, SQL_BUDGET_ACTAS_FACTOR, seed)
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        db = DatabaseManager(os.path.join(tmp, 'budget.db'))
+        db.create_schema(defer_indexes=True)
+        with SqlTracer(db) as traza:
+            ok = run_import(
+                db, skip_validation=True, source=MemorySource(data), medir=traza,
+                defer_indexes=True, engine=engine,
+            )
+    if not ok:
+        return ["la importación sintética falló"]
+    excesos = traza.check_budget(SQL_BUDGET_PER_ROW[engine], per_row=True)
+    excesos += traza.check_budget(SQL_BUDGET_FIXED)
+    excesos += [
+        f"{s['etapa']}: posible N+1, {s['veces']} × {s['forma'][:70]}"
+        for s in traza.n_plus_one()
+    ]
+    return excesos
+
+
+# ── REPORTE / COMPARACIÓN ─────────────────────────────────────────────
+
+def print_run(run: Dict[str, Any]):
+    print(f"   {'etapa'.ljust(22)} {'seg':>9} {'filas':>8} {'filas/s':>10} {'SQL':>8}")
+    for etapa, s in run['stages'].items():
+        filas = s['rows'] if s['rows'] is not None else '-'
+        rps = f"{s['rows_per_s']:.0f}" if s['rows_per_s'] else '-'
+        print(f"   {etapa.ljust(22)} {s['seconds']:>9.3f} {filas:>8} {rps:>10} {s['queries']:>8}")
+    print(f"   {'TOTAL'.ljust(22)} {run['total_seconds']:>9.3f} {'':>8} {'':>10} {run['total_queries']:>8}")
+
+
+def compare(previo: Dict[str, Any], actual: Dict[str, Any], threshold: float = 0.2) -> List[str]:
+    """
+    Etapas más lentas que en `previo` por encima de threshold (0.2 = +20%),
+    o con más sentencias SQL. Solo compara tamaños presentes en ambos.
+    Se ignoran etapas de menos de 50 ms (ruido).
+    """
+    anteriores = {r['personas']: r for r in previo.get('runs', [])}
+    regresiones = []
+    for run in actual['runs']:
+        base = anteriores.get(run['personas'])
+        if base is None:
+            continue
+        for etapa, s in run['stages'].items():
+            b = base['stages'].get(etapa)
+            if b is None:
+                continue
+            if s['seconds'] >= 0.05 and s['seconds'] > b['seconds'] * (1 + threshold):
+                regresiones.append(
+                    f"{run['personas']} personas / {etapa}: "
+                    f"{b['seconds']:.3f}s → {s['seconds']:.3f}s "
+                    f"(+{(s['seconds'] / b['seconds'] - 1) * 100:.0f}%)"
+                )
+            if s['queries'] > b['queries']:
+                regresiones.append(
+                    f"{run['personas']} personas / {etapa}: "
+                    f"{b['queries']} → {s['queries']} sentencias SQL"
+                )
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de importación con datos sintéticos")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, metavar='N',
+                        help=f'Personas por corrida (por defecto {" ".join(map(str, DEFAULT_SIZES))})')
+    parser.add_argument('--actas-factor', type=int, default=10, metavar='K',
+                        help='Códigos de acta por persona (por defecto 10)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, metavar='R',
+                        help='Repeticiones por tamaño; se guarda la más rápida')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, metavar='ARCHIVO',
+                        help=f'JSON de resultados (por defecto {DEFAULT_OUTPUT})')
+    parser.add_argument('--compare', metavar='ARCHIVO',
+                        help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Tolerancia de --compare (0.2 = +20%%)')
+    parser.add_argument('--fast', action='store_true',
+                        help="Importar con el perfil SQLite 'fast' (como main.py --fast)")
+    parser.add_argument('--engine', default='python', choices=sorted(ENGINES),
+                        help="Motor de escritura de run_import (como main.py --engine)")
+    parser.add_argument('--latency', type=float, default=0.0, metavar='SEG',
+                        help='Demora simulada por hoja leída, como la de la API de Sheets')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Importar en pipeline (como main.py --pipeline)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Mostrar la salida de la importación')
+    parser.add_argument('--check-incremental', action='store_true',
+                        help='En vez de medir, comprobar que la importación incremental deja la '
+                             'base igual que una completa (códigos y CI disputados)')
+    parser.add_argument('--check-sql-budget', action='store_true',
+                        help='En vez de medir, comprobar que ninguna etapa pasa su tope de '
+                             'sentencias SQL en una carga completa')
+    args = parser.parse_args()
+
+    if args.check_sql_budget:
+        excesos = check_sql_budget(engine=args.engine, seed=args.seed)
+        if excesos:
+            print(f"❌ {len(excesos)} etapa(s) fuera del presupuesto de sentencias SQL:")
+            for e in excesos:
+                print(f"   • {e}")
+            sys.exit(1)
+        print(f"✅ Sentencias SQL dentro del presupuesto "
+              f"({SQL_BUDGET_PERSONAS} personas, motor {args.engine})")
+        return
+
+    if args.check_incremental:
+        diferencias = check_incremental(engine=args.engine, seed=args.seed)
+        if diferencias:
+            print(f"❌ {len(diferencias)} diferencia(s) entre importación incremental y completa:")
+            for d in diferencias:
+                print(f"   • {d}")
+            sys.exit(1)
+        print(f"✅ Importación incremental igual a la completa "
+              f"({len(ESCENARIOS_INCREMENTALES)} escenarios, motor {args.engine})")
+        return
+
+    resultado = run_benchmark(
+        args.sizes, args.actas_factor, args.seed, args.repeat, args.verbose,
+        profile='fast' if args.fast else 'durable', engine=args.engine,
+        latency=args.latency, pipeline=args.pipeline,
+    )
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previo = json.load(f)
+        regresiones = compare(previo, resultado, args.threshold)
+        if regresiones:
+            print(f"\n🐢 {len(regresiones)} regresión(es) respecto de {args.compare}:")
+            for r in regresiones:
+                print(f"   • {r}")
+            sys.exit(1)
+        print(f"\n✅ Sin regresiones respecto de {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
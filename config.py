@@ -9,9 +9,31 @@
 SPREADSHEET_ID   = "1ehySw2tVI1l8INo4fgE7kEGFd0Kb2miPs7vCqsFZC8I"
 CREDENTIALS_FILE = "generador-docs-31f4b831a196.json"
 
+# Cuota de lecturas por minuto por usuario de la API de Sheets
+SHEETS_READS_PER_MINUTE = 60
+# Pedidos que pueden salir juntos sin esperar; el resto de la cuota se
+# reparte a ritmo constante (ver quota.TokenBucket)
+SHEETS_BURST = 10
+# Reintentos ante 429 / 5xx / errores de red, con backoff exponencial
+# (1, 2, 4, ... s + jitter) y una espera máxima de SHEETS_BACKOFF_MAX s
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_MAX = 64
+# Tope de hilos para --fetch-workers
+MAX_FETCH_WORKERS = 10
+# Filas por bloque al leer en streaming (--stream / --chunk-size)
+STREAM_CHUNK_SIZE = 5000
+# Hilos que preparan etapas (huellas de fila) mientras otra se escribe
+# (--stage-workers; 1 = secuencial). Con --stream siempre es 1.
+STAGE_WORKERS = 2
+
 # === BASE DE DATOS ===
 DATABASE_PATH = "../database/operadores.db"
 
+# === CACHÉ LOCAL DE HOJAS ===
+# Copias comprimidas de cada hoja, reutilizadas mientras el
+# spreadsheet no cambie (ver --no-cache / --refresh)
+CACHE_DIR = "../database/cache"
+
 # === HOJAS DEL GOOGLE SHEET ===
 # 'grupos' ya no existe: cada coordinador tiene una columna 'nombre_grupo'
 # 'cuentas' ya no existe: user/password van directo en la hoja Operadores
@@ -6,173 +6,257 @@
 #   - convert_personas(): recibe coordinadores_data para resolver coordinador_ci
 #                         user/password vienen directo en operadores_data
 #   - convert_actas(): solo codigo + persona_id
+# Cambios v3:
+#   - las claves foráneas se resuelven en memoria (ForeignKeyResolver)
+#     en vez de un SELECT por fila
+#   - cada hoja se escribe con DatabaseManager.bulk_upsert (un executemany
+#     por lote) en vez de SELECT + UPDATE/INSERT por fila
+#   - provincias/municipios/asientos se guardan por su UNIQUE(padre, nombre)
+#   - los convert_* aceptan cualquier iterable de filas y escriben por
+#     lotes de chunk_size (memoria acotada al lote, no a la hoja)
+#   - las filas llegan como registros de records.py, ya normalizados y
+#     tipados: sin _str/_int/_bool ni búsquedas en COLUMN_MAPPING por campo
+#   - convert_actas(): códigos separados con actas.parse_codes(),
+#     deduplicados por lote (ActaLedger) y escritos de a chunk_size;
+#     informa los códigos que reclaman varios operadores
+#   - geografía: cada fila guarda su clave normalizada y los padres se
+#     buscan por clave en GeoIndex; recintos baja por la ruta completa
+#     departamento → provincia → municipio → asiento de la hoja
 # ============================================
 
-from typing import Dict, List, Any, Optional
-from database import DatabaseManager
-from config import COLUMN_MAPPING
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Callable
+from database import DatabaseManager, GEO_PARENTS, UPSERT_CHUNK_SIZE
+from records import name_key
+from resolver import ForeignKeyResolver
+from actas import ActaLedger, parse_codes
+
+
+class _BatchWriter:
+    """Acumula filas y las entrega a `write` de a `size`."""
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], Any], size: int):
+        self.write = write
+        self.size = size
+        self.rows: List[Dict[str, Any]] = []
+        self.count = 0
+
+    def add(self, row: Dict[str, Any]):
+        self.rows.append(row)
+        self.count += 1
+        if len(self.rows) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.write(self.rows)
+            self.rows = []
 
 
 class DataConverters:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        resolver: Optional[ForeignKeyResolver] = None,
+        chunk_size: int = UPSERT_CHUNK_SIZE,
+    ):
         self.db = db_manager
+        self.db.ensure_name_keys()
+        self.resolver = resolver or ForeignKeyResolver(db_manager)
+        self.chunk_size = chunk_size
 
     # ── UTILIDADES ────────────────────────────────────────────────────
 
-    def _str(self, row: Dict, key: str, default: str = '') -> str:
-        value = row.get(key, default)
-        if value is None:
-            return default
-        if isinstance(value, (int, float)):
-            return str(value)
-        return str(value).strip()
-
-    def _int(self, row: Dict, key: str, default: int = 0) -> int:
-        try:
-            value = row.get(key, default)
-            if value is None:
-                return default
-            return int(str(value).strip()) if str(value).strip() else default
-        except (ValueError, TypeError):
-            return default
-
-    def _bool(self, row: Dict, key: str, default: bool = False) -> bool:
-        try:
-            value = row.get(key, default)
-            if value is None:
-                return default
-            return str(value).strip().lower() in ['1', 'true', 'si', 'sí', 'yes']
-        except Exception:
-            return default
+    def _upsert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        conflict_columns: Tuple[str, ...],
+        name_field: str,
+    ) -> Dict[Tuple, int]:
+        """
+        bulk_upsert + registro de los ids en el resolver.
+        name_field es la columna por la que las otras hojas buscan esta
+        tabla (último elemento de conflict_columns).
+        """
+        ids = self.db.bulk_upsert(table, rows, conflict_columns, self.chunk_size)
+        if table in GEO_PARENTS:
+            for key, row_id in ids.items():
+                parent_id = key[0] if len(key) > 1 else None
+                self.resolver.remember_geo(table, parent_id, key[-1], row_id)
+            return ids
+        for key, row_id in ids.items():
+            self.resolver.remember(table, name_field, key[-1], row_id)
+        return ids
+
+    def _batch(
+        self, table: str, conflict_columns: Tuple[str, ...], name_field: str
+    ) -> _BatchWriter:
+        return _BatchWriter(
+            lambda rows: self._upsert(table, rows, conflict_columns, name_field),
+            self.chunk_size,
+        )
 
     # ── ORGANIZACIÓN ──────────────────────────────────────────────────
 
-    def convert_jefes(self, data: List[Dict[str, Any]]):
+    def convert_jefes(self, data: Iterable[tuple]):
         print("👔 Procesando jefes...")
-        count = 0
+        rows = self._batch('jefe', ('nombre',), 'nombre')
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['jefes']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            self.db.insert_or_update('jefe', {
+            rows.add({
                 'nombre':  nombre,
-                'cargo':   self._str(row, COLUMN_MAPPING['jefes']['cargo']),
-                'celular': self._str(row, COLUMN_MAPPING['jefes']['celular']),
-            }, 'nombre')
-            count += 1
-        print(f"   ✅ {count} jefes procesados")
+                'cargo':   row.cargo,
+                'celular': row.celular,
+            })
+        rows.flush()
+        print(f"   ✅ {rows.count} jefes procesados")
 
-    def convert_coordinadores(self, data: List[Dict[str, Any]]):
+    def convert_coordinadores(self, data: Iterable[tuple]):
         """
         Guarda coordinador con nombre_grupo incluido.
         Ya no existe tabla separada 'grupo'.
         """
         print("👥 Procesando coordinadores (con grupo)...")
-        count = 0
+        rows = self._batch('coordinador', ('ci',), 'ci')
         for row in data:
-            ci = self._str(row, COLUMN_MAPPING['coordinadores']['ci'])
+            ci = row.ci
             if not ci:
                 continue
-            jefe_nombre = self._str(row, COLUMN_MAPPING['coordinadores']['jefe'])
+            jefe_nombre = row.jefe
             jefe_id = (
-                self.db.get_id_by_field('jefe', 'nombre', jefe_nombre)
+                self.resolver.get_id('jefe', 'nombre', jefe_nombre)
                 if jefe_nombre else None
             )
-            self.db.insert_or_update('coordinador', {
+            rows.add({
                 'ci':           ci,
-                'nombre':       self._str(row, COLUMN_MAPPING['coordinadores']['nombre']),
-                'expedido':     self._str(row, COLUMN_MAPPING['coordinadores']['expedido']),
-                'celular':      self._str(row, COLUMN_MAPPING['coordinadores']['celular']),
-                'correo':       self._str(row, COLUMN_MAPPING['coordinadores']['correo']),
-                'cargo':        self._str(row, COLUMN_MAPPING['coordinadores']['cargo']),
-                'nombre_grupo': self._str(row, COLUMN_MAPPING['coordinadores']['nombre_grupo']),
+                'nombre':       row.nombre,
+                'expedido':     row.expedido,
+                'celular':      row.celular,
+                'correo':       row.correo,
+                'cargo':        row.cargo,
+                'nombre_grupo': row.nombre_grupo,
                 'jefe_id':      jefe_id,
-            }, 'ci')
-            count += 1
-        print(f"   ✅ {count} coordinadores procesados")
+            })
+        rows.flush()
+        print(f"   ✅ {rows.count} coordinadores procesados")
 
     # ── GEOGRAFÍA ─────────────────────────────────────────────────────
+    # Cada nivel se guarda por su UNIQUE(padre_id, nombre). Si el padre no
+    # existe la fila se omite (antes fallaba por NOT NULL en el INSERT).
 
-    def convert_departamentos(self, data: List[Dict[str, Any]]):
+    def convert_departamentos(self, data: Iterable[tuple]):
         print("🏛️  Procesando departamentos...")
-        count = 0
+        rows = self._batch('departamento', ('nombre',), 'nombre')
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['departamentos']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            self.db.insert_or_update('departamento', {'nombre': nombre}, 'nombre')
-            count += 1
-        print(f"   ✅ {count} departamentos procesados")
+            rows.add({'nombre': nombre, 'clave': name_key(nombre)})
+        rows.flush()
+        print(f"   ✅ {rows.count} departamentos procesados")
 
-    def convert_provincias(self, data: List[Dict[str, Any]]):
+    def convert_provincias(self, data: Iterable[tuple]):
         print("🌄 Procesando provincias...")
-        count = 0
+        rows = self._batch('provincia', ('departamento_id', 'nombre'), 'nombre')
+        skipped = 0
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['provincias']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            depto_nombre = self._str(row, COLUMN_MAPPING['provincias']['departamento'])
+            depto_nombre = row.departamento
             depto_id = (
-                self.db.get_id_by_field('departamento', 'nombre', depto_nombre)
+                self.resolver.get_id('departamento', 'nombre', depto_nombre)
                 if depto_nombre else None
             )
-            es_urbano = self._bool(row, COLUMN_MAPPING['provincias']['es_urbano'])
-            self.db.insert_or_update('provincia', {
+            if not depto_id:
+                print(f"   ⚠️  Departamento '{depto_nombre}' no encontrado → provincia '{nombre}' omitida")
+                skipped += 1
+                continue
+            rows.add({
                 'departamento_id': depto_id,
                 'nombre':          nombre,
-                'es_urbano':       1 if es_urbano else 0,
-            }, 'nombre')
-            count += 1
-        print(f"   ✅ {count} provincias procesadas")
+                'clave':           name_key(nombre),
+                'es_urbano':       1 if row.es_urbano else 0,
+            })
+        rows.flush()
+        print(f"   ✅ {rows.count} provincias procesadas, {skipped} omitidas")
 
-    def convert_municipios(self, data: List[Dict[str, Any]]):
+    def convert_municipios(self, data: Iterable[tuple]):
         print("🏘️  Procesando municipios...")
-        count = 0
+        rows = self._batch('municipio', ('provincia_id', 'nombre'), 'nombre')
+        skipped = 0
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['municipios']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            prov_nombre = self._str(row, COLUMN_MAPPING['municipios']['provincia'])
+            prov_nombre = row.provincia
             prov_id = (
-                self.db.get_id_by_field('provincia', 'nombre', prov_nombre)
+                self.resolver.get_id('provincia', 'nombre', prov_nombre)
                 if prov_nombre else None
             )
-            self.db.insert_or_update('municipio', {
+            if not prov_id:
+                print(f"   ⚠️  Provincia '{prov_nombre}' no encontrada → municipio '{nombre}' omitido")
+                skipped += 1
+                continue
+            rows.add({
                 'provincia_id': prov_id,
                 'nombre':       nombre,
-            }, 'nombre')
-            count += 1
-        print(f"   ✅ {count} municipios procesados")
+                'clave':        name_key(nombre),
+            })
+        rows.flush()
+        print(f"   ✅ {rows.count} municipios procesados, {skipped} omitidos")
 
-    def convert_asientos_electorales(self, data: List[Dict[str, Any]]):
+    def convert_asientos_electorales(self, data: Iterable[tuple]):
         print("🗳️  Procesando asientos electorales...")
-        count = 0
+        rows = self._batch('asiento_electoral', ('municipio_id', 'nombre'), 'nombre')
+        skipped = 0
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['asientos_electorales']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            mun_nombre = self._str(row, COLUMN_MAPPING['asientos_electorales']['municipio'])
+            mun_nombre = row.municipio
             mun_id = (
-                self.db.get_id_by_field('municipio', 'nombre', mun_nombre)
+                self.resolver.get_id('municipio', 'nombre', mun_nombre)
                 if mun_nombre else None
             )
-            self.db.insert_or_update('asiento_electoral', {
+            if not mun_id:
+                print(f"   ⚠️  Municipio '{mun_nombre}' no encontrado → asiento '{nombre}' omitido")
+                skipped += 1
+                continue
+            rows.add({
                 'municipio_id': mun_id,
                 'nombre':       nombre,
-            }, 'nombre')
-            count += 1
-        print(f"   ✅ {count} asientos procesados")
+                'clave':        name_key(nombre),
+            })
+        rows.flush()
+        print(f"   ✅ {rows.count} asientos procesados, {skipped} omitidos")
 
-    def convert_recintos(self, data: List[Dict[str, Any]]):
+    def convert_recintos(self, data: Iterable[tuple]):
+        """
+        El asiento se busca por la ruta completa de la hoja
+        (departamento, provincia, municipio, asiento); las columnas vacías
+        no restringen.
+        """
         print("🏫 Procesando recintos...")
+
+        def write(batch: List[Dict[str, Any]]):
+            ids = self.db.bulk_upsert('recinto', batch, ('asiento_id', 'nombre'), self.chunk_size)
+            for (asiento_id, nombre), recinto_id in ids.items():
+                self.resolver.remember_geo('recinto', asiento_id, nombre, recinto_id)
+
+        rows = _BatchWriter(write, self.chunk_size)
         inserted = updated = skipped = 0
         for row in data:
-            nombre = self._str(row, COLUMN_MAPPING['recintos']['nombre'])
+            nombre = row.nombre
             if not nombre:
                 continue
-            asiento_nombre = self._str(row, COLUMN_MAPPING['recintos']['asiento_electoral'])
+            asiento_nombre = row.asiento_electoral
             asiento_id = (
-                self.db.get_id_by_field('asiento_electoral', 'nombre', asiento_nombre)
+                self.resolver.get_geo_id(
+                    'asiento_electoral',
+                    row.departamento, row.provincia, row.municipio, asiento_nombre,
+                )
                 if asiento_nombre else None
             )
             if not asiento_id:
@@ -180,27 +264,27 @@ class DataConverters:
                 skipped += 1
                 continue
 
-            existing_id = self.db.get_recinto_id_by_asiento_and_nombre(asiento_nombre, nombre)
-            recinto_data = {
-                'asiento_id': asiento_id,
-                'nombre':     nombre,
-                'direccion':  self._str(row, COLUMN_MAPPING['recintos']['direccion']),
-                'distrito':   self._int(row, COLUMN_MAPPING['recintos']['distrito']),
-            }
-            if existing_id:
-                self.db.update_record('recinto', recinto_data, existing_id)
+            if self.resolver.geo.child('recinto', asiento_id, nombre):
                 updated += 1
             else:
-                self.db.insert_record('recinto', recinto_data)
                 inserted += 1
+            rows.add({
+                'asiento_id': asiento_id,
+                'nombre':     nombre,
+                'clave':      name_key(nombre),
+                'direccion':  row.direccion,
+                'distrito':   row.distrito,
+            })
+
+        rows.flush()
         print(f"   ✅ {inserted} nuevos, {updated} actualizados, {skipped} omitidos")
 
     # ── PERSONAS ──────────────────────────────────────────────────────
 
     def convert_personas(
         self,
-        operadores_data: List[Dict[str, Any]],
-        notarios_data:   List[Dict[str, Any]],
+        operadores_data: Iterable[tuple],
+        notarios_data:   Iterable[tuple],
     ):
         """
         Procesa operadores y notarios en la tabla 'persona'.
@@ -211,17 +295,18 @@ class DataConverters:
           (ya no existe grupo_id)
         """
         print("👷 Procesando personas (operadores + notarios)...")
-        op_count = notario_count = errors = 0
+        errors = 0
 
         # ── Operadores ────────────────────────────────────────────────
+        operadores = self._batch('persona', ('ci',), 'ci')
         for row in operadores_data:
-            ci = self._str(row, COLUMN_MAPPING['operadores']['ci'])
+            ci = row.ci
             if not ci:
                 continue
 
-            asiento_nombre = self._str(row, COLUMN_MAPPING['operadores']['asiento_electoral'])
-            recinto_nombre = self._str(row, COLUMN_MAPPING['operadores']['recinto'])
-            recinto_id = self.db.get_recinto_id_by_asiento_and_nombre(
+            asiento_nombre = row.asiento_electoral
+            recinto_nombre = row.recinto
+            recinto_id = self.resolver.get_recinto_id(
                 asiento_nombre, recinto_nombre
             )
             if not recinto_id:
@@ -232,39 +317,40 @@ class DataConverters:
                 errors += 1
                 continue
 
-            coord_ci = self._str(row, COLUMN_MAPPING['operadores']['coordinador_ci'])
+            coord_ci = row.coordinador_ci
             coordinador_id = (
-                self.db.get_id_by_field('coordinador', 'ci', coord_ci)
+                self.resolver.get_id('coordinador', 'ci', coord_ci)
                 if coord_ci else None
             )
 
-            user     = self._str(row, COLUMN_MAPPING['operadores']['user'])     or None
-            password = self._str(row, COLUMN_MAPPING['operadores']['password']) or None
+            user     = row.user     or None
+            password = row.password or None
 
-            self.db.insert_or_update('persona', {
+            operadores.add({
                 'tipo':           'operador',
-                'nombre':         self._str(row, COLUMN_MAPPING['operadores']['nombre']),
+                'nombre':         row.nombre,
                 'ci':             ci,
-                'expedido':       self._str(row, COLUMN_MAPPING['operadores']['expedido']),
-                'celular':        self._str(row, COLUMN_MAPPING['operadores']['celular']),
-                'correo':         self._str(row, COLUMN_MAPPING['operadores']['correo']),
-                'cargo':          self._str(row, COLUMN_MAPPING['operadores']['cargo']),
+                'expedido':       row.expedido,
+                'celular':        row.celular,
+                'correo':         row.correo,
+                'cargo':          row.cargo,
                 'recinto_id':     recinto_id,
                 'coordinador_id': coordinador_id,
                 'user':           user,
                 'password':       password,
-            }, 'ci')
-            op_count += 1
+            })
+        operadores.flush()
 
         # ── Notarios ──────────────────────────────────────────────────
+        notarios = self._batch('persona', ('ci',), 'ci')
         for row in notarios_data:
-            ci = self._str(row, COLUMN_MAPPING['notarios']['ci'])
+            ci = row.ci
             if not ci:
                 continue
 
-            asiento_nombre = self._str(row, COLUMN_MAPPING['notarios']['asiento_electoral'])
-            recinto_nombre = self._str(row, COLUMN_MAPPING['notarios']['recinto'])
-            recinto_id = self.db.get_recinto_id_by_asiento_and_nombre(
+            asiento_nombre = row.asiento_electoral
+            recinto_nombre = row.recinto
+            recinto_id = self.resolver.get_recinto_id(
                 asiento_nombre, recinto_nombre
             )
             if not recinto_id:
@@ -275,39 +361,48 @@ class DataConverters:
                 errors += 1
                 continue
 
-            self.db.insert_or_update('persona', {
+            notarios.add({
                 'tipo':           'notario',
-                'nombre':         self._str(row, COLUMN_MAPPING['notarios']['nombre']),
+                'nombre':         row.nombre,
                 'ci':             ci,
-                'expedido':       self._str(row, COLUMN_MAPPING['notarios']['expedido']),
-                'celular':        self._str(row, COLUMN_MAPPING['notarios']['celular']),
-                'correo':         self._str(row, COLUMN_MAPPING['notarios']['correo']),
-                'cargo':          self._str(row, COLUMN_MAPPING['notarios']['cargo']),
+                'expedido':       row.expedido,
+                'celular':        row.celular,
+                'correo':         row.correo,
+                'cargo':          row.cargo,
                 'recinto_id':     recinto_id,
                 'coordinador_id': None,
                 'user':           None,
                 'password':       None,
-            }, 'ci')
-            notario_count += 1
+            })
+        notarios.flush()
 
         print(
-            f"   ✅ {op_count} operadores, {notario_count} notarios procesados, "
+            f"   ✅ {operadores.count} operadores, {notarios.count} notarios procesados, "
             f"{errors} errores"
         )
 
     # ── ACTAS ─────────────────────────────────────────────────────────
 
-    def convert_actas(self, data: List[Dict[str, Any]]):
+    def convert_actas(self, data: Iterable[tuple]):
         """
         Actas simplificadas: solo codigo + persona_id.
         El recinto se obtiene siempre via persona.recinto_id.
+        Un código repetido en la hoja queda con el último operador.
         """
         print("📄 Procesando actas...")
-        total = asignaciones_ok = errors = 0
+        asignaciones_ok = errors = 0
+        ledger = ActaLedger(
+            lambda rows: self.db.bulk_upsert('acta', rows, ('codigo',), self.chunk_size,
+                                             return_ids=False),
+            lambda rows: self.db.executemany(
+                "UPDATE acta SET persona_id = ? WHERE codigo = ?", rows
+            ),
+            self.chunk_size,
+        )
 
         for row in data:
-            operador_ci = self._str(row, COLUMN_MAPPING['actas']['operador_ci'])
-            codigos_str = self._str(row, COLUMN_MAPPING['actas']['codigos'])
+            operador_ci = row.operador_ci
+            codigos_str = row.codigos
 
             if not operador_ci:
                 errors += 1
@@ -317,75 +412,26 @@ class DataConverters:
                 errors += 1
                 continue
 
-            persona_id = self.db.get_id_by_field('persona', 'ci', operador_ci)
+            persona_id = self.resolver.get_id('persona', 'ci', operador_ci)
             if not persona_id:
                 print(f"   ⚠️  Operador CI '{operador_ci}' no encontrado")
                 errors += 1
                 continue
 
-            codigos = self._separar_codigos(codigos_str)
-            actas_ok = 0
+            codigos = parse_codes(codigos_str)
             for codigo in codigos:
-                if not codigo or not self._validar_codigo(codigo):
-                    continue
-                try:
-                    self.db.insert_or_update('acta', {
-                        'codigo':     codigo,
-                        'persona_id': persona_id,
-                    }, 'codigo')
-                    actas_ok += 1
-                    total += 1
-                except Exception as e:
-                    print(f"   ❌ Error insertando acta '{codigo}': {e}")
-                    errors += 1
-
-            if actas_ok:
+                ledger.claim(codigo, persona_id, operador_ci)
+            if codigos:
                 asignaciones_ok += 1
 
-        print(f"   📊 {total} actas en {asignaciones_ok} asignaciones, {errors} errores")
+        # Cada código una sola vez por lote y sin releer ids
+        ledger.flush()
+        self._report_actas(len(ledger), ledger.repeated, asignaciones_ok, errors)
+        ledger.report()
+
+    def _report_actas(self, total: int, repetidos: int, asignaciones_ok: int, errors: int):
+        detalle = f" ({repetidos} repetidos)" if repetidos else ""
+        print(f"   📊 {total} actas{detalle} en {asignaciones_ok} asignaciones, {errors} errores")
 
     def _warn_fila(self, ci: str, msg: str):
         print(f"   ⚠️  Operador CI {ci}: {msg}")
-
-    # ── HELPERS PRIVADOS ──────────────────────────────────────────────
-
-    def _separar_codigos(self, codigos_str: str) -> List[str]:
-        if not codigos_str or not codigos_str.strip():
-            return []
-
-        # Convertir a string por si Google Sheets lo entregó como número
-        s = str(codigos_str).strip()
-
-        # Caso 1: hay separador explícito → dividir y limpiar vacíos (comas finales)
-        for sep in [",", ";", "|", "\t"]:
-            if sep in s:
-                parts = [c.strip() for c in s.split(sep) if c.strip()]
-                return parts
-
-        # Caso 2: string largo de solo dígitos sin separador
-        # (Google Sheets a veces borra las comas de celdas numéricas)
-        # Intentar dividir en chunks del mismo tamaño probando de 6 a 10 dígitos
-        s_clean = s.replace(" ", "")
-        if len(s_clean) > 10 and s_clean.isdigit():
-            for chunk_size in range(6, 11):
-                if len(s_clean) % chunk_size == 0:
-                    parts = [s_clean[i:i + chunk_size]
-                             for i in range(0, len(s_clean), chunk_size)]
-                    print(f"   ℹ️  Códigos pegados detectados → separados en "
-                          f"{len(parts)} grupos de {chunk_size} dígitos")
-                    return parts
-
-        # Caso 3: código único
-        return [s_clean if s_clean else s]
-
-    def _validar_codigo(self, codigo: str) -> bool:
-        if not codigo or not isinstance(codigo, str):
-            return False
-        c = codigo.strip()
-        if len(c) < 3 or len(c) > 50:
-            return False
-        if not any(ch.isalnum() for ch in c):
-            return False
-        if any(ch in c for ch in ['<', '>', '"', "'", '\\', '/', '?', '*']):
-            return False
-        return True
\ No newline at end of file
@@ -4,26 +4,650 @@
 #   - tabla 'grupo' eliminada: coordinador tiene campo nombre_grupo
 #   - persona.grupo_id → persona.coordinador_id (referencia directa)
 #   - acta: solo codigo + persona_id (sin recinto_id)
+# Cambios v3:
+#   - modo sesión: una sola conexión y una transacción por importación
+#     (session() + savepoint() por etapa); fuera de sesión cada helper
+#     sigue abriendo su propia conexión como antes
+#   - bulk_upsert(): INSERT ... ON CONFLICT DO UPDATE con executemany
+#     por lotes, con la sentencia cacheada por (tabla, columnas)
+#   - tabla huella_fila: huella de cada fila de origen para la
+#     importación incremental (ver delta.py)
+#   - add_trace_callback(): observadores de cada sentencia SQL
+#     ejecutada (benchmark, perfilado); sin observadores no hay traza
+#   - perfiles de conexión (PRAGMA_PROFILES): 'durable' por defecto y
+#     'fast' para cargas masivas (--fast); use_profile() los activa y
+#     restaura el journal_mode anterior al terminar
+#   - DatabaseManager(':memory:') en memoria compartida entre conexiones,
+#     verify() y backup_to() para construir la base aparte (atomic_build.py)
+#   - índices secundarios declarados en INDEXES; en una carga completa
+#     create_schema(defer_indexes=True) los deja para el final y
+#     create_indexes() los crea de una vez y corre ANALYZE
+#   - v_operadores, v_notarios y v_actas materializadas en tablas planas
+#     indexadas (mv_*); refresh_materialized() las reconstruye y anota
+#     filas y hora en mv_refresco
+#   - session(threads=True): la conexión de la sesión puede pasar a
+#     otro hilo (el escritor de --pipeline)
+#   - columna clave (nombre normalizado: records.name_key) en las tablas
+#     de geografía, índices (padre_id, clave) y función SQL
+#     normalizar_clave() en cada conexión; ensure_name_keys() la agrega
+#     y la completa en bases anteriores
+#   - tabla contador mantenida por triggers (COUNTER_TRIGGERS): get_stats()
+#     la lee en una consulta en vez de un COUNT(*) por tabla;
+#     get_breakdown() da los mismos conteos por departamento y por
+#     coordinador; recount() los rehace. En una carga completa los
+#     triggers se difieren como los índices. Solo crear, importar y
+#     recontar crean la tabla y los triggers (ensure_counters/recount):
+#     get_stats/get_breakdown solo leen y fallan si faltan
 # ============================================
 
 import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from itertools import islice
+from typing import (
+    Dict, Any, Optional, Union, Iterator, Tuple, Iterable, List, Sequence, Callable,
+)
 from config import DATABASE_PATH
+from records import name_key
+
+# Filas por executemany en bulk_upsert
+UPSERT_CHUNK_SIZE = 500
+# Límite conservador de parámetros por SELECT (SQLITE_MAX_VARIABLE_NUMBER
+# es 999 en versiones antiguas de SQLite)
+MAX_SQL_PARAMS = 900
+
+# Perfiles de conexión. journal_mode es persistente en el archivo, así
+# que lo aplica/restaura use_profile(); el resto vale por conexión y lo
+# aplica get_connection(). 'durable' son los valores por defecto de
+# SQLite (journal DELETE, synchronous FULL).
+PRAGMA_PROFILES: Dict[str, Dict[str, Any]] = {
+    'durable': {},
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous':  'NORMAL',      # con WAL no corrompe; puede perder el último commit si se corta la luz
+        'cache_size':   -131072,       # 128 MB (negativo = KiB)
+        'temp_store':   'MEMORY',
+        'mmap_size':    268435456,     # 256 MB
+    },
+    # Base que se construye aparte y nadie más lee (atomic_build.py): sin
+    # fsync ni journal en disco. MEMORY y no OFF para que ROLLBACK TO de
+    # un SAVEPOINT siga funcionando.
+    'build': {
+        'journal_mode': 'MEMORY',
+        'synchronous':  'OFF',
+        'cache_size':   -131072,
+        'temp_store':   'MEMORY',
+    },
+}
+DEFAULT_PROFILE = 'durable'
+
+# Huella (hash) de cada fila de origen por hoja y clave natural.
+# Vive aquí porque create_schema la crea, y DeltaTracker la asegura
+# en bases creadas antes de v3.
+FINGERPRINT_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS huella_fila (
+        hoja   TEXT NOT NULL,
+        clave  TEXT NOT NULL,
+        huella TEXT NOT NULL,
+        PRIMARY KEY (hoja, clave)
+    ) WITHOUT ROWID
+"""
+
+# Tablas de geografía: tabla → columna del padre (None = raíz). Cada
+# una tiene una columna clave = normalizar_clave(nombre) para buscar por
+# nombre sin depender de mayúsculas, acentos ni espacios.
+GEO_PARENTS: Dict[str, Optional[str]] = {
+    'departamento':      None,
+    'provincia':         'departamento_id',
+    'municipio':         'provincia_id',
+    'asiento_electoral': 'municipio_id',
+    'recinto':           'asiento_id',
+}
+
+# Índices secundarios: (nombre, tabla, columnas). Los UNIQUE de las
+# tablas no están aquí: los necesita el ON CONFLICT de bulk_upsert
+# durante la carga y SQLite los crea con la tabla.
+INDEXES: List[Tuple[str, str, str]] = [
+    ('idx_persona_ci',          'persona',     'ci'),
+    ('idx_persona_tipo',        'persona',     'tipo'),
+    ('idx_persona_coordinador', 'persona',     'coordinador_id'),
+    ('idx_acta_persona',        'acta',        'persona_id'),
+    ('idx_recinto_asiento',     'recinto',     'asiento_id'),
+    ('idx_coordinador_jefe',    'coordinador', 'jefe_id'),
+    # Búsquedas por nombre normalizado, dentro del padre o sueltas
+    ('idx_departamento_clave',  'departamento',      'clave'),
+    ('idx_provincia_clave',     'provincia',         'departamento_id, clave'),
+    ('idx_municipio_clave',     'municipio',         'provincia_id, clave'),
+    ('idx_asiento_clave',       'asiento_electoral', 'municipio_id, clave'),
+    ('idx_asiento_solo_clave',  'asiento_electoral', 'clave'),
+    ('idx_recinto_clave',       'recinto',           'asiento_id, clave'),
+]
+
+# Tablas con datos de las hojas (contadores, is_empty)
+DATA_TABLES = [
+    'jefe', 'coordinador',
+    'departamento', 'provincia', 'municipio',
+    'asiento_electoral', 'recinto',
+    'persona', 'acta',
+]
+
+# Vistas que se materializan en tablas planas (mv_*) al final de cada
+# importación: el generador de documentos sigue consultando v_operadores,
+# v_notarios y v_actas, que pasan a ser un SELECT * de su tabla mv_*,
+# sin el JOIN de 7-8 tablas en cada consulta.
+MATERIALIZED_VIEWS: Dict[str, str] = {
+    'v_operadores': """
+        SELECT
+            p.id,
+            p.nombre,
+            p.ci,
+            p.celular,
+            p.correo,
+            p.cargo,
+            p.user,
+            c.nombre_grupo  AS grupo,
+            c.nombre        AS coordinador,
+            c.ci            AS coordinador_ci,
+            j.nombre        AS jefe,
+            r.nombre        AS recinto,
+            r.direccion     AS recinto_direccion,
+            ae.nombre       AS asiento_electoral,
+            m.nombre        AS municipio,
+            pr.nombre       AS provincia,
+            d.nombre        AS departamento,
+            CASE WHEN pr.es_urbano = 1 THEN 'urbano' ELSE 'rural' END AS tipo_zona
+        FROM persona p
+        JOIN recinto r            ON p.recinto_id = r.id
+        JOIN asiento_electoral ae ON r.asiento_id = ae.id
+        JOIN municipio m          ON ae.municipio_id = m.id
+        JOIN provincia pr         ON m.provincia_id = pr.id
+        JOIN departamento d       ON pr.departamento_id = d.id
+        LEFT JOIN coordinador c   ON p.coordinador_id = c.id
+        LEFT JOIN jefe j          ON c.jefe_id = j.id
+        WHERE p.tipo = 'operador'
+    """,
+
+    'v_notarios': """
+        SELECT
+            p.id,
+            p.nombre,
+            p.ci,
+            p.celular,
+            p.correo,
+            p.cargo,
+            r.nombre        AS recinto,
+            r.direccion     AS recinto_direccion,
+            ae.nombre       AS asiento_electoral,
+            m.nombre        AS municipio,
+            pr.nombre       AS provincia,
+            d.nombre        AS departamento
+        FROM persona p
+        JOIN recinto r            ON p.recinto_id = r.id
+        JOIN asiento_electoral ae ON r.asiento_id = ae.id
+        JOIN municipio m          ON ae.municipio_id = m.id
+        JOIN provincia pr         ON m.provincia_id = pr.id
+        JOIN departamento d       ON pr.departamento_id = d.id
+        WHERE p.tipo = 'notario'
+    """,
+
+    'v_actas': """
+        SELECT
+            a.id,
+            a.codigo,
+            p.nombre        AS operador,
+            p.ci            AS operador_ci,
+            p.celular       AS operador_celular,
+            c.nombre_grupo  AS grupo,
+            c.nombre        AS coordinador,
+            r.nombre        AS recinto,
+            r.direccion     AS recinto_direccion,
+            ae.nombre       AS asiento_electoral,
+            m.nombre        AS municipio,
+            pr.nombre       AS provincia,
+            d.nombre        AS departamento
+        FROM acta a
+        JOIN persona p            ON a.persona_id = p.id
+        JOIN recinto r            ON p.recinto_id = r.id
+        JOIN asiento_electoral ae ON r.asiento_id = ae.id
+        JOIN municipio m          ON ae.municipio_id = m.id
+        JOIN provincia pr         ON m.provincia_id = pr.id
+        JOIN departamento d       ON pr.departamento_id = d.id
+        LEFT JOIN coordinador c   ON p.coordinador_id = c.id
+    """,
+}
+
+# Índices de cada tabla materializada: una columna o varias separadas
+# por coma ('departamento, codigo')
+MATERIALIZED_INDEXES: Dict[str, List[str]] = {
+    'v_operadores': ['ci', 'user', 'coordinador_ci', 'recinto', 'departamento'],
+    'v_notarios':   ['ci', 'recinto', 'departamento'],
+    'v_actas':      ['codigo', 'operador_ci', 'recinto', 'departamento'],
+}
+
+# Último refresco de cada tabla materializada
+MATERIALIZED_LOG_SQL = """
+    CREATE TABLE IF NOT EXISTS mv_refresco (
+        vista       TEXT PRIMARY KEY,
+        tabla       TEXT NOT NULL,
+        filas       INTEGER NOT NULL,
+        segundos    REAL NOT NULL,
+        actualizado TEXT NOT NULL
+    )
+"""
+
+
+# Contadores de get_stats: ambito 'total' (id 0) con las filas de cada
+# tabla de DATA_TABLES más operadores, notarios y cuentas; ambitos
+# 'departamento' y 'coordinador' (id de la fila) con recintos,
+# operadores, notarios y actas. Los mantienen los triggers de
+# COUNTER_TRIGGERS; recount() los rehace desde las tablas.
+COUNTERS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS contador (
+        ambito TEXT    NOT NULL,
+        id     INTEGER NOT NULL,
+        clave  TEXT    NOT NULL,
+        n      INTEGER NOT NULL,
+        PRIMARY KEY (ambito, id, clave)
+    ) WITHOUT ROWID
+"""
+
+# Contador de personas de cada persona.tipo ('operador' → 'operadores')
+_TIPO_PLURAL = "CASE {0}.tipo WHEN 'operador' THEN 'operadores' ELSE 'notarios' END"
+
+# Departamento de un asiento / de un recinto / de la persona de un acta
+_DEPTO_DE_ASIENTO = """(SELECT pr.departamento_id FROM asiento_electoral ae
+        JOIN municipio m  ON m.id = ae.municipio_id
+        JOIN provincia pr ON pr.id = m.provincia_id
+        WHERE ae.id = {})"""
+_DEPTO_DE_RECINTO = """(SELECT pr.departamento_id FROM recinto r
+        JOIN asiento_electoral ae ON ae.id = r.asiento_id
+        JOIN municipio m          ON m.id = ae.municipio_id
+        JOIN provincia pr         ON pr.id = m.provincia_id
+        WHERE r.id = {})"""
+_ACTAS_DE = "(SELECT COUNT(*) FROM acta WHERE persona_id = {})"
+
+# (recinto_id, departamento_id) de todos los recintos, para recontar
+_RECINTO_DEPTO = """(SELECT r.id AS recinto_id, pr.departamento_id FROM recinto r
+        JOIN asiento_electoral ae ON ae.id = r.asiento_id
+        JOIN municipio m          ON m.id = ae.municipio_id
+        JOIN provincia pr         ON pr.id = m.provincia_id)"""
+
+# Recuento completo de cada ambito (recount() y triggers de geografía)
+COUNTER_RECOUNT: Dict[str, str] = {
+    'total': " UNION ALL ".join(
+        [f"SELECT 'total', 0, '{table}', COUNT(*) FROM {table}" for table in DATA_TABLES] + [
+            f"SELECT 'total', 0, {_TIPO_PLURAL.format('persona')}, COUNT(*) FROM persona GROUP BY tipo",
+            "SELECT 'total', 0, 'cuentas', COUNT(*) FROM persona WHERE user IS NOT NULL",
+        ]
+    ),
+    'departamento': f"""
+        SELECT 'departamento', rd.departamento_id, 'recintos', COUNT(*)
+        FROM {_RECINTO_DEPTO} rd GROUP BY rd.departamento_id
+        UNION ALL
+        SELECT 'departamento', rd.departamento_id, {_TIPO_PLURAL.format('p')}, COUNT(*)
+        FROM persona p JOIN {_RECINTO_DEPTO} rd ON rd.recinto_id = p.recinto_id
+        GROUP BY rd.departamento_id, p.tipo
+        UNION ALL
+        SELECT 'departamento', rd.departamento_id, 'actas', COUNT(*)
+        FROM acta a
+        JOIN persona p ON p.id = a.persona_id
+        JOIN {_RECINTO_DEPTO} rd ON rd.recinto_id = p.recinto_id
+        GROUP BY rd.departamento_id
+    """,
+    'coordinador': f"""
+        SELECT 'coordinador', coordinador_id, {_TIPO_PLURAL.format('persona')}, COUNT(*)
+        FROM persona WHERE coordinador_id IS NOT NULL
+        GROUP BY coordinador_id, tipo
+        UNION ALL
+        SELECT 'coordinador', p.coordinador_id, 'actas', COUNT(*)
+        FROM acta a JOIN persona p ON p.id = a.persona_id
+        WHERE p.coordinador_id IS NOT NULL
+        GROUP BY p.coordinador_id
+    """,
+}
+
+
+def _bump(ambito: str, id_sql: str, clave_sql: str, delta: Union[int, str], cond: str = '') -> str:
+    """Sentencia de trigger: suma delta al contador (ambito, id, clave) si id no es NULL."""
+    where = f"id IS NOT NULL AND {cond}" if cond else "id IS NOT NULL"
+    return (
+        f"INSERT INTO contador (ambito, id, clave, n) "
+        f"SELECT '{ambito}', id, {clave_sql}, {delta} FROM (SELECT {id_sql} AS id) WHERE {where} "
+        f"ON CONFLICT (ambito, id, clave) DO UPDATE SET n = n + excluded.n;"
+    )
+
+
+def _persona_bumps(row: str, sign: str) -> List[str]:
+    """Contadores de una fila de persona (row = NEW u OLD, sign = '' o '-')."""
+    tipo = _TIPO_PLURAL.format(row)
+    return [
+        _bump('total', '0', tipo, f"{sign}1"),
+        _bump('total', '0', "'cuentas'", f"{sign}1", f"{row}.user IS NOT NULL"),
+        _bump('departamento', _DEPTO_DE_RECINTO.format(f"{row}.recinto_id"), tipo, f"{sign}1"),
+        _bump('coordinador', f"{row}.coordinador_id", tipo, f"{sign}1"),
+    ]
+
+
+def _acta_bumps(persona_id: str, sign: str, n: str = '1', cond: str = '') -> List[str]:
+    """Contadores de n actas de una persona por departamento y coordinador."""
+    return [
+        _bump('departamento', _DEPTO_DE_RECINTO.format(
+            f"(SELECT recinto_id FROM persona WHERE id = {persona_id})"
+        ), "'actas'", f"{sign}{n}", cond),
+        _bump('coordinador', f"(SELECT coordinador_id FROM persona WHERE id = {persona_id})",
+              "'actas'", f"{sign}{n}", cond),
+    ]
+
+
+def _counter_triggers() -> Dict[str, str]:
+    """nombre → CREATE TRIGGER de cada trigger que mantiene contador."""
+    cuerpos: Dict[str, Tuple[str, List[str]]] = {}
+    for table in DATA_TABLES:
+        cuerpos[f"trg_conteo_{table}_ins"] = (
+            f"AFTER INSERT ON {table}", [_bump('total', '0', f"'{table}'", 1)]
+        )
+        cuerpos[f"trg_conteo_{table}_del"] = (
+            f"AFTER DELETE ON {table}", [_bump('total', '0', f"'{table}'", -1)]
+        )
+
+    cuerpos['trg_conteo_recinto_ins'][1].append(
+        _bump('departamento', _DEPTO_DE_ASIENTO.format('NEW.asiento_id'), "'recintos'", 1))
+    cuerpos['trg_conteo_recinto_del'][1].append(
+        _bump('departamento', _DEPTO_DE_ASIENTO.format('OLD.asiento_id'), "'recintos'", -1))
+    cuerpos['trg_conteo_persona_ins'][1].extend(_persona_bumps('NEW', ''))
+    cuerpos['trg_conteo_persona_del'][1].extend(_persona_bumps('OLD', '-'))
+    cuerpos['trg_conteo_acta_ins'][1].extend(_acta_bumps('NEW.persona_id', ''))
+    cuerpos['trg_conteo_acta_del'][1].extend(_acta_bumps('OLD.persona_id', '-'))
+
+    # Una persona que cambia de tipo, cuenta, recinto o coordinador: se
+    # descuenta la fila anterior y se cuenta la nueva; sus actas se mueven
+    # si cambió el recinto o el coordinador
+    cambio_actas = "(OLD.recinto_id IS NOT NEW.recinto_id OR OLD.coordinador_id IS NOT NEW.coordinador_id)"
+    cuerpos['trg_conteo_persona_upd'] = (
+        "AFTER UPDATE OF tipo, user, recinto_id, coordinador_id ON persona "
+        "WHEN OLD.tipo IS NOT NEW.tipo OR (OLD.user IS NULL) <> (NEW.user IS NULL) "
+        "OR OLD.recinto_id IS NOT NEW.recinto_id OR OLD.coordinador_id IS NOT NEW.coordinador_id",
+        _persona_bumps('OLD', '-') + _persona_bumps('NEW', '') + [
+            _bump('departamento', _DEPTO_DE_RECINTO.format('OLD.recinto_id'), "'actas'",
+                  f"-{_ACTAS_DE.format('OLD.id')}", cambio_actas),
+            _bump('departamento', _DEPTO_DE_RECINTO.format('NEW.recinto_id'), "'actas'",
+                  _ACTAS_DE.format('NEW.id'), cambio_actas),
+            _bump('coordinador', 'OLD.coordinador_id', "'actas'",
+                  f"-{_ACTAS_DE.format('OLD.id')}", cambio_actas),
+            _bump('coordinador', 'NEW.coordinador_id', "'actas'",
+                  _ACTAS_DE.format('NEW.id'), cambio_actas),
+        ],
+    )
+    cuerpos['trg_conteo_acta_upd'] = (
+        "AFTER UPDATE OF persona_id ON acta WHEN OLD.persona_id IS NOT NEW.persona_id",
+        _acta_bumps('OLD.persona_id', '-') + _acta_bumps('NEW.persona_id', ''),
+    )
+
+    # Geografía que cambia de padre (las importaciones no lo hacen: el
+    # padre es parte de la clave única): se recuenta el ambito departamento
+    for table, parent in GEO_PARENTS.items():
+        if parent is None:
+            continue
+        cuerpos[f"trg_conteo_{table}_upd"] = (
+            f"AFTER UPDATE OF {parent} ON {table} WHEN OLD.{parent} IS NOT NEW.{parent}",
+            [
+                "DELETE FROM contador WHERE ambito = 'departamento';",
+                f"INSERT INTO contador (ambito, id, clave, n) "
+                f"{COUNTER_RECOUNT['departamento']};",
+            ],
+        )
+
+    return {
+        name: f"CREATE TRIGGER IF NOT EXISTS {name} {evento}\nBEGIN\n    "
+              + "\n    ".join(sentencias) + "\nEND"
+        for name, (evento, sentencias) in cuerpos.items()
+    }
+
+
+COUNTER_TRIGGERS: Dict[str, str] = _counter_triggers()
+
+# Claves del ambito 'total' (get_stats devuelve 0 en las que no tengan fila)
+STAT_KEYS = DATA_TABLES + ['operadores', 'notarios', 'cuentas']
+# Claves de cada desglose (get_breakdown)
+BREAKDOWN_KEYS: Dict[str, List[str]] = {
+    'departamento': ['recintos', 'operadores', 'notarios', 'actas'],
+    'coordinador':  ['operadores', 'notarios', 'actas'],
+}
+
+
+def materialized_table(view: str) -> str:
+    """v_actas → mv_actas"""
+    return 'mv_' + view[len('v_'):]
+
+
+MEMORY = ':memory:'
 
 
 class DatabaseManager:
     def __init__(self, db_path: str = DATABASE_PATH):
         self.db_path = Path(db_path)
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._memory_uri: Optional[str] = None
+        self._keeper: Optional[sqlite3.Connection] = None
+        if str(db_path) == MEMORY:
+            # Cada helper abre su propia conexión: con ':memory:' cada una
+            # vería una base vacía distinta. Se usa una base en memoria con
+            # caché compartida, viva mientras _keeper siga abierta.
+            self._memory_uri = f"file:gs2sqlite-{id(self)}?mode=memory&cache=shared"
+            self._keeper = sqlite3.connect(self._memory_uri, uri=True)
+        else:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._session: Optional[sqlite3.Connection] = None
+        self._upsert_sql: Dict[Tuple, str] = {}
+        self._trace_callbacks: List[Callable[[str], None]] = []
+        self._counters_ready = False
+        self.profile = DEFAULT_PROFILE
         print(f"Base de datos: {self.db_path}")
 
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+    def get_connection(self, check_same_thread: bool = True):
+        if self._memory_uri:
+            conn = sqlite3.connect(self._memory_uri, uri=True, check_same_thread=check_same_thread)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        if self._trace_callbacks:
+            conn.set_trace_callback(self._trace)
+        conn.create_function('normalizar_clave', 1, name_key, deterministic=True)
         conn.execute("PRAGMA foreign_keys = ON")
+        for pragma, value in PRAGMA_PROFILES[self.profile].items():
+            if pragma != 'journal_mode':
+                conn.execute(f"PRAGMA {pragma} = {value}")
         return conn
 
-    def create_schema(self):
+    # ── PERFILES DE CONEXIÓN ──────────────────────────────────────────
+
+    @contextmanager
+    def use_profile(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Activa un perfil de PRAGMA_PROFILES para las conexiones abiertas
+        dentro del bloque. Al salir vuelve al perfil anterior y, si se
+        cambió el journal_mode (p. ej. a WAL), hace checkpoint y lo
+        restaura. Devuelve los PRAGMAs efectivos.
+        """
+        if name not in PRAGMA_PROFILES:
+            raise ValueError(f"Perfil desconocido: '{name}' (usa {', '.join(PRAGMA_PROFILES)})")
+        if self._session is not None:
+            raise RuntimeError("No se puede cambiar de perfil con una sesión abierta")
+
+        anterior = self.profile
+        journal = PRAGMA_PROFILES[name].get('journal_mode')
+        journal_previo = None
+        if journal:
+            conn = self.get_connection()
+            try:
+                journal_previo = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                conn.execute(f"PRAGMA journal_mode = {journal}")
+            finally:
+                conn.close()
+
+        self.profile = name
+        try:
+            yield self.pragmas()
+        finally:
+            self.profile = anterior
+            if journal and journal_previo and journal_previo.lower() != journal.lower():
+                conn = self.get_connection()
+                try:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    conn.execute(f"PRAGMA journal_mode = {journal_previo}")
+                except sqlite3.Error as e:
+                    print(f"  ⚠️  No se pudo restaurar journal_mode={journal_previo}: {e}")
+                finally:
+                    conn.close()
+
+    def pragmas(self) -> Dict[str, Any]:
+        """Valores efectivos de los PRAGMAs de los perfiles en una conexión nueva."""
+        nombres = {
+            'journal_mode': None,
+            'synchronous':  {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+            'cache_size':   None,
+            'temp_store':   {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+            'mmap_size':    None,
+        }
+        conn = self.get_connection()
+        try:
+            valores = {}
+            for pragma, etiquetas in nombres.items():
+                row = conn.execute(f"PRAGMA {pragma}").fetchone()
+                valor = row[0] if row else None
+                valores[pragma] = etiquetas.get(valor, valor) if etiquetas else valor
+            return valores
+        finally:
+            conn.close()
+
+    # ── TRAZA DE SENTENCIAS ───────────────────────────────────────────
+
+    def add_trace_callback(self, callback: Callable[[str], None]):
+        """
+        Registra callback(sql) para cada sentencia que ejecuten las
+        conexiones de este manager (executemany cuenta una por fila).
+        Aplica a las conexiones nuevas y a la sesión activa.
+        """
+        self._trace_callbacks.append(callback)
+        if self._session is not None:
+            self._session.set_trace_callback(self._trace)
+
+    def remove_trace_callback(self, callback: Callable[[str], None]):
+        if callback in self._trace_callbacks:
+            self._trace_callbacks.remove(callback)
+        if not self._trace_callbacks and self._session is not None:
+            self._session.set_trace_callback(None)
+
+    def _trace(self, sql: str):
+        for callback in list(self._trace_callbacks):
+            callback(sql)
+
+    # ── SESIÓN / UNIDAD DE TRABAJO ────────────────────────────────────
+
+    @contextmanager
+    def session(self, threads: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Abre una conexión compartida y una única transacción.
+        Todos los helpers llamados dentro del bloque la reutilizan;
+        se hace COMMIT al salir y ROLLBACK si hay excepción.
+        Reentrante: una sesión anidada reutiliza la exterior.
+        threads=True permite usarla desde otro hilo (de a uno por vez,
+        como el escritor de pipeline.py).
+        """
+        if self._session is not None:
+            yield self._session
+            return
+
+        conn = self.get_connection(check_same_thread=not threads)
+        conn.isolation_level = None        # transacciones explícitas
+        conn.execute("BEGIN")
+        self._session = conn
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            self._counters_ready = False      # pudo deshacer triggers recién creados
+            raise
+        finally:
+            self._session = None
+            conn.close()
+
+    @contextmanager
+    def savepoint(self, name: str) -> Iterator[None]:
+        """
+        SAVEPOINT dentro de la sesión activa: si el bloque falla, se
+        deshacen solo sus cambios y la excepción se propaga.
+        Fuera de sesión no hace nada (cada helper ya es atómico).
+        """
+        conn = self._session
+        if conn is None:
+            yield
+            return
+
+        sp = '"' + name.replace('"', '""') + '"'
+        conn.execute(f"SAVEPOINT {sp}")
+        try:
+            yield
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {sp}")
+            conn.execute(f"RELEASE {sp}")
+            raise
+        conn.execute(f"RELEASE {sp}")
+
+    @contextmanager
+    def _conexion(self) -> Iterator[sqlite3.Connection]:
+        """Conexión para un helper: la de la sesión o una propia (commit + close)."""
+        if self._session is not None:
+            yield self._session
+            return
+
+        conn = self.get_connection()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # ── VERIFICACIÓN / COPIA ──────────────────────────────────────────
+
+    def verify(self) -> List[str]:
+        """
+        PRAGMA integrity_check + foreign_key_check.
+        Devuelve los problemas encontrados (lista vacía = base sana).
+        """
+        with self._conexion() as conn:
+            problemas = [
+                row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()
+                if row[0] != 'ok'
+            ]
+            for tabla, rowid, padre, _ in conn.execute("PRAGMA foreign_key_check").fetchall():
+                problemas.append(f"{tabla} rowid {rowid}: referencia inexistente a {padre}")
+        return problemas
+
+    def backup_to(self, target: Union[str, Path, 'DatabaseManager']):
+        """Copia la base completa con la API de backup de SQLite."""
+        src = self.get_connection()
+        dst = target.get_connection() if isinstance(target, DatabaseManager) else sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+    def close(self):
+        """Libera la base en memoria (no hace nada con bases en archivo)."""
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+    def create_schema(self, defer_indexes: bool = False):
+        """
+        Tablas y vistas. Con defer_indexes=True (carga completa sobre una
+        base vacía) no crea los índices de INDEXES y quita los que hubiera:
+        cada INSERT de la carga no tiene que mantenerlos y create_indexes()
+        los arma al final de una sola pasada por tabla.
+        """
         tables_sql = {
 
             # ── ORGANIZACIÓN ──────────────────────────────────────────
@@ -57,7 +681,8 @@ class DatabaseManager:
             'departamento': """
                 CREATE TABLE IF NOT EXISTS departamento (
                     id     INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nombre TEXT NOT NULL UNIQUE
+                    nombre TEXT NOT NULL UNIQUE,
+                    clave  TEXT NOT NULL DEFAULT ''
                 )
             """,
 
@@ -65,6 +690,7 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS provincia (
                     id              INTEGER PRIMARY KEY AUTOINCREMENT,
                     nombre          TEXT NOT NULL,
+                    clave           TEXT NOT NULL DEFAULT '',
                     departamento_id INTEGER NOT NULL,
                     es_urbano       BOOLEAN DEFAULT 0,
                     UNIQUE(departamento_id, nombre),
@@ -76,6 +702,7 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS municipio (
                     id           INTEGER PRIMARY KEY AUTOINCREMENT,
                     nombre       TEXT NOT NULL,
+                    clave        TEXT NOT NULL DEFAULT '',
                     provincia_id INTEGER NOT NULL,
                     UNIQUE(provincia_id, nombre),
                     FOREIGN KEY (provincia_id) REFERENCES provincia(id)
@@ -86,6 +713,7 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS asiento_electoral (
                     id           INTEGER PRIMARY KEY AUTOINCREMENT,
                     nombre       TEXT NOT NULL,
+                    clave        TEXT NOT NULL DEFAULT '',
                     municipio_id INTEGER NOT NULL,
                     UNIQUE(municipio_id, nombre),
                     FOREIGN KEY (municipio_id) REFERENCES municipio(id)
@@ -96,6 +724,7 @@ class DatabaseManager:
                 CREATE TABLE IF NOT EXISTS recinto (
                     id         INTEGER PRIMARY KEY AUTOINCREMENT,
                     nombre     TEXT NOT NULL,
+                    clave      TEXT NOT NULL DEFAULT '',
                     direccion  TEXT,
                     distrito   INTEGER DEFAULT 0,
                     asiento_id INTEGER NOT NULL,
@@ -136,102 +765,16 @@ class DatabaseManager:
                     FOREIGN KEY (persona_id) REFERENCES persona(id)
                 )
             """,
-        }
 
-        # ── ÍNDICES ───────────────────────────────────────────────────
-        indexes_sql = [
-            "CREATE INDEX IF NOT EXISTS idx_persona_ci         ON persona(ci)",
-            "CREATE INDEX IF NOT EXISTS idx_persona_tipo       ON persona(tipo)",
-            "CREATE INDEX IF NOT EXISTS idx_persona_coordinador ON persona(coordinador_id)",
-            "CREATE INDEX IF NOT EXISTS idx_acta_persona       ON acta(persona_id)",
-            "CREATE INDEX IF NOT EXISTS idx_recinto_asiento    ON recinto(asiento_id)",
-            "CREATE INDEX IF NOT EXISTS idx_coordinador_jefe   ON coordinador(jefe_id)",
-        ]
+            # ── IMPORTACIÓN INCREMENTAL ───────────────────────────────
+            'huella_fila': FINGERPRINT_TABLE_SQL,
+
+            # ── VISTAS MATERIALIZADAS ─────────────────────────────────
+            'mv_refresco': MATERIALIZED_LOG_SQL,
+        }
 
         # ── VISTAS ────────────────────────────────────────────────────
         views_sql = {
-            'v_operadores': """
-                CREATE VIEW IF NOT EXISTS v_operadores AS
-                SELECT
-                    p.id,
-                    p.nombre,
-                    p.ci,
-                    p.celular,
-                    p.correo,
-                    p.cargo,
-                    p.user,
-                    c.nombre_grupo  AS grupo,
-                    c.nombre        AS coordinador,
-                    c.ci            AS coordinador_ci,
-                    j.nombre        AS jefe,
-                    r.nombre        AS recinto,
-                    r.direccion     AS recinto_direccion,
-                    ae.nombre       AS asiento_electoral,
-                    m.nombre        AS municipio,
-                    pr.nombre       AS provincia,
-                    d.nombre        AS departamento,
-                    CASE WHEN pr.es_urbano = 1 THEN 'urbano' ELSE 'rural' END AS tipo_zona
-                FROM persona p
-                JOIN recinto r            ON p.recinto_id = r.id
-                JOIN asiento_electoral ae ON r.asiento_id = ae.id
-                JOIN municipio m          ON ae.municipio_id = m.id
-                JOIN provincia pr         ON m.provincia_id = pr.id
-                JOIN departamento d       ON pr.departamento_id = d.id
-                LEFT JOIN coordinador c   ON p.coordinador_id = c.id
-                LEFT JOIN jefe j          ON c.jefe_id = j.id
-                WHERE p.tipo = 'operador'
-            """,
-
-            'v_notarios': """
-                CREATE VIEW IF NOT EXISTS v_notarios AS
-                SELECT
-                    p.id,
-                    p.nombre,
-                    p.ci,
-                    p.celular,
-                    p.correo,
-                    p.cargo,
-                    r.nombre        AS recinto,
-                    r.direccion     AS recinto_direccion,
-                    ae.nombre       AS asiento_electoral,
-                    m.nombre        AS municipio,
-                    pr.nombre       AS provincia,
-                    d.nombre        AS departamento
-                FROM persona p
-                JOIN recinto r            ON p.recinto_id = r.id
-                JOIN asiento_electoral ae ON r.asiento_id = ae.id
-                JOIN municipio m          ON ae.municipio_id = m.id
-                JOIN provincia pr         ON m.provincia_id = pr.id
-                JOIN departamento d       ON pr.departamento_id = d.id
-                WHERE p.tipo = 'notario'
-            """,
-
-            'v_actas': """
-                CREATE VIEW IF NOT EXISTS v_actas AS
-                SELECT
-                    a.id,
-                    a.codigo,
-                    p.nombre        AS operador,
-                    p.ci            AS operador_ci,
-                    p.celular       AS operador_celular,
-                    c.nombre_grupo  AS grupo,
-                    c.nombre        AS coordinador,
-                    r.nombre        AS recinto,
-                    r.direccion     AS recinto_direccion,
-                    ae.nombre       AS asiento_electoral,
-                    m.nombre        AS municipio,
-                    pr.nombre       AS provincia,
-                    d.nombre        AS departamento
-                FROM acta a
-                JOIN persona p            ON a.persona_id = p.id
-                JOIN recinto r            ON p.recinto_id = r.id
-                JOIN asiento_electoral ae ON r.asiento_id = ae.id
-                JOIN municipio m          ON ae.municipio_id = m.id
-                JOIN provincia pr         ON m.provincia_id = pr.id
-                JOIN departamento d       ON pr.departamento_id = d.id
-                LEFT JOIN coordinador c   ON p.coordinador_id = c.id
-            """,
-
             'v_recintos': """
                 CREATE VIEW IF NOT EXISTS v_recintos AS
                 SELECT
@@ -270,26 +813,216 @@ class DatabaseManager:
             """,
         }
 
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             for table_name, sql in tables_sql.items():
                 conn.execute(sql)
                 print(f"  ✅ Tabla '{table_name}' lista")
-            for idx_sql in indexes_sql:
-                conn.execute(idx_sql)
-            print(f"  ✅ Índices creados")
             for view_name, sql in views_sql.items():
                 conn.execute(sql)
                 print(f"  ✅ Vista '{view_name}' lista")
+            self._ensure_materialized(conn)
+            for view_name in MATERIALIZED_VIEWS:
+                print(f"  ✅ Vista '{view_name}' lista (sobre {materialized_table(view_name)})")
+            self._ensure_name_keys(conn)
 
+        if defer_indexes:
+            self.drop_indexes()
+            self.drop_counters()
+            print(f"  ⏳ Índices diferidos hasta terminar la carga ({len(INDEXES)})")
+            print(f"  ⏳ Contadores diferidos hasta terminar la carga ({len(COUNTER_TRIGGERS)} triggers)")
+        else:
+            self.create_indexes(analyze=False)
+            self.ensure_counters()
         print("✅ Esquema listo")
 
+    def ensure_name_keys(self):
+        """Agrega y completa la columna clave en bases creadas antes de tenerla."""
+        with self._conexion() as conn:
+            self._ensure_name_keys(conn)
+
+    def _ensure_name_keys(self, conn: sqlite3.Connection):
+        existentes = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        }
+        for table in GEO_PARENTS:
+            if table not in existentes:
+                continue
+            columnas = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if 'clave' in columnas:
+                continue
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN clave TEXT NOT NULL DEFAULT ''")
+            n = conn.execute(f"UPDATE {table} SET clave = normalizar_clave(nombre)").rowcount
+            for name, index_table, columns in INDEXES:
+                if index_table == table and 'clave' in columns:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            print(f"  🔑 {table}: columna clave agregada ({n} filas)")
+
+    def create_indexes(self, analyze: bool = True):
+        """Crea los índices de INDEXES que falten y actualiza las estadísticas."""
+        with self._conexion() as conn:
+            for name, table, columns in INDEXES:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+            print(f"  ✅ Índices creados ({len(INDEXES)})")
+            if analyze:
+                # Estadísticas para el planificador con los datos ya cargados
+                conn.execute("ANALYZE")
+                print("  ✅ Estadísticas actualizadas (ANALYZE)")
+
+    def drop_indexes(self):
+        with self._conexion() as conn:
+            for name, _, _ in INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    # ── CONTADORES ────────────────────────────────────────────────────
+
+    def ensure_counters(self):
+        """
+        Crea la tabla contador y los triggers que falten. Si faltaba
+        alguno (base anterior, o carga completa con create_schema(
+        defer_indexes=True)) los contadores se recuentan desde las tablas.
+        """
+        with self._conexion() as conn:
+            self._ensure_counters(conn)
+
+    def _ensure_counters(self, conn: sqlite3.Connection):
+        if self._counters_ready:
+            return
+        conn.execute(COUNTERS_TABLE_SQL)
+        faltan = self._counters_missing(conn)
+        if faltan:
+            for name in faltan:
+                conn.execute(COUNTER_TRIGGERS[name])
+            filas = self._recount(conn)
+            print(f"  🧮 Contadores recalculados ({filas} contadores, {len(faltan)} triggers creados)")
+        self._counters_ready = True
+
+    def counters_missing(self) -> List[str]:
+        """Tabla contador y triggers de COUNTER_TRIGGERS que no existen (solo lee)."""
+        with self._conexion() as conn:
+            return self._counters_missing(conn)
+
+    def _counters_missing(self, conn: sqlite3.Connection) -> List[str]:
+        existentes = {
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+            )
+        }
+        return [name for name in ('contador', *COUNTER_TRIGGERS) if name not in existentes]
+
+    def _check_counters(self, conn: sqlite3.Connection):
+        """Los lectores no crean nada: sin tabla o sin triggers los conteos no valen."""
+        faltan = self._counters_missing(conn)
+        if faltan:
+            raise RuntimeError(
+                f"Faltan {len(faltan)} de {1 + len(COUNTER_TRIGGERS)} objetos de contador "
+                f"({', '.join(faltan[:3])}{', …' if len(faltan) > 3 else ''}); "
+                "créalos con el comando recontar"
+            )
+
+    def drop_counters(self):
+        """Quita los triggers de contador (carga completa: se recuenta al final)."""
+        self._counters_ready = False
+        with self._conexion() as conn:
+            for name in COUNTER_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    def recount(self) -> int:
+        """Rehace todos los contadores desde las tablas. Devuelve cuántos hay."""
+        with self.session() as conn:
+            conn.execute(COUNTERS_TABLE_SQL)
+            for sql in COUNTER_TRIGGERS.values():
+                conn.execute(sql)
+            filas = self._recount(conn)
+        self._counters_ready = True
+        return filas
+
+    def _recount(self, conn: sqlite3.Connection) -> int:
+        conn.execute("DELETE FROM contador")
+        for sql in COUNTER_RECOUNT.values():
+            conn.execute(f"INSERT INTO contador (ambito, id, clave, n) {sql}")
+        return conn.execute("SELECT COUNT(*) FROM contador").fetchone()[0]
+
+    # ── VISTAS MATERIALIZADAS ─────────────────────────────────────────
+
+    def _materialize(self, conn: sqlite3.Connection, view: str, empty: bool = False):
+        """(Re)crea la tabla mv_* de una vista con sus índices."""
+        table = materialized_table(view)
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        where = " WHERE 0" if empty else ""
+        conn.execute(f"CREATE TABLE {table} AS SELECT * FROM ({MATERIALIZED_VIEWS[view]}){where}")
+        for columns in MATERIALIZED_INDEXES[view]:
+            name = '_'.join(c.strip() for c in columns.split(','))
+            conn.execute(f"CREATE INDEX idx_{table}_{name} ON {table}({columns})")
+
+    def _ensure_materialized(self, conn: sqlite3.Connection):
+        """
+        Crea (vacías) las tablas mv_* que falten y deja cada vista como
+        SELECT * de su tabla. En bases anteriores la vista todavía es el
+        JOIN original: se reemplaza.
+        """
+        existentes = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type IN ('table', 'view')"
+        ).fetchall())
+        conn.execute(MATERIALIZED_LOG_SQL)
+        for view in MATERIALIZED_VIEWS:
+            table = materialized_table(view)
+            if table not in existentes:
+                self._materialize(conn, view, empty=True)
+            if table not in (existentes.get(view) or ''):
+                conn.execute(f"DROP VIEW IF EXISTS {view}")
+                conn.execute(f"CREATE VIEW {view} AS SELECT * FROM {table}")
+
+    def refresh_materialized(self) -> Dict[str, int]:
+        """
+        Reconstruye todas las tablas mv_* desde las tablas base en una sola
+        transacción (la de la sesión, si hay una): quien lea las vistas ve
+        los datos anteriores o los nuevos, nunca una mezcla.
+        Devuelve las filas de cada vista.
+        """
+        filas = {}
+        with self.session() as conn:
+            self._ensure_materialized(conn)
+            for view in MATERIALIZED_VIEWS:
+                inicio = time.perf_counter()
+                self._materialize(conn, view)
+                table = materialized_table(view)
+                filas[view] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                conn.execute(
+                    "INSERT OR REPLACE INTO mv_refresco (vista, tabla, filas, segundos, actualizado) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (view, table, filas[view], round(time.perf_counter() - inicio, 3),
+                     datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                )
+        return filas
+
+    def materialized_status(self) -> List[Dict[str, Any]]:
+        """Último refresco de cada vista materializada (vacío si nunca se refrescó)."""
+        with self._conexion() as conn:
+            conn.execute(MATERIALIZED_LOG_SQL)
+            cursor = conn.execute(
+                "SELECT vista, tabla, filas, segundos, actualizado FROM mv_refresco ORDER BY vista"
+            )
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, row)) for row in cursor.fetchall()]
+
+    def is_empty(self) -> bool:
+        """True si ninguna tabla de datos existe o tiene filas (carga completa)."""
+        with self._conexion() as conn:
+            existentes = {
+                row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+            return not any(
+                conn.execute(f"SELECT EXISTS (SELECT 1 FROM {table})").fetchone()[0]
+                for table in DATA_TABLES if table in existentes
+            )
+
     # ── HELPERS ───────────────────────────────────────────────────────
 
     def insert_or_update(self, table: str, data: Dict[str, Any], unique_field: str) -> int:
         if not data or unique_field not in data:
             raise ValueError(f"Campo único '{unique_field}' no en datos")
 
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute(
@@ -324,13 +1057,124 @@ class DatabaseManager:
                 print(f"  ⚠️  Error en {table}: {e}")
                 raise
 
+    def query(self, sql: str, params: Sequence[Any] = ()) -> List[tuple]:
+        """Ejecuta una sentencia y devuelve todas sus filas."""
+        with self._conexion() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]) -> int:
+        """executemany en la conexión actual; devuelve filas afectadas."""
+        with self._conexion() as conn:
+            return conn.executemany(sql, seq_of_params).rowcount
+
+    def bulk_upsert(
+        self,
+        table: str,
+        rows: Iterable[Dict[str, Any]],
+        conflict_columns: Sequence[str],
+        chunk_size: int = UPSERT_CHUNK_SIZE,
+        return_ids: bool = True,
+    ) -> Dict[Tuple, int]:
+        """
+        Inserta o actualiza muchas filas con una sola sentencia
+        INSERT ... ON CONFLICT(conflict_columns) DO UPDATE, enviada con
+        executemany en lotes de chunk_size.
+
+        conflict_columns debe coincidir con una restricción UNIQUE de la
+        tabla. Devuelve {tupla de valores de conflict_columns: id} para
+        todas las filas afectadas, tal como quedaron guardados
+        (return_ids=False se saltea esa lectura y devuelve {}).
+        """
+        conflict = tuple(conflict_columns)
+        ids: Dict[Tuple, int] = {}
+        rows = iter(rows)
+
+        with self._conexion() as conn:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                # Normalmente todas las filas traen las mismas columnas,
+                # pero se agrupan por si alguna viene distinta
+                groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+                for row in chunk:
+                    groups.setdefault(tuple(row), []).append(row)
+
+                try:
+                    for columns, group in groups.items():
+                        missing = [c for c in conflict if c not in columns]
+                        if missing:
+                            raise ValueError(f"Campos únicos {missing} no en datos")
+                        conn.executemany(
+                            self._get_upsert_sql(table, columns, conflict),
+                            [tuple(r[c] for c in columns) for r in group],
+                        )
+                except sqlite3.IntegrityError as e:
+                    print(f"  ⚠️  Integridad en {table}: {e}")
+                    raise
+                except sqlite3.Error as e:
+                    print(f"  ⚠️  Error en {table}: {e}")
+                    raise
+
+                if not return_ids:
+                    continue
+                keys = list(dict.fromkeys(tuple(r[c] for c in conflict) for r in chunk))
+                ids.update(self._ids_by_keys(conn, table, conflict, keys))
+        return ids
+
+    def _get_upsert_sql(
+        self, table: str, columns: Tuple[str, ...], conflict: Tuple[str, ...]
+    ) -> str:
+        cache_key = (table, columns, conflict)
+        sql = self._upsert_sql.get(cache_key)
+        if sql is None:
+            update_cols = [c for c in columns if c not in conflict]
+            if update_cols:
+                action = "DO UPDATE SET " + ", ".join(
+                    f"{c} = excluded.{c}" for c in update_cols
+                )
+            else:
+                action = "DO NOTHING"
+            sql = (
+                f"INSERT INTO {table} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT({', '.join(conflict)}) {action}"
+            )
+            self._upsert_sql[cache_key] = sql
+        return sql
+
+    def _ids_by_keys(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        conflict: Tuple[str, ...],
+        keys: List[Tuple],
+    ) -> Dict[Tuple, int]:
+        """SELECT por claves naturales, en lotes que respetan MAX_SQL_PARAMS."""
+        ids: Dict[Tuple, int] = {}
+        width = len(conflict)
+        step = max(1, MAX_SQL_PARAMS // width)
+        cols = ", ".join(conflict)
+        for start in range(0, len(keys), step):
+            batch = keys[start:start + step]
+            if width == 1:
+                where = f"{conflict[0]} IN ({', '.join('?' for _ in batch)})"
+            else:
+                tuple_sql = "(" + ", ".join("?" for _ in conflict) + ")"
+                where = f"({cols}) IN (VALUES {', '.join(tuple_sql for _ in batch)})"
+            params = [v for key in batch for v in key]
+            for row in conn.execute(f"SELECT {cols}, id FROM {table} WHERE {where}", params):
+                ids[tuple(row[:width])] = row[width]
+        return ids
+
     def get_id_by_field(self, table: str, field: str, value: Union[str, int]) -> Optional[int]:
         if value is None:
             return None
         search = str(value).strip()
         if not search:
             return None
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             cursor.execute(f"SELECT id FROM {table} WHERE {field} = ? LIMIT 1", (search,))
             result = cursor.fetchone()
@@ -341,20 +1185,38 @@ class DatabaseManager:
     ) -> Optional[int]:
         if not asiento_nombre or not recinto_nombre:
             return None
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT r.id
-                FROM recinto r
-                JOIN asiento_electoral ae ON r.asiento_id = ae.id
-                WHERE ae.nombre = ? AND r.nombre = ?
-                LIMIT 1
-            """, (asiento_nombre.strip(), recinto_nombre.strip()))
+                SELECT MIN(r.id)
+                FROM asiento_electoral ae
+                JOIN recinto r ON r.asiento_id = ae.id AND r.clave = ?
+                WHERE ae.clave = ?
+            """, (name_key(recinto_nombre), name_key(asiento_nombre)))
             result = cursor.fetchone()
             return result[0] if result else None
 
+    def load_id_map(self, table: str, field: str) -> Dict[str, int]:
+        """
+        Carga {valor: id} de toda la tabla en una sola consulta.
+        Si el valor se repite gana el id más bajo, igual que get_id_by_field.
+        """
+        id_map: Dict[str, int] = {}
+        with self._conexion() as conn:
+            for value, row_id in conn.execute(
+                f"SELECT {field}, id FROM {table} WHERE {field} IS NOT NULL ORDER BY id"
+            ):
+                id_map.setdefault(str(value).strip(), row_id)
+        return id_map
+
+    def load_geo_level(self, table: str) -> List[Tuple[int, Optional[int], str]]:
+        """(id, padre_id, clave) de una tabla de GEO_PARENTS, por id (para GeoIndex)."""
+        parent = GEO_PARENTS[table] or 'NULL'
+        with self._conexion() as conn:
+            return conn.execute(f"SELECT id, {parent}, clave FROM {table} ORDER BY id").fetchall()
+
     def insert_record(self, table: str, data: Dict[str, Any]) -> int:
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             fields = ", ".join(data.keys())
             placeholders = ", ".join("?" for _ in data)
@@ -365,7 +1227,7 @@ class DatabaseManager:
             return cursor.lastrowid
 
     def update_record(self, table: str, data: Dict[str, Any], record_id: int) -> bool:
-        with self.get_connection() as conn:
+        with self._conexion() as conn:
             cursor = conn.cursor()
             fields = ", ".join(f"{k} = ?" for k in data)
             values = list(data.values()) + [record_id]
@@ -373,22 +1235,35 @@ class DatabaseManager:
             return cursor.rowcount > 0
 
     def get_stats(self) -> Dict[str, int]:
-        tables = [
-            'jefe', 'coordinador',
-            'departamento', 'provincia', 'municipio',
-            'asiento_electoral', 'recinto',
-            'persona', 'acta',
-        ]
-        stats = {}
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            for table in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                stats[table] = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM persona WHERE tipo = 'operador'")
-            stats['operadores'] = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM persona WHERE tipo = 'notario'")
-            stats['notarios'] = cursor.fetchone()[0]
-            cursor.execute("SELECT COUNT(*) FROM persona WHERE user IS NOT NULL")
-            stats['cuentas'] = cursor.fetchone()[0]
-        return stats
\ No newline at end of file
+        """Filas de cada tabla de datos + operadores, notarios y cuentas (tabla contador)."""
+        stats = dict.fromkeys(STAT_KEYS, 0)
+        with self._conexion() as conn:
+            self._check_counters(conn)
+            stats.update(conn.execute(
+                "SELECT clave, n FROM contador WHERE ambito = 'total'"
+            ).fetchall())
+        return stats
+
+    def get_breakdown(self, ambito: str) -> List[Dict[str, Any]]:
+        """
+        Contadores por 'departamento' o 'coordinador', por id: una fila
+        por cada uno con algo que contar, con id, nombre y las claves de
+        BREAKDOWN_KEYS[ambito] (las que no tengan contador valen 0).
+        """
+        if ambito not in BREAKDOWN_KEYS:
+            raise ValueError(f"Ámbito desconocido: '{ambito}' (usa {' o '.join(BREAKDOWN_KEYS)})")
+        filas: Dict[int, Dict[str, Any]] = {}
+        with self._conexion() as conn:
+            self._check_counters(conn)
+            cursor = conn.execute(f"""
+                SELECT c.id, t.nombre, c.clave, c.n
+                FROM contador c
+                JOIN {ambito} t ON t.id = c.id
+                WHERE c.ambito = ? AND c.n <> 0
+            """, (ambito,))
+            for row_id, nombre, clave, n in cursor.fetchall():
+                fila = filas.setdefault(row_id, {
+                    'id': row_id, 'nombre': nombre, **dict.fromkeys(BREAKDOWN_KEYS[ambito], 0),
+                })
+                fila[clave] = n
+        return list(filas.values())
@@ -0,0 +1,280 @@
+# ============================================
+# delta.py  — NUEVO en v3
+# Importación incremental por huella de fila.
+# Guarda un hash estable de cada fila normalizada
+# (por hoja y clave natural) en la tabla huella_fila.
+# En la siguiente importación solo pasan a los
+# converters las filas nuevas o cambiadas.
+# filter() es un generador: funciona igual con
+# listas que con hojas leídas en streaming.
+# Trabaja sobre los registros de records.py.
+# Con preload() las huellas guardadas se leen antes,
+# en el hilo de la sesión, y filter() puede correr en
+# los hilos de preparación del planificador.
+# Filas que compiten por lo mismo (un código de acta en
+# varias filas, un CI en Operadores y en Notarios):
+# hot_claims() junta lo que reclaman las filas nuevas,
+# cambiadas o eliminadas y filter() vuelve a pasar las
+# filas sin cambios que reclaman lo mismo, en su orden,
+# para que gane la última como en una importación
+# completa.
+# ============================================
+
+import hashlib
+from operator import attrgetter
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+from actas import parse_codes
+from database import DatabaseManager, FINGERPRINT_TABLE_SQL
+from resolver import ForeignKeyResolver
+from records import RECORD_TYPES
+
+# Clave natural de cada hoja (campos lógicos de COLUMN_MAPPING).
+# Actas: una fila se identifica por operador + celda de códigos completa.
+NATURAL_KEYS: Dict[str, Tuple[str, ...]] = {
+    'jefes':                ('nombre',),
+    'coordinadores':        ('ci',),
+    'departamentos':        ('nombre',),
+    'provincias':           ('departamento', 'nombre'),
+    'municipios':           ('provincia', 'nombre'),
+    'asientos_electorales': ('municipio', 'nombre'),
+    'recintos':             ('asiento_electoral', 'nombre'),
+    'operadores':           ('ci',),
+    'notarios':             ('ci',),
+    'actas':                ('operador_ci', 'codigos'),
+}
+
+# Campos que necesita applied_checks() por hoja: es lo único que se
+# guarda de cada fila pendiente hasta commit() (no la fila completa).
+CHECK_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'jefes':                ('nombre',),
+    'coordinadores':        ('ci', 'jefe'),
+    'departamentos':        ('nombre',),
+    'provincias':           ('nombre',),
+    'municipios':           ('nombre',),
+    'asientos_electorales': ('nombre',),
+    'recintos':             ('asiento_electoral', 'nombre'),
+    'operadores':           ('ci', 'coordinador_ci'),
+    'notarios':             ('ci',),
+    'actas':                ('operador_ci',),
+}
+
+# Hojas cuyas filas compiten por la misma entidad: por hoja, el grupo
+# (hojas del mismo grupo compiten entre sí) y qué reclama una fila a
+# partir de su clave natural. La última fila que reclama algo se lo queda.
+CLAIMS: Dict[str, Tuple[str, Callable[[Tuple[str, ...]], Iterable[str]]]] = {
+    'operadores': ('persona', lambda key: key),
+    'notarios':   ('persona', lambda key: key),
+    'actas':      ('acta',    lambda key: parse_codes(key[1], verbose=False)),
+}
+
+_SEP = '\x1f'
+
+
+def _getter(fields: Tuple[str, ...]) -> Callable[[tuple], Tuple[Any, ...]]:
+    """attrgetter que siempre devuelve tupla (también con un solo campo)."""
+    get = attrgetter(*fields)
+    return get if len(fields) > 1 else (lambda record: (get(record),))
+
+
+# Por hoja: clave natural, todos los campos en orden alfabético (la
+# huella) y los campos de CHECK_FIELDS, resueltos una vez
+_KEY    = {sheet: _getter(fields) for sheet, fields in NATURAL_KEYS.items()}
+_FIELDS = {sheet: _getter(tuple(sorted(t._fields))) for sheet, t in RECORD_TYPES.items()}
+_CHECKS = {sheet: _getter(fields) for sheet, fields in CHECK_FIELDS.items()}
+
+
+def applied_checks(resolver: ForeignKeyResolver) -> Dict[str, Callable[[Dict[str, Any]], bool]]:
+    """
+    Por hoja: ¿la fila quedó realmente en la base con todas sus
+    referencias resueltas? Solo esas guardan su huella; las omitidas por
+    falta de padre (o con coordinador/jefe aún inexistente) se reintentan
+    en la próxima importación aunque la fila no cambie.
+    Cada predicado recibe {campo: valor} con los campos de CHECK_FIELDS.
+    """
+    def ref_ok(table: str, field: str, value: str) -> bool:
+        return not value or resolver.has(table, field, value)
+
+    return {
+        'jefes':                lambda r: resolver.has('jefe', 'nombre', r['nombre']),
+        'coordinadores':        lambda r: (resolver.has('coordinador', 'ci', r['ci'])
+                                           and ref_ok('jefe', 'nombre', r['jefe'])),
+        'departamentos':        lambda r: resolver.has('departamento', 'nombre', r['nombre']),
+        'provincias':           lambda r: resolver.has('provincia', 'nombre', r['nombre']),
+        'municipios':           lambda r: resolver.has('municipio', 'nombre', r['nombre']),
+        'asientos_electorales': lambda r: resolver.has('asiento_electoral', 'nombre', r['nombre']),
+        'recintos':             lambda r: resolver.has_recinto(r['asiento_electoral'], r['nombre']),
+        'operadores':           lambda r: (resolver.has('persona', 'ci', r['ci'])
+                                           and ref_ok('coordinador', 'ci', r['coordinador_ci'])),
+        'notarios':             lambda r: resolver.has('persona', 'ci', r['ci']),
+        'actas':                lambda r: resolver.has('persona', 'ci', r['operador_ci']),
+    }
+
+
+class DeltaTracker:
+    def __init__(self, db_manager: DatabaseManager, full: bool = False):
+        """full=True pasa todas las filas (pero igual guarda las huellas)."""
+        self.db = db_manager
+        self.full = full
+        self._pending: Dict[str, Dict[str, Tuple[str, Dict[str, str]]]] = {}
+        self._removed: Dict[str, List[str]] = {}
+        self._preloaded: Dict[str, Dict[str, str]] = {}
+        self.summary: Dict[str, Dict[str, int]] = {}
+        self.db.query(FINGERPRINT_TABLE_SQL)
+
+    # ── HUELLAS ───────────────────────────────────────────────────────
+
+    def fingerprint(self, sheet: str, record: tuple) -> Tuple[Tuple[str, ...], str]:
+        """(valores de la clave natural, sha1 del registro normalizado)."""
+        payload = _SEP.join(map(str, _FIELDS[sheet](record)))
+        return _KEY[sheet](record), hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _stored(self, sheet: str, keep: bool = False) -> Dict[str, str]:
+        """Huellas guardadas de la hoja; keep=True las deja precargadas para filter()."""
+        stored = self._preloaded.get(sheet) if keep else self._preloaded.pop(sheet, None)
+        if stored is not None:
+            return stored
+        stored = dict(self.db.query(
+            "SELECT clave, huella FROM huella_fila WHERE hoja = ?", (sheet,)
+        ))
+        if keep:
+            self._preloaded[sheet] = stored
+        return stored
+
+    def preload(self, sheets: Iterable[str]):
+        """
+        Lee ya las huellas guardadas de estas hojas: después filter() no
+        toca la base y se puede llamar desde otro hilo.
+        """
+        for sheet in sheets:
+            self._preloaded[sheet] = self._stored(sheet)
+
+    # ── FILTRO ────────────────────────────────────────────────────────
+
+    def hot_claims(self, sheets: Dict[str, Iterable[tuple]]) -> FrozenSet[Tuple[str, str]]:
+        """
+        (grupo, valor) de CLAIMS que reclama alguna fila nueva, cambiada,
+        con clave repetida o eliminada de estas hojas: para filter(hot=...).
+        Recorre cada hoja una vez más (en streaming la vuelve a leer), así
+        que hay que pasarle hojas re-recorribles. Vacío con full=True o si
+        ninguna de las hojas tiene huellas guardadas.
+        """
+        hot: Set[Tuple[str, str]] = set()
+        sheets = {sheet: rows for sheet, rows in sheets.items() if sheet in CLAIMS}
+        # Sin huellas guardadas (primera carga) no hay filas sin cambios que reenviar
+        if self.full or not any(self._stored(sheet, keep=True) for sheet in sheets):
+            return frozenset()
+        for sheet, rows in sheets.items():
+            group, claims = CLAIMS[sheet]
+            stored = self._stored(sheet, keep=True)
+            seen = set()
+            for row in rows:
+                key, huella = self.fingerprint(sheet, row)
+                if not any(key):
+                    continue
+                clave = _SEP.join(key)
+                if stored.get(clave) != huella or clave in seen:
+                    hot.update((group, c) for c in claims(key))
+                seen.add(clave)
+            for clave in stored:
+                if clave not in seen:
+                    hot.update((group, c) for c in claims(tuple(clave.split(_SEP))))
+        return frozenset(hot)
+
+    def filter(self, sheet: str, rows: Iterable[tuple],
+               hot: FrozenSet[Tuple[str, str]] = frozenset()) -> Iterator[tuple]:
+        """
+        Genera solo las filas nuevas o cambiadas desde la última importación.
+        Una clave repetida en la hoja siempre pasa (el upsert se queda con
+        la última aparición, así que no se puede omitir ninguna), y también
+        una fila sin cambios que reclama algo de hot (ver hot_claims()).
+        Hay que consumirlo entero antes de commit(); el resumen de la hoja
+        queda en self.summary al terminar.
+        """
+        stored = self._stored(sheet)
+        check_fields = CHECK_FIELDS[sheet]
+        checks = _CHECKS[sheet]
+        group, claims = CLAIMS.get(sheet, (None, None))
+        pending: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        seen = set()
+        total = pasan = nuevas = cambiadas = sin_cambios = reenviadas = 0
+
+        for row in rows:
+            total += 1
+            key, huella = self.fingerprint(sheet, row)
+            if not any(key):
+                pasan += 1
+                yield row                # el converter la descarta
+                continue
+            clave = _SEP.join(key)
+            previa = stored.get(clave)
+            if previa is None:
+                nuevas += 1
+            elif previa != huella:
+                cambiadas += 1
+            else:
+                sin_cambios += 1
+            pasa = self.full or previa != huella or clave in seen
+            if not pasa and hot and claims and any((group, c) in hot for c in claims(key)):
+                reenviadas += 1
+                pasa = True
+            if pasa:
+                pending[clave] = (huella, dict(zip(check_fields, checks(row))))
+                pasan += 1
+                yield row
+            seen.add(clave)
+
+        self._pending[sheet] = pending
+        self._removed[sheet] = [c for c in stored if c not in seen]
+        self.summary[sheet] = {
+            'nuevas':      nuevas,
+            'cambiadas':   cambiadas,
+            'sin_cambios': sin_cambios,
+            'eliminadas':  len(self._removed[sheet]),
+            'reenviadas':  reenviadas,
+            'omitidas':    total - pasan,
+        }
+
+    # ── CONFIRMACIÓN ──────────────────────────────────────────────────
+
+    def commit(self, sheet: str, applied: Callable[[Dict[str, Any]], bool]):
+        """
+        Guarda las huellas de las filas que quedaron aplicadas y borra las
+        de filas que ya no están en la hoja. Las entidades de esas filas
+        no se borran de la base (la importación nunca borra).
+        """
+        pending = self._pending.pop(sheet, {})
+        self.db.executemany(
+            "INSERT INTO huella_fila (hoja, clave, huella) VALUES (?, ?, ?) "
+            "ON CONFLICT(hoja, clave) DO UPDATE SET huella = excluded.huella",
+            [
+                (sheet, clave, huella)
+                for clave, (huella, refs) in pending.items()
+                if applied(refs)
+            ],
+        )
+        self.db.executemany(
+            "DELETE FROM huella_fila WHERE hoja = ? AND clave = ?",
+            [(sheet, clave) for clave in self._removed.pop(sheet, [])],
+        )
+
+    # ── REPORTE ───────────────────────────────────────────────────────
+
+    def report(self):
+        if not self.summary:
+            return
+        modo = "completa" if self.full else "incremental"
+        print(f"\n🔁 Importación {modo} (huellas por fila):")
+        total_omitidas = total_reenviadas = 0
+        # En orden de hoja: con el planificador los filtros terminan en cualquier orden
+        for sheet in sorted(self.summary, key=list(NATURAL_KEYS).index):
+            s = self.summary[sheet]
+            total_omitidas += s['omitidas']
+            total_reenviadas += s['reenviadas']
+            print(
+                f"   {sheet.ljust(22)}: {s['nuevas']:>6} nuevas, {s['cambiadas']:>6} cambiadas, "
+                f"{s['sin_cambios']:>6} sin cambios, {s['eliminadas']:>5} eliminadas"
+            )
+        print(f"   ⏭️  {total_omitidas} filas omitidas por no tener cambios")
+        if total_reenviadas:
+            print(f"   🔗 {total_reenviadas} filas sin cambios reenviadas por compartir "
+                  f"código o CI con una fila cambiada")
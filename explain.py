@@ -0,0 +1,344 @@
+# ============================================
+# explain.py  — NUEVO en v3
+# Auditoría de planes de consulta (main.py explain).
+# Corre EXPLAIN QUERY PLAN sobre cada consulta que
+# emite DatabaseManager (con las tablas y campos con
+# que la llaman converters, resolver y delta) y sobre
+# las vistas v_* filtradas como las consulta el
+# generador de documentos (por ci, codigo,
+# departamento, coordinador).
+# Marca recorridos completos de tablas grandes,
+# B-trees temporales e índices automáticos, y sugiere
+# el CREATE INDEX que falta.
+# Por defecto audita una base sintética del tamaño del
+# benchmark: con las tablas casi vacías de una base de
+# prueba el planificador elige otros planes.
+# ============================================
+
+import contextlib
+import io
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from database import DatabaseManager, MATERIALIZED_VIEWS, materialized_table
+
+# Personas de la base sintética por defecto (~100k actas)
+DEFAULT_PERSONAS = 10000
+# Un recorrido completo de una tabla con menos filas no es un problema
+# (departamento, jefe); las de geografía ya pasan de esto a escala real
+SCAN_MIN_ROWS = 100
+
+# (nombre, SQL, origen, recorrido completo esperado)
+# Los parámetros se toman de la misma base (ver _sample_params): cada
+# :nombre se reemplaza por un valor real.
+QUERIES: List[Tuple[str, str, str, bool]] = [
+    # ── DatabaseManager.get_id_by_field / insert_or_update ────────────
+    *[
+        (f"get_id_by_field({table}.{field})",
+         f"SELECT id FROM {table} WHERE {field} = :{table}_{field} LIMIT 1",
+         'database.get_id_by_field', False)
+        for table, field in [
+            ('jefe', 'nombre'), ('coordinador', 'ci'), ('departamento', 'nombre'),
+            ('provincia', 'nombre'), ('municipio', 'nombre'),
+            ('asiento_electoral', 'nombre'), ('persona', 'ci'), ('acta', 'codigo'),
+        ]
+    ],
+    ("get_recinto_id_by_asiento_and_nombre", """
+        SELECT MIN(r.id)
+        FROM asiento_electoral ae
+        JOIN recinto r ON r.asiento_id = ae.id AND r.clave = :recinto_clave
+        WHERE ae.clave = :asiento_electoral_clave
+    """, 'database.get_recinto_id_by_asiento_and_nombre', False),
+
+    # ── ForeignKeyResolver / GeoIndex (cargan la tabla entera a propósito) ──
+    ("load_id_map(persona.ci)",
+     "SELECT ci, id FROM persona WHERE ci IS NOT NULL ORDER BY id",
+     'database.load_id_map', True),
+    ("load_geo_level(recinto)",
+     "SELECT id, asiento_id, clave FROM recinto ORDER BY id",
+     'database.load_geo_level', True),
+
+    # ── bulk_upsert → _ids_by_keys ────────────────────────────────────
+    ("_ids_by_keys(acta.codigo)",
+     "SELECT codigo, id FROM acta WHERE codigo IN (:acta_codigo, :acta_codigo_2)",
+     'database._ids_by_keys', False),
+    ("_ids_by_keys(persona.ci)",
+     "SELECT ci, id FROM persona WHERE ci IN (:persona_ci, :persona_ci_2)",
+     'database._ids_by_keys', False),
+    ("_ids_by_keys(recinto.asiento_id+nombre)",
+     "SELECT asiento_id, nombre, id FROM recinto "
+     "WHERE (asiento_id, nombre) IN (VALUES (:recinto_asiento_id, :recinto_nombre))",
+     'database._ids_by_keys', False),
+
+    # ── DeltaTracker ──────────────────────────────────────────────────
+    ("huellas de una hoja",
+     "SELECT clave, huella FROM huella_fila WHERE hoja = :huella_hoja",
+     'delta.DeltaTracker', False),
+    ("borrar huella",
+     "DELETE FROM huella_fila WHERE hoja = :huella_hoja AND clave = :huella_clave",
+     'delta.DeltaTracker', False),
+
+    # ── get_stats ─────────────────────────────────────────────────────
+    ("get_stats",
+     "SELECT clave, n FROM contador WHERE ambito = 'total'", 'database.get_stats', False),
+    ("get_breakdown(departamento)", """
+        SELECT c.id, t.nombre, c.clave, c.n
+        FROM contador c
+        JOIN departamento t ON t.id = c.id
+        WHERE c.ambito = 'departamento' AND c.n <> 0
+    """, 'database.get_breakdown', False),
+    ("get_breakdown(coordinador)", """
+        SELECT c.id, t.nombre, c.clave, c.n
+        FROM contador c
+        JOIN coordinador t ON t.id = c.id
+        WHERE c.ambito = 'coordinador' AND c.n <> 0
+    """, 'database.get_breakdown', False),
+
+    # ── Vistas, como las consulta el generador de documentos ──────────
+    ("v_operadores por ci",
+     "SELECT * FROM v_operadores WHERE ci = :persona_ci", 'vista', False),
+    ("v_operadores por coordinador",
+     "SELECT * FROM v_operadores WHERE coordinador_ci = :coordinador_ci ORDER BY nombre",
+     'vista', False),
+    ("v_operadores por departamento",
+     "SELECT * FROM v_operadores WHERE departamento = :departamento_nombre ORDER BY recinto, nombre",
+     'vista', False),
+    ("v_notarios por ci",
+     "SELECT * FROM v_notarios WHERE ci = :persona_ci", 'vista', False),
+    ("v_notarios por departamento",
+     "SELECT * FROM v_notarios WHERE departamento = :departamento_nombre ORDER BY recinto, nombre",
+     'vista', False),
+    ("v_actas por codigo",
+     "SELECT * FROM v_actas WHERE codigo = :acta_codigo", 'vista', False),
+    ("v_actas por operador",
+     "SELECT * FROM v_actas WHERE operador_ci = :persona_ci ORDER BY codigo", 'vista', False),
+    ("v_actas por departamento",
+     "SELECT * FROM v_actas WHERE departamento = :departamento_nombre ORDER BY codigo", 'vista', False),
+    ("v_actas por coordinador",
+     "SELECT * FROM v_actas WHERE coordinador = :coordinador_nombre ORDER BY codigo", 'vista', False),
+    ("v_recintos por departamento",
+     "SELECT * FROM v_recintos WHERE departamento = :departamento_nombre ORDER BY nombre",
+     'vista', False),
+    ("v_coordinadores por ci",
+     "SELECT * FROM v_coordinadores WHERE ci = :coordinador_ci", 'vista', False),
+]
+
+# Un valor real de cada parámetro (el _2 es otro valor de la misma columna)
+_SAMPLES = {
+    'jefe_nombre':              "SELECT nombre FROM jefe",
+    'coordinador_ci':           "SELECT ci FROM coordinador",
+    'coordinador_nombre':       "SELECT nombre FROM coordinador",
+    'departamento_nombre':      "SELECT nombre FROM departamento",
+    'provincia_nombre':         "SELECT nombre FROM provincia",
+    'municipio_nombre':         "SELECT nombre FROM municipio",
+    'asiento_electoral_nombre': "SELECT nombre FROM asiento_electoral",
+    'recinto_nombre':           "SELECT nombre FROM recinto",
+    'recinto_asiento_id':       "SELECT asiento_id FROM recinto",
+    'recinto_clave':            "SELECT clave FROM recinto",
+    'asiento_electoral_clave':  "SELECT clave FROM asiento_electoral",
+    'persona_ci':               "SELECT ci FROM persona",
+    'acta_codigo':              "SELECT codigo FROM acta",
+    'huella_hoja':              "SELECT hoja FROM huella_fila",
+    'huella_clave':             "SELECT clave FROM huella_fila",
+}
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?")
+_AUTO_INDEX = re.compile(r"^SEARCH (?:TABLE )?(\w+)(?: AS (\w+))? USING AUTOMATIC (?:COVERING )?INDEX \((\w+)")
+_TEMP_BTREE = re.compile(r"USE TEMP B-TREE FOR (.+)")
+_TABLE_OF = re.compile(r"^(?:SCAN|SEARCH) (?:TABLE )?(\w+)")
+_ORDER = re.compile(r"\bORDER BY\s+(.+?)(?:\s+LIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_SOURCES = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|ORDER\b|GROUP\b|LIMIT\b)(\w+))?", re.IGNORECASE)
+_FILTER = re.compile(r"(?:\b(\w+)\.)?\b(\w+)\s*(?:=|IN\b)\s*[:(]", re.IGNORECASE)
+
+
+# ── BASE A AUDITAR ────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def synthetic_database(personas: int = DEFAULT_PERSONAS, seed: int = 0) -> Iterator[DatabaseManager]:
+    """Base temporal con los datos sintéticos del benchmark, cargada como `todo`."""
+    from benchmark import generate          # benchmark importa main
+    from main import run_import
+    from sources import MemorySource
+
+    print(f"🧪 Generando base sintética de {personas} personas...")
+    data = generate(personas, seed=seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager(os.path.join(tmp, 'explain.db'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            with db.use_profile('build'):
+                db.create_schema(defer_indexes=True)
+                ok = run_import(db, source=MemorySource(data), defer_indexes=True)
+        if not ok:
+            raise RuntimeError("La base sintética no pasó la validación")
+        yield db
+
+
+def _sample_params(db: DatabaseManager) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for name, sql in _SAMPLES.items():
+        values = [row[0] for row in db.query(f"{sql} LIMIT 2")]
+        params[name] = values[0] if values else None
+        params[f"{name}_2"] = values[-1] if values else None
+    return params
+
+
+# ── ANÁLISIS ──────────────────────────────────────────────────────────
+
+def _aliases(db: DatabaseManager, sql: str) -> Dict[str, str]:
+    """
+    {alias o nombre: tabla} del FROM/JOIN, incluidos los de las vistas que
+    lee la consulta (el plan de una vista nombra sus alias internos).
+    """
+    result: Dict[str, str] = {}
+    for table, alias in _SOURCES.findall(sql):
+        result.setdefault(table, table)
+        if alias:
+            result[alias] = table
+        view = db.query("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ?", (table,))
+        if view:
+            for inner, target in _aliases(db, view[0][0]).items():
+                result.setdefault(inner, target)
+    return result
+
+
+def _filter_columns(sql: str, names: Set[str], single: bool) -> List[str]:
+    """Columnas comparadas con un parámetro que pertenecen a la tabla recorrida."""
+    columns = []
+    for prefix, column in _FILTER.findall(sql):
+        if (prefix and prefix in names) or (not prefix and single):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def _order_columns(sql: str) -> List[str]:
+    match = _ORDER.search(sql)
+    if not match:
+        return []
+    return [term.split()[0].split('.')[-1] for term in match.group(1).split(',')]
+
+
+def _columns(db: DatabaseManager, table: str) -> List[str]:
+    return [row[1] for row in db.query(f"PRAGMA table_info({table})")]
+
+
+def _suggest(db: DatabaseManager, table: str, columns: List[str]) -> Optional[str]:
+    """
+    CREATE INDEX sobre columns (filtros y luego ORDER BY), salvo que ya
+    haya un índice que empiece por esas columnas.
+    """
+    existentes = _columns(db, table)
+    columns = [c for c in dict.fromkeys(columns) if c in existentes]
+    if not columns:
+        return None
+    for _, name, *_ in db.query(f"PRAGMA index_list({table})"):
+        indexadas = [row[2] for row in db.query(f"PRAGMA index_info({name})")]
+        if indexadas[:len(columns)] == columns:
+            return None
+    return f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table}({', '.join(columns)})"
+
+
+def audit(db: DatabaseManager, scan_min_rows: int = SCAN_MIN_ROWS) -> List[Dict[str, Any]]:
+    """
+    EXPLAIN QUERY PLAN de cada consulta de QUERIES. Por consulta devuelve
+    el plan, los problemas encontrados y los índices sugeridos.
+    """
+    params = _sample_params(db)
+    filas: Dict[str, int] = {}
+
+    tablas = {row[0] for row in db.query("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+    def rows(table: str) -> int:
+        # "SCAN CONSTANT ROW" (VALUES) y subconsultas no son tablas
+        if table not in tablas:
+            return 0
+        if table not in filas:
+            filas[table] = db.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+        return filas[table]
+
+    results = []
+    for nombre, sql, origen, completo in QUERIES:
+        plan = [row[3] for row in db.query(f"EXPLAIN QUERY PLAN {sql}", params)]
+        aliases = _aliases(db, sql)
+        problemas: List[str] = []
+        sugerencias: List[str] = []
+
+        # Sin prefijo, una columna es de la única tabla (o vista) de la consulta
+        single = len(_SOURCES.findall(sql)) == 1
+        orden = _order_columns(sql) if single else []
+        leidas = [aliases.get(m.group(1), m.group(1)) for m in map(_TABLE_OF.match, plan) if m]
+
+        def sugerir(name: str, alias: Optional[str], table: str, con_orden: bool):
+            filtros = _filter_columns(sql, {name, alias, table} - {None}, single)
+            sql_index = _suggest(db, table, filtros + (orden if con_orden else []))
+            if sql_index:
+                sugerencias.append(sql_index)
+
+        for detail in plan:
+            scan = _SCAN.match(detail)
+            auto = _AUTO_INDEX.match(detail)
+            temp = _TEMP_BTREE.search(detail)
+            if scan:
+                name, alias = scan.groups()
+                table = aliases.get(name, name)
+                n = rows(table)
+                if completo or n < scan_min_rows:
+                    continue
+                problemas.append(f"recorre {table} completa ({n} filas)")
+                sugerir(name, alias, table, con_orden=True)
+            elif auto:
+                name, alias, column = auto.groups()
+                table = aliases.get(name, name)
+                problemas.append(f"índice automático temporal en {table}({column})")
+                sql_index = _suggest(db, table, [column])
+                if sql_index:
+                    sugerencias.append(sql_index)
+            elif temp and not completo:
+                problemas.append(f"B-tree temporal para {temp.group(1)}")
+                # Con una sola tabla, un índice (filtros, orden) evita ordenar
+                if temp.group(1) == 'ORDER BY' and len(set(leidas)) == 1:
+                    sugerir(leidas[0], None, leidas[0], con_orden=True)
+
+        results.append({
+            'consulta':    nombre,
+            'origen':      origen,
+            'sql':         ' '.join(sql.split()),
+            'plan':        plan,
+            'problemas':   problemas,
+            'sugerencias': list(dict.fromkeys(sugerencias)),
+        })
+    return results
+
+
+def suggested_indexes(results: List[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(s for r in results for s in r['sugerencias']))
+
+
+# ── REPORTE ───────────────────────────────────────────────────────────
+
+def report(results: List[Dict[str, Any]], verbose: bool = False):
+    print("\n" + "=" * 60)
+    print("🔬 EXPLAIN QUERY PLAN — consultas frecuentes y vistas")
+    print("=" * 60)
+    for r in results:
+        marca = '⚠️ ' if r['problemas'] else '✅'
+        print(f"{marca} {r['consulta']}  ({r['origen']})")
+        if r['problemas'] or verbose:
+            for detail in r['plan']:
+                print(f"      │ {detail}")
+            for p in r['problemas']:
+                print(f"      ↳ {p}")
+
+    con_problemas = [r for r in results if r['problemas']]
+    print("=" * 60)
+    print(f"📋 {len(results)} consultas, {len(con_problemas)} con problemas")
+    indices = suggested_indexes(results)
+    if indices:
+        print("\n💡 Índices sugeridos:")
+        for sql in indices:
+            print(f"   {sql};")
+    vistas = {materialized_table(v) for v in MATERIALIZED_VIEWS}
+    if any(s.split(' ON ')[1].split('(')[0] in vistas for s in indices):
+        print("   (los de mv_* van en database.MATERIALIZED_INDEXES)")
+    print("=" * 60)
@@ -0,0 +1,118 @@
+# ============================================
+# geoindex.py  — NUEVO en v3
+# Índice jerárquico de la geografía en memoria:
+#   departamento → provincia → municipio →
+#   asiento_electoral → recinto
+# Cada nivel guarda clave (records.name_key) → ids
+# (de menor a mayor) y el padre de cada id; se carga
+# de la base con una consulta por nivel la primera
+# vez que se usa.
+#
+# find(ruta) baja por la jerarquía con los nombres
+# que trae la hoja ('' = cualquiera en ese nivel):
+# un recinto de 'Potosí / Chayanta / Colquechaca /
+# Centro' no se confunde con el asiento 'Centro' de
+# otro departamento. Si la ruta no alcanza para
+# desempatar, gana el id más bajo, como antes
+# (ForeignKeyResolver lo avisa con candidates()).
+# Cada búsqueda es O(1) más los homónimos del nombre
+# (salvo un nivel intermedio vacío bajo uno dado,
+# que recorre ese nivel).
+# ============================================
+
+from bisect import insort
+from typing import Dict, List, Optional, Sequence, Tuple
+from database import DatabaseManager, GEO_PARENTS
+from records import name_key
+
+# Niveles en orden de la raíz a las hojas
+LEVELS: Tuple[str, ...] = tuple(GEO_PARENTS)
+
+
+class GeoIndex:
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self._by_key: Optional[Dict[str, Dict[str, List[int]]]] = None
+        self._parent: Dict[str, Dict[int, Optional[int]]] = {}
+        self.loads = 0
+
+    # ── CARGA ─────────────────────────────────────────────────────────
+
+    def _index(self) -> Dict[str, Dict[str, List[int]]]:
+        if self._by_key is None:
+            by_key: Dict[str, Dict[str, List[int]]] = {}
+            for level in LEVELS:
+                claves: Dict[str, List[int]] = {}
+                padres: Dict[int, Optional[int]] = {}
+                for row_id, parent_id, clave in self.db.load_geo_level(level):
+                    claves.setdefault(clave, []).append(row_id)
+                    padres[row_id] = parent_id
+                by_key[level] = claves
+                self._parent[level] = padres
+            self._by_key = by_key
+            self.loads += 1
+        return self._by_key
+
+    def reset(self):
+        """Descarta el índice (tablas escritas por SQL): se recarga al usarlo."""
+        self._by_key = None
+        self._parent = {}
+
+    # ── BÚSQUEDA ──────────────────────────────────────────────────────
+
+    def candidates(self, path: Sequence[str]) -> List[int]:
+        """
+        Ids del último nivel de `path` (nombres desde departamento; '' o
+        None = cualquiera) cuya ascendencia coincide con el resto de la
+        ruta. El último nombre no puede faltar.
+        """
+        index = self._index()
+        allowed: Optional[set] = None           # ids permitidos del nivel anterior
+        ids: List[int] = []
+        for level, nombre in zip(LEVELS, path):
+            clave = name_key(nombre)
+            padres = self._parent[level]
+            if clave:
+                ids = index[level].get(clave, [])
+                if allowed is not None:
+                    ids = [i for i in ids if padres[i] in allowed]
+            elif allowed is not None:
+                ids = [i for i, padre in padres.items() if padre in allowed]
+            else:
+                ids = []                        # cualquiera: sin restricción todavía
+                continue
+            if not ids:
+                return []
+            allowed = set(ids)
+        return ids if name_key(path[-1]) else []
+
+    def find(self, path: Sequence[str]) -> Optional[int]:
+        """Id más bajo de candidates(path), o None."""
+        ids = self.candidates(path)
+        return min(ids) if ids else None
+
+    def has(self, path: Sequence[str]) -> bool:
+        return bool(self.candidates(path))
+
+    def child(self, level: str, parent_id: Optional[int], nombre: str) -> Optional[int]:
+        """Id más bajo de `level` con ese nombre bajo parent_id (O(1))."""
+        padres = self._parent_of(level)
+        for row_id in self._index()[level].get(name_key(nombre), []):
+            if padres[row_id] == parent_id:
+                return row_id
+        return None
+
+    def _parent_of(self, level: str) -> Dict[int, Optional[int]]:
+        self._index()
+        return self._parent[level]
+
+    # ── ACTUALIZACIÓN ─────────────────────────────────────────────────
+
+    def add(self, level: str, row_id: int, parent_id: Optional[int], nombre: str):
+        """Registra una fila escrita; si el índice aún no se cargó, no hace nada."""
+        if self._by_key is None:
+            return
+        ids = self._by_key[level].setdefault(name_key(nombre), [])
+        if row_id not in self._parent[level]:
+            insort(ids, row_id)
+        self._parent[level][row_id] = parent_id
@@ -4,15 +4,85 @@
 #   - run_import() llama al validador antes de importar
 #   - eliminada lectura de hoja Cuentas y Grupos
 #   - convert_personas() ya no recibe cuentas_data
+# Cambios v3:
+#   - run_import() usa una sola sesión/transacción con SAVEPOINT por etapa
+#   - reporte de aciertos de la caché de claves foráneas al terminar
+#   - _leer_datos() trae las 10 hojas con un solo values_batch_get
+#   - --fetch-workers N: descarga concurrente de hojas
+#   - caché local de hojas por revisión del spreadsheet (--no-cache, --refresh)
+#   - importación incremental por huella de fila (--full para reimportar todo)
+#   - --stream: las hojas se leen por bloques (--chunk-size) y pasan
+#     como iteradores por validador, huellas y converters
+#   - --source file:export.xlsx | file:export.json | dir:./csv/ importa
+#     desde exportaciones locales (sin red ni cuota de la API)
+#   - --profile: tiempo, CPU, filas y sentencias SQL por etapa
+#     (--profile-json / --profile-cprofile para guardarlo)
+#   - --trace-sql: sentencias SQL agrupadas por forma y etapa, con
+#     aviso de patrones N+1
+#   - --fast: perfil de conexión para cargas masivas (WAL, synchronous
+#     NORMAL, caché grande); se restaura al terminar
+#   - --atomic [file|memory] / --rebuild: construye la base aparte y la
+#     reemplaza con os.replace (ver atomic_build.py)
+#   - todo sobre una base vacía (o --rebuild) crea los índices después
+#     de la carga y corre ANALYZE; la importación incremental los conserva
+#   - etapa 'materializar': v_operadores, v_notarios y v_actas se leen
+#     de tablas planas mv_*; comando refrescar para rehacerlas
+#   - comando explain: EXPLAIN QUERY PLAN de las consultas frecuentes y
+#     vistas sobre una base sintética (ver explain.py)
+#   - las hojas se normalizan una sola vez al leerlas (records.py); el
+#     validador, las huellas y los converters reciben esos registros
+#   - --engine staging: cada hoja pasa por una tabla temporal stg_* y
+#     se escribe con INSERT ... SELECT por entidad (ver staging.py)
+#   - las etapas son un grafo de dependencias (ETAPAS): las huellas de
+#     cada hoja se calculan en hilos (--stage-workers) mientras se valida
+#     y se escriben otras etapas; un solo escritor SQLite (scheduler.py)
+#   - --pipeline: las hojas se descargan en hilos y cada etapa se escribe
+#     apenas llegan sus hojas, solapando red y escritura (pipeline.py)
+#   - stats lee la tabla contador (mantenida por triggers) y muestra el
+#     desglose por departamento y por coordinador; comando recontar
+#     para rehacerla
 # ============================================
 
 import argparse
+import time
 from datetime import datetime
-from database import DatabaseManager
+from itertools import chain
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Callable, ContextManager, Iterable, Iterator, Optional, Union
+from database import BREAKDOWN_KEYS, DatabaseManager
 from sheets import SheetsManager
+from snapshot_cache import SnapshotCache
+from sources import FileSource, open_source
+from profiler import StageProfiler
+from sqltrace import SqlTracer
+from atomic_build import BuildError, build_aside
+from scheduler import Stage, StageScheduler
+from pipeline import PipelineStats, run_pipeline
+from explain import DEFAULT_PERSONAS, audit, report as report_plans, synthetic_database
 from converters import DataConverters
+from staging import StagingConverters
+from records import parse_sheet
+from delta import DeltaTracker, applied_checks
 from validator import run_validation
-from config import SHEET_NAMES
+from config import SHEET_NAMES, STAGE_WORKERS, STREAM_CHUNK_SIZE
+
+HOJAS = [
+    'jefes', 'coordinadores', 'departamentos', 'provincias',
+    'municipios', 'asientos_electorales', 'recintos',
+    'operadores', 'notarios', 'actas',
+]
+
+# Motores de escritura (--engine): misma interfaz convert_<etapa>()
+ENGINES = {
+    'python':  DataConverters,
+    'staging': StagingConverters,
+}
+
+# Coordinadores que lista stats (los de más operadores)
+MAX_COORDINADORES_LISTADOS = 15
+
+# Google Sheets o una exportación local (ver sources.py)
+Origen = Union[SheetsManager, FileSource]
 
 
 def show_stats(db: DatabaseManager):
@@ -20,6 +90,12 @@ def show_stats(db: DatabaseManager):
     print("📊 ESTADÍSTICAS DE LA BASE DE DATOS")
     print("=" * 60)
 
+    faltan = db.counters_missing()
+    if faltan:
+        print(f"⚠️  Faltan {len(faltan)} objetos de contador (tabla contador o sus triggers)")
+        print("   Créalos con: python main.py recontar")
+        return
+
     stats = db.get_stats()
 
     labels = {
@@ -53,73 +129,481 @@ def show_stats(db: DatabaseManager):
     print(f"🎯 TOTAL (tablas principales): {total_base:>6} registros")
     print("=" * 60)
 
-
-def _leer_datos(sheets: SheetsManager) -> dict:
-    """Lee todas las hojas necesarias y las devuelve en un dict."""
-    datos = {}
-    hojas = [
-        'jefes', 'coordinadores', 'departamentos', 'provincias',
-        'municipios', 'asientos_electorales', 'recintos',
-        'operadores', 'notarios', 'actas',
-    ]
-    for key in hojas:
-        sheet_name = SHEET_NAMES[key]
-        print(f"  📖 Leyendo '{sheet_name}'...")
-        datos[key] = sheets.get_sheet_data(sheet_name)
+    for estado in db.materialized_status():
+        print(f"🧊 {estado['vista'].ljust(14)} → {estado['tabla'].ljust(14)}: "
+              f"{estado['filas']:>6} filas, refrescada {estado['actualizado']}")
+
+    _show_breakdown(db, 'departamento', '🏛️  POR DEPARTAMENTO', None)
+    _show_breakdown(db, 'coordinador', '👥 POR COORDINADOR', MAX_COORDINADORES_LISTADOS)
+
+
+def _show_breakdown(db: DatabaseManager, ambito: str, titulo: str, limite: Optional[int]):
+    """Tabla de get_breakdown(ambito), de más a menos operadores."""
+    filas = sorted(db.get_breakdown(ambito), key=lambda f: (-f['operadores'], f['nombre']))
+    if not filas:
+        return
+    columnas = BREAKDOWN_KEYS[ambito]
+    print(f"\n{titulo}")
+    print(f"   {'':<28}" + "".join(f" {c:>10}" for c in columnas))
+    for fila in filas[:limite]:
+        print(f"   {fila['nombre'][:28].ljust(28)}" + "".join(f" {fila[c]:>10}" for c in columnas))
+    if limite is not None and len(filas) > limite:
+        print(f"   … y {len(filas) - limite} más")
+
+
+def recount_stats(db: DatabaseManager):
+    """Comando recontar: rehace la tabla contador desde las tablas de datos."""
+    print("🧮 Recontando...")
+    inicio = time.perf_counter()
+    contadores = db.recount()
+    print(f"  ✅ {contadores} contadores en {time.perf_counter() - inicio:.2f}s")
+    show_stats(db)
+
+
+def explain_queries(db: DatabaseManager, personas: int):
+    """Comando explain: sobre una base sintética de `personas`, o sobre db si es 0."""
+    if personas <= 0:
+        report_plans(audit(db))
+        return
+    with synthetic_database(personas) as sintetica:
+        report_plans(audit(sintetica))
+
+
+def refresh_views(db: DatabaseManager):
+    """Comando refrescar: reconstruye las tablas mv_* sin reimportar."""
+    print("🧊 Refrescando vistas materializadas...")
+    filas = db.refresh_materialized()
+    for estado in db.materialized_status():
+        if estado['vista'] in filas:
+            print(f"  ✅ {estado['vista'].ljust(14)} → {estado['tabla'].ljust(14)}: "
+                  f"{estado['filas']:>6} filas en {estado['segundos']:.2f}s")
+
+
+def _leer_datos(sheets: Origen, workers: int = 1) -> dict:
+    """
+    Lee todas las hojas necesarias y las devuelve en un dict de listas
+    de registros (records.py): cada fila se normaliza aquí, una sola vez.
+    workers=1: una sola llamada en lote; workers>1: descargas en paralelo.
+    """
+    hojas = HOJAS
+    nombres = [SHEET_NAMES[key] for key in hojas]
+    inicio = time.perf_counter()
+    if isinstance(sheets, FileSource):
+        print(f"  📖 Leyendo {len(hojas)} hojas ({sheets.label})...")
+    elif workers <= 1:
+        print(f"  📖 Leyendo {len(hojas)} hojas en lote...")
+    por_nombre = sheets.fetch_sheets(nombres, workers=workers)
+    datos = {key: parse_sheet(key, por_nombre.pop(SHEET_NAMES[key])) for key in hojas}
+    print(f"  ⏱️  Lectura completa en {time.perf_counter() - inicio:.2f}s")
     return datos
 
 
-def run_import(db: DatabaseManager, skip_validation: bool = False):
-    sheets = SheetsManager()
-    converters = DataConverters(db)
+def _leer_stream(sheets: Origen, chunk_size: int) -> dict:
+    """
+    Como _leer_datos() pero sin descargar nada: cada hoja es un iterable
+    que se lee al recorrerlo (por bloques de chunk_size filas en Sheets,
+    fila a fila en CSV/XLSX) y se normaliza al vuelo.
+    """
+    if isinstance(sheets, FileSource):
+        print(f"  📖 Modo streaming ({sheets.label})")
+    else:
+        print(f"  📖 Modo streaming: bloques de {chunk_size} filas (sin caché local)")
+    por_nombre = sheets.stream_sheets([SHEET_NAMES[key] for key in HOJAS], chunk_size)
+    return {key: parse_sheet(key, por_nombre[SHEET_NAMES[key]]) for key in HOJAS}
+
+
+def _peek(filas: Iterable) -> Optional[Iterator]:
+    """
+    None si no hay filas; si hay, un iterador que incluye la primera.
+    Sirve igual para listas y para hojas en streaming (no las lee dos veces).
+    """
+    it = iter(filas)
+    for primera in it:
+        return chain([primera], it)
+    return None
+
+
+def _sheets_manager(use_cache: bool = True, refresh: bool = False) -> SheetsManager:
+    """SheetsManager con la caché local de hojas (salvo --no-cache)."""
+    return SheetsManager(
+        cache=SnapshotCache() if use_cache else None,
+        refresh=refresh,
+    )
+
+
+def _origen(
+    source: Union[str, FileSource, None] = None, use_cache: bool = True, refresh: bool = False
+) -> Origen:
+    """--source: exportación local si se indica; si no, Google Sheets."""
+    local = source if isinstance(source, FileSource) else open_source(source)
+    if local is not None:
+        return local
+    return _sheets_manager(use_cache, refresh)
+
+
+# Etapas de escritura: (etapa, hojas que consume, etapas que deben estar
+# escritas antes). Cada etapa llama al convert_<etapa> del motor (ENGINES)
+# con una fila-iterable por hoja y corre en su propio SAVEPOINT.
+# jefes→coordinadores y departamentos→…→recintos son cadenas independientes.
+ETAPAS = [
+    Stage('jefes',                ('jefes',),                   ()),
+    Stage('coordinadores',        ('coordinadores',),           ('jefes',)),
+    Stage('departamentos',        ('departamentos',),           ()),
+    Stage('provincias',           ('provincias',),              ('departamentos',)),
+    Stage('municipios',           ('municipios',),              ('provincias',)),
+    Stage('asientos_electorales', ('asientos_electorales',),    ('municipios',)),
+    Stage('recintos',             ('recintos',),                ('asientos_electorales',)),
+    Stage('personas',             ('operadores', 'notarios'),   ('recintos', 'coordinadores')),
+    Stage('actas',                ('actas',),                   ('personas',)),
+]
 
-    print("\n📥 Leyendo datos de Google Sheets...")
-    datos = _leer_datos(sheets)
+# Hojas que revisa run_validation
+HOJAS_VALIDADAS = ('jefes', 'coordinadores', 'operadores', 'notarios', 'actas')
 
-    # ── VALIDACIÓN PREVIA ─────────────────────────────────────────────
-    if not skip_validation:
-        puede_continuar = run_validation(
-            jefes_data=         datos['jefes'],
-            coordinadores_data= datos['coordinadores'],
-            operadores_data=    datos['operadores'],
-            notarios_data=      datos['notarios'],
-            actas_data=         datos['actas'],
+# medir(etapa, filas) → context manager que envuelve cada etapa
+# (lectura, validacion y las de ETAPAS); filas es None si no se conoce
+Medidor = Callable[[str, Optional[int]], ContextManager]
+
+
+def _sin_medir(etapa: str, filas: Optional[int] = None) -> ContextManager:
+    return nullcontext()
+
+
+def _contar(datos: dict, hojas: Iterable[str]) -> Optional[int]:
+    """Filas de entrada de unas hojas (None si alguna es un stream)."""
+    try:
+        return sum(len(datos[key]) for key in hojas)
+    except TypeError:
+        return None
+
+
+def run_import(
+    db: DatabaseManager,
+    skip_validation: bool = False,
+    fetch_workers: int = 1,
+    use_cache: bool = True,
+    refresh: bool = False,
+    full: bool = False,
+    stream: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    source: Union[str, FileSource, None] = None,
+    medir: Optional[Medidor] = None,
+    defer_indexes: bool = False,
+    engine: str = 'python',
+    stage_workers: int = STAGE_WORKERS,
+    pipeline: bool = False,
+):
+    """
+    Lee, valida e importa todas las hojas. defer_indexes=True es la carga
+    completa sobre un esquema creado con create_schema(defer_indexes=True):
+    al terminar (aunque la importación se cancele o falle) se crean los
+    índices y los triggers de contador, se corre ANALYZE y se recuentan
+    los contadores, como etapa 'indices'; si no, los contadores que
+    falten se crean antes de escribir.
+    engine elige el motor de escritura de ENGINES; stage_workers, los
+    hilos que preparan etapas (con stream siempre 1). pipeline=True
+    solapa la descarga de las hojas con la escritura (ver pipeline.py).
+    """
+    medir = medir or _sin_medir
+    if not defer_indexes:
+        # Base anterior a los contadores: triggers y recuento antes de escribir
+        db.ensure_counters()
+    try:
+        return _run_import(
+            db, skip_validation, fetch_workers, use_cache, refresh,
+            full, stream, chunk_size, source, medir, engine, stage_workers, pipeline,
         )
-        if not puede_continuar:
+    finally:
+        if defer_indexes:
+            print("\n🗂️  Creando índices y contadores diferidos...")
+            with medir('indices', None):
+                db.create_indexes()
+                db.ensure_counters()
+
+
+def _run_import(
+    db: DatabaseManager,
+    skip_validation: bool,
+    fetch_workers: int,
+    use_cache: bool,
+    refresh: bool,
+    full: bool,
+    stream: bool,
+    chunk_size: int,
+    source: Union[str, FileSource, None],
+    medir: Medidor,
+    engine: str,
+    stage_workers: int,
+    pipeline: bool,
+) -> bool:
+    sheets = _origen(source, use_cache and not stream, refresh)
+    motor = ENGINES[engine]
+    converters = motor(db, chunk_size=chunk_size) if stream else motor(db)
+
+    if isinstance(sheets, FileSource):
+        print(f"\n📥 Leyendo datos locales ({sheets.label})...")
+    else:
+        print("\n📥 Leyendo datos de Google Sheets...")
+    if pipeline:
+        datos: dict = {}        # se completa a medida que llegan las hojas
+    else:
+        with medir('lectura', None):
+            if stream:
+                datos = _leer_stream(sheets, chunk_size)
+            else:
+                datos = _leer_datos(sheets, workers=fetch_workers)
+
+    # Solo pasan a los converters las filas nuevas o cambiadas
+    # (salvo --full); las huellas se guardan en la misma transacción.
+    delta = DeltaTracker(db, full=full)
+    aplicada = applied_checks(converters.resolver)
+
+    # Con hojas en memoria las huellas de todas las etapas se calculan en
+    # hilos desde ya (mientras se valida); en streaming se calculan al
+    # escribir cada etapa, sin cargar la hoja entera.
+    plan = StageScheduler(ETAPAS, workers=1 if stream or pipeline else stage_workers)
+    en_hilos = plan.workers > 1
+
+    def preparar(etapa: Stage) -> tuple:
+        """(filas, cambios) por hoja; None si la hoja está vacía o sin cambios."""
+        filas = {key: _peek(datos[key]) for key in etapa.hojas}
+        # Códigos y CI que reclama alguna fila cambiada: las filas sin
+        # cambios que también los reclaman vuelven a pasar, en su orden
+        hot = delta.hot_claims({key: datos[key] for key, f in filas.items() if f is not None})
+        if en_hilos:
+            cambios = {
+                key: list(delta.filter(key, f, hot)) or None if f is not None else None
+                for key, f in filas.items()
+            }
+        else:
+            cambios = {
+                key: _peek(delta.filter(key, f, hot)) if f is not None else None
+                for key, f in filas.items()
+            }
+        return filas, cambios
+
+    hubo_cambios = False
+
+    def escribir(etapa: Stage, preparado: tuple):
+        nonlocal hubo_cambios
+        filas, cambios = preparado
+        for key, f in filas.items():
+            if f is None:
+                print(f"   ⚠️  Sin datos en '{SHEET_NAMES[key]}'")
+        if all(f is None for f in filas.values()):
+            return
+
+        with db.savepoint(etapa.nombre), medir(etapa.nombre, _contar(datos, etapa.hojas)):
+            if any(c is not None for c in cambios.values()):
+                convert = getattr(converters, f"convert_{etapa.nombre}")
+                convert(*(cambios[key] or [] for key in etapa.hojas))
+                hubo_cambios = True
+            else:
+                nombres = " y ".join(f"'{SHEET_NAMES[key]}'" for key in etapa.hojas)
+                print(f"   ⏭️  {nombres} sin cambios")
+            for key, f in filas.items():
+                if f is not None:
+                    delta.commit(key, aplicada[key])
+
+    def validar() -> bool:
+        with medir('validacion', _contar(datos, HOJAS_VALIDADAS)):
+            return run_validation(
+                jefes_data=         datos['jefes'],
+                coordinadores_data= datos['coordinadores'],
+                operadores_data=    datos['operadores'],
+                notarios_data=      datos['notarios'],
+                actas_data=         datos['actas'],
+            )
+
+    def materializar():
+        # Tablas mv_* de las vistas, en la misma transacción que los datos:
+        # el generador de documentos nunca ve vistas desfasadas
+        if hubo_cambios or not db.materialized_status():
+            with db.savepoint('materializar'), medir('materializar', None):
+                filas = db.refresh_materialized()
+            detalle = ", ".join(f"{vista} {n}" for vista, n in filas.items())
+            print(f"\n🧊 Vistas materializadas: {detalle}")
+
+    if skip_validation:
+        print("  ⚠️  Validación omitida (--skip-validation)")
+
+    if pipeline:
+        tiempos = PipelineStats()
+        if not _importar_en_pipeline(
+            db, sheets, fetch_workers, datos, preparar, escribir,
+            None if skip_validation else validar, materializar, tiempos,
+        ):
             print("\n🚫 Importación cancelada. Corrige los errores en Google Sheets.")
+            print("   ↩️  Lo que ya se había escrito se deshizo")
             return False
     else:
-        print("  ⚠️  Validación omitida (--skip-validation)")
+        with plan:
+            if en_hilos:
+                delta.preload(HOJAS)
+            plan.start(preparar)
+
+            # ── VALIDACIÓN PREVIA ─────────────────────────────────────
+            if not skip_validation and not validar():
+                print("\n🚫 Importación cancelada. Corrige los errores en Google Sheets.")
+                return False
+
+            print("\n💾 Importando a base de datos...")
+
+            # Una sola conexión y una transacción para toda la importación;
+            # cada etapa en su propio SAVEPOINT, escritas de a una por este
+            # hilo. Si algo falla, no queda ninguna importación a medias.
+            with db.session():
+                plan.run(escribir)
+                materializar()
+
+    delta.report()
+    if pipeline:
+        tiempos.report()
+    else:
+        plan.report()
+    if engine == 'python':
+        # con staging las claves se resuelven en SQL: la caché no interviene
+        converters.resolver.report()
+    print("\n✅ Importación completada")
+    return True
+
+
+class _Cancelada(Exception):
+    """La validación del pipeline falló: se deshace la sesión."""
+
+
+def _importar_en_pipeline(
+    db: DatabaseManager,
+    sheets: Origen,
+    workers: int,
+    datos: dict,
+    preparar: Callable[[Stage], tuple],
+    escribir: Callable[[Stage, tuple], None],
+    validar: Optional[Callable[[], bool]],
+    materializar: Callable[[], None],
+    tiempos: PipelineStats,
+) -> bool:
+    """
+    --pipeline: cada hoja se descarga en su propio hilo y cada etapa se
+    escribe apenas llegan sus hojas, antes de que termine la descarga.
+    La validación corre cuando llegan las hojas que revisa; como todo es
+    una sola transacción, si falla se deshace lo ya escrito.
+    """
+    print(f"  🔀 Pipeline: descargas en {max(1, workers)} hilo(s), "
+          "cada etapa se escribe apenas llegan sus hojas")
+    fetch = sheets.sheet_fetcher([SHEET_NAMES[key] for key in HOJAS])
+
+    def recibir(key: str, filas: list):
+        datos[key] = parse_sheet(key, filas)
 
     print("\n💾 Importando a base de datos...")
+    try:
+        with db.session(threads=True):
+            if not run_pipeline(
+                ETAPAS,
+                fetch=lambda key: fetch(SHEET_NAMES[key]),
+                arrive=recibir,
+                write=lambda etapa: escribir(etapa, preparar(etapa)),
+                gate=(HOJAS_VALIDADAS, validar) if validar is not None else None,
+                workers=workers,
+                stats=tiempos,
+            ):
+                raise _Cancelada()
+            materializar()
+    except _Cancelada:
+        return False
+    return True
 
-    # ── Organización y geografía (orden por dependencias) ─────────────
-    orden = [
-        ('jefes',                converters.convert_jefes),
-        ('coordinadores',        converters.convert_coordinadores),
-        ('departamentos',        converters.convert_departamentos),
-        ('provincias',           converters.convert_provincias),
-        ('municipios',           converters.convert_municipios),
-        ('asientos_electorales', converters.convert_asientos_electorales),
-        ('recintos',             converters.convert_recintos),
-    ]
-    for key, fn in orden:
-        if datos[key]:
-            fn(datos[key])
-        else:
-            print(f"   ⚠️  Sin datos en '{SHEET_NAMES[key]}'")
 
-    # ── Personas (operadores + notarios) ──────────────────────────────
-    converters.convert_personas(datos['operadores'], datos['notarios'])
+@contextmanager
+def _perfil_sqlite(db: DatabaseManager, fast: bool = False):
+    """Activa el perfil de conexión ('fast' con --fast) y lo deja en la salida."""
+    nombre = 'fast' if fast else 'durable'
+    with db.use_profile(nombre) as pragmas:
+        detalle = ", ".join(f"{k}={v}" for k, v in pragmas.items())
+        print(f"⚙️  Perfil SQLite: {nombre} ({detalle})")
+        yield
+    if fast:
+        print(f"⚙️  Perfil SQLite restaurado: journal_mode={db.pragmas()['journal_mode']}")
+
+
+def _construir_aparte(
+    db: DatabaseManager, args: argparse.Namespace, origen: Optional[FileSource], crear: bool
+) -> bool:
+    """
+    importar/todo con --atomic: todo se escribe en una base aparte que
+    reemplaza a db. Si db todavía no existe (o no tiene tablas) no hay
+    nada que copiar: la base aparte se crea desde cero, como con --rebuild.
+    """
+    nueva = not db.db_path.exists() or db.is_empty()
+    crear = crear or nueva
+
+    def construir(aparte: DatabaseManager) -> bool:
+        diferir = crear and aparte.is_empty()
+        if crear:
+            print("🏗️  Creando estructura...")
+            aparte.create_schema(defer_indexes=diferir)
+        return _importar(aparte, args, origen, defer_indexes=diferir)
 
-    # ── Actas ─────────────────────────────────────────────────────────
-    if datos['actas']:
-        converters.convert_actas(datos['actas'])
+    if args.rebuild or not db.db_path.exists():
+        modo = 'reconstrucción desde cero'
     else:
-        print(f"   ⚠️  Sin datos en '{SHEET_NAMES['actas']}'")
+        modo = 'copia de la base actual'
+    print(f"🧱 Construcción aparte ({args.atomic}, {modo})")
+    return build_aside(db, construir, memory=args.atomic == 'memory', fresh=args.rebuild)
+
+
+def _combinar(medidores: list) -> Medidor:
+    """Un solo medidor que entra en todos los de la lista."""
+    @contextmanager
+    def medir(etapa: str, filas: Optional[int] = None):
+        with ExitStack() as stack:
+            for m in medidores:
+                stack.enter_context(m(etapa, filas))
+            yield
+    return medir
+
+
+def _importar(
+    db: DatabaseManager, args: argparse.Namespace, origen: Optional[FileSource],
+    defer_indexes: bool = False,
+) -> bool:
+    """run_import con las opciones de la línea de comandos (--profile, --trace-sql)."""
+    opciones = dict(
+        skip_validation=args.skip_validation,
+        fetch_workers=args.fetch_workers,
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
+        full=args.full,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        source=origen,
+        defer_indexes=defer_indexes,
+        engine=args.engine,
+        stage_workers=args.stage_workers,
+        pipeline=args.pipeline,
+    )
+    perfil = traza = None
+    if args.profile or args.profile_json or args.profile_cprofile:
+        perfil = StageProfiler(db, cprofile_path=args.profile_cprofile)
+    if args.trace_sql:
+        traza = SqlTracer(db)
+    medidores = [m for m in (perfil, traza) if m is not None]
+    if not medidores:
+        return run_import(db, **opciones)
 
-    print("\n✅ Importación completada")
-    return True
+    try:
+        with ExitStack() as stack:
+            for m in medidores:
+                stack.enter_context(m)
+            return run_import(db, medir=_combinar(medidores), **opciones)
+    finally:
+        if traza is not None:
+            traza.report()
+        if perfil is not None:
+            perfil.report()
+            if args.profile_json:
+                perfil.save_json(args.profile_json)
 
 
 def main():
@@ -131,14 +615,105 @@ def main():
     parser = argparse.ArgumentParser(description="Convierte datos de Google Sheets a SQLite")
     parser.add_argument(
         'comando', nargs='?', default='todo',
-        choices=['crear', 'importar', 'stats', 'todo', 'validar'],
+        choices=['crear', 'explain', 'importar', 'recontar', 'refrescar', 'stats', 'todo', 'validar'],
         help='Comando a ejecutar'
     )
     parser.add_argument(
         '--skip-validation', action='store_true',
         help='Omitir validación previa (no recomendado)'
     )
+    parser.add_argument(
+        '--fetch-workers', type=int, default=1, metavar='N',
+        help='Descargar las hojas con N hilos en paralelo '
+             '(por defecto 1 = una sola llamada en lote)'
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='No usar la caché local de hojas (siempre descargar)'
+    )
+    parser.add_argument(
+        '--refresh', action='store_true',
+        help='Ignorar la caché local, descargar todo y reescribirla'
+    )
+    parser.add_argument(
+        '--full', action='store_true',
+        help='Reimportar todas las filas aunque no hayan cambiado'
+    )
+    parser.add_argument(
+        '--stream', action='store_true',
+        help='Leer las hojas por bloques en vez de cargarlas enteras en memoria '
+             '(no usa la caché local)'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=STREAM_CHUNK_SIZE, metavar='N',
+        help=f'Filas por bloque con --stream (por defecto {STREAM_CHUNK_SIZE})'
+    )
+    parser.add_argument(
+        '--source', default='sheets', metavar='ORIGEN',
+        help="De dónde leer: 'sheets' (por defecto), 'file:export.xlsx', "
+             "'file:export.json' o 'dir:CARPETA' con un CSV por hoja"
+    )
+    parser.add_argument(
+        '--engine', default='python', choices=sorted(ENGINES),
+        help="Motor de escritura: 'python' (por defecto, fila a fila con caché de claves) "
+             "o 'staging' (tablas temporales stg_* + INSERT ... SELECT por entidad)"
+    )
+    parser.add_argument(
+        '--pipeline', action='store_true',
+        help='importar/todo: escribir cada etapa apenas se descargan sus hojas, sin '
+             'esperar a las demás (descargas con --fetch-workers hilos; no con --stream)'
+    )
+    parser.add_argument(
+        '--stage-workers', type=int, default=STAGE_WORKERS, metavar='N',
+        help=f'Hilos que calculan las huellas de las etapas mientras se valida y se '
+             f'escriben otras (por defecto {STAGE_WORKERS}; 1 = secuencial; con --stream siempre 1)'
+    )
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Medir tiempo, CPU, filas y sentencias SQL de cada etapa de la importación'
+    )
+    parser.add_argument(
+        '--profile-json', metavar='ARCHIVO',
+        help='Guardar el perfil por etapa en JSON (implica --profile)'
+    )
+    parser.add_argument(
+        '--profile-cprofile', metavar='ARCHIVO',
+        help='Guardar un volcado cProfile de la importación (implica --profile)'
+    )
+    parser.add_argument(
+        '--trace-sql', action='store_true',
+        help='Agrupar las sentencias SQL de la importación por forma y etapa '
+             'y avisar de patrones N+1'
+    )
+    parser.add_argument(
+        '--fast', action='store_true',
+        help='Perfil SQLite para cargas masivas en importar/todo (WAL, synchronous=NORMAL, '
+             'caché grande); se restaura al terminar'
+    )
+    parser.add_argument(
+        '--atomic', nargs='?', const='file', choices=['file', 'memory'], metavar='file|memory',
+        help='importar/todo: construir la base aparte (archivo temporal o memoria) y '
+             'reemplazar la actual de una sola vez al terminar'
+    )
+    parser.add_argument(
+        '--rebuild', action='store_true',
+        help='Como --atomic pero partiendo de una base vacía (borra lo que ya no está en las hojas)'
+    )
+    parser.add_argument(
+        '--explain-personas', type=int, default=DEFAULT_PERSONAS, metavar='N',
+        help=f'explain: tamaño de la base sintética (por defecto {DEFAULT_PERSONAS}; '
+             '0 = auditar la base actual)'
+    )
     args = parser.parse_args()
+    if args.rebuild and not args.atomic:
+        args.atomic = 'file'
+    if args.pipeline and args.stream:
+        parser.error("--pipeline lee cada hoja entera; no se combina con --stream")
+
+    try:
+        origen = open_source(args.source)
+    except (ValueError, OSError, ImportError) as e:
+        parser.error(f"--source: {e}")
 
     try:
         db = DatabaseManager()
@@ -148,16 +723,33 @@ def main():
             db.create_schema()
 
         elif args.comando == 'importar':
-            run_import(db, skip_validation=args.skip_validation)
+            if args.atomic:
+                _construir_aparte(db, args, origen, crear=args.rebuild)
+            else:
+                with _perfil_sqlite(db, args.fast):
+                    _importar(db, args, origen)
+
+        elif args.comando == 'explain':
+            explain_queries(db, args.explain_personas)
+            return
+
+        elif args.comando == 'refrescar':
+            refresh_views(db)
 
         elif args.comando == 'stats':
             show_stats(db)
 
+        elif args.comando == 'recontar':
+            recount_stats(db)
+
         elif args.comando == 'validar':
             # Solo validar, sin importar
-            sheets = SheetsManager()
+            sheets = _origen(origen, not args.no_cache and not args.stream, args.refresh)
             print("\n📖 Leyendo datos...")
-            datos = _leer_datos(sheets)
+            if args.stream:
+                datos = _leer_stream(sheets, args.chunk_size)
+            else:
+                datos = _leer_datos(sheets, workers=args.fetch_workers)
             run_validation(
                 jefes_data=         datos['jefes'],
                 coordinadores_data= datos['coordinadores'],
@@ -168,9 +760,15 @@ def main():
             return
 
         else:  # 'todo'
-            print("🏗️  Creando estructura...")
-            db.create_schema()
-            ok = run_import(db, skip_validation=args.skip_validation)
+            if args.atomic:
+                ok = _construir_aparte(db, args, origen, crear=True)
+            else:
+                with _perfil_sqlite(db, args.fast):
+                    # Base nueva o vacía: carga completa con índices al final
+                    diferir = db.is_empty()
+                    print("🏗️  Creando estructura...")
+                    db.create_schema(defer_indexes=diferir)
+                    ok = _importar(db, args, origen, defer_indexes=diferir)
             if ok:
                 print()
                 show_stats(db)
@@ -178,6 +776,9 @@ def main():
         print(f"\n🎉 Proceso completado!")
         print(f"💾 Base de datos: {db.db_path}")
 
+    except BuildError as e:
+        print(f"❌ {e}")
+        print("   La base en uso no se modificó")
     except FileNotFoundError as e:
         print(f"❌ Archivo no encontrado: {e}")
         print("   Coloca 'generador-docs-31f4b831a196.json' en esta carpeta")
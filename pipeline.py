@@ -0,0 +1,175 @@
+# ============================================
+# pipeline.py  — NUEVO en v3
+# Importación en pipeline (--pipeline): descarga y
+# escritura se solapan en vez de ir una después de
+# la otra.
+#
+#   productores  una tarea asyncio por hoja; la lectura
+#                bloqueante (gspread, archivos) corre en un
+#                pool de `workers` hilos, en el orden en que
+#                las etapas necesitan las hojas
+#   cola         asyncio.Queue acotada: si el escritor va
+#                atrasado, los productores esperan con su
+#                cupo tomado y no empiezan más descargas
+#   consumidor   una sola tarea: recibe hojas y escribe cada
+#                etapa apenas llegaron sus hojas y sus
+#                dependencias están escritas; las escrituras
+#                corren de a una en un hilo escritor, así el
+#                bucle sigue atendiendo las descargas
+#
+# La validación (gate) corre cuando llegan las hojas
+# que revisa; si falla, run_pipeline devuelve False y
+# quien llama deshace lo ya escrito (toda la
+# importación es una sola transacción).
+# Con descargas lentas el total tiende a
+# max(descarga, escritura) en vez de la suma.
+# ============================================
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from scheduler import Stage, StageGraph
+
+# Hojas descargadas que pueden esperar en la cola al escritor
+PIPELINE_QUEUE_SIZE = 2
+
+# gate: (hojas que necesita, check() → bool)
+Gate = Tuple[Sequence[str], Callable[[], bool]]
+
+
+class PipelineStats:
+    """Tiempos del pipeline: descarga (de la primera a la última), escritura y total."""
+
+    def __init__(self):
+        self.fetch: Dict[str, float] = {}
+        self.write: Dict[str, float] = {}
+        self._fetch_span: List[float] = []
+        self.total_seconds = 0.0
+
+    def fetched(self, key: str, inicio: float, fin: float):
+        self.fetch[key] = fin - inicio
+        self._fetch_span = [
+            min(self._fetch_span[0], inicio) if self._fetch_span else inicio,
+            max(self._fetch_span[1], fin) if self._fetch_span else fin,
+        ]
+
+    @property
+    def fetch_seconds(self) -> float:
+        return self._fetch_span[1] - self._fetch_span[0] if self._fetch_span else 0.0
+
+    @property
+    def write_seconds(self) -> float:
+        return sum(self.write.values())
+
+    def report(self):
+        secuencial = self.fetch_seconds + self.write_seconds
+        print("\n🔀 Pipeline de importación:")
+        print(
+            f"   descarga {self.fetch_seconds:.2f}s ({len(self.fetch)} hojas), "
+            f"escritura {self.write_seconds:.2f}s, total {self.total_seconds:.2f}s "
+            f"(una después de la otra ≈ {secuencial:.2f}s)"
+        )
+
+
+def run_pipeline(
+    stages: Iterable[Stage],
+    fetch: Callable[[str], Any],
+    arrive: Callable[[str, Any], None],
+    write: Callable[[Stage], None],
+    gate: Optional[Gate] = None,
+    workers: int = 1,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    stats: Optional[PipelineStats] = None,
+) -> bool:
+    """
+    fetch(hoja) → filas (en hilos de descarga); arrive(hoja, filas) al
+    recibirla (en el bucle); write(etapa) en el hilo escritor, de a una.
+    Devuelve False si el gate no pasó; las excepciones de fetch o write
+    se propagan.
+    """
+    graph = stages if isinstance(stages, StageGraph) else StageGraph(stages)
+    stats = stats if stats is not None else PipelineStats()
+    inicio = time.perf_counter()
+    try:
+        return asyncio.run(
+            _pipeline(graph, fetch, arrive, write, gate, max(1, workers), max(1, queue_size), stats)
+        )
+    finally:
+        stats.total_seconds = time.perf_counter() - inicio
+
+
+async def _pipeline(
+    graph: StageGraph,
+    fetch: Callable[[str], Any],
+    arrive: Callable[[str, Any], None],
+    write: Callable[[Stage], None],
+    gate: Optional[Gate],
+    workers: int,
+    queue_size: int,
+    stats: PipelineStats,
+) -> bool:
+    loop = asyncio.get_running_loop()
+    cola: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    cupos = asyncio.Semaphore(workers)
+    descargas = ThreadPoolExecutor(max_workers=workers)
+    escritor = ThreadPoolExecutor(max_workers=1)
+
+    # Hojas en el orden en que las piden las etapas
+    hojas = list(dict.fromkeys(key for stage in graph.order for key in stage.hojas))
+
+    async def producir(key: str):
+        async with cupos:
+            inicio = time.perf_counter()
+            try:
+                filas = await loop.run_in_executor(descargas, fetch, key)
+            except Exception as e:
+                filas = e
+            stats.fetched(key, inicio, time.perf_counter())
+            await cola.put((key, filas))
+
+    async def escribir(stage: Stage):
+        inicio = time.perf_counter()
+        await loop.run_in_executor(escritor, write, stage)
+        stats.write[stage.nombre] = time.perf_counter() - inicio
+
+    productores = [asyncio.ensure_future(producir(key)) for key in hojas]
+    gate_hojas, gate_ok = gate if gate is not None else ((), None)
+    validado = gate is None
+    recibidas: set = set()
+    escritas: set = set()
+    pendientes = list(graph.order)
+    try:
+        while pendientes:
+            key, filas = await cola.get()
+            if isinstance(filas, Exception):
+                raise filas
+            arrive(key, filas)
+            recibidas.add(key)
+
+            if not validado and set(gate_hojas) <= recibidas:
+                if not gate_ok():
+                    return False
+                validado = True
+
+            # Todas las etapas que ya se pueden escribir, en orden
+            while True:
+                stage = next((
+                    s for s in pendientes
+                    if set(s.hojas) <= recibidas and set(s.depende) <= escritas
+                ), None)
+                if stage is None:
+                    break
+                await escribir(stage)
+                pendientes.remove(stage)
+                escritas.add(stage.nombre)
+
+        if not validado:
+            return gate_ok()
+        return True
+    finally:
+        for tarea in productores:
+            tarea.cancel()
+        await asyncio.gather(*productores, return_exceptions=True)
+        descargas.shutdown(wait=True)
+        escritor.shutdown(wait=True)
@@ -0,0 +1,102 @@
+# ============================================
+# profiler.py  — NUEVO en v3
+# Perfilado por etapa de run_import (--profile).
+# StageProfiler es un medidor para run_import(medir=...):
+# por etapa guarda tiempo real, tiempo de CPU, filas
+# y sentencias SQL (vía trace callback de la base).
+# Al terminar imprime una tabla ordenada por tiempo
+# y opcionalmente guarda JSON y/o un volcado cProfile
+# (para abrir con snakeviz o pstats).
+# Sin --profile no se crea y no hay ningún costo.
+# ============================================
+
+import contextlib
+import cProfile
+import json
+import time
+from typing import Any, Dict, Iterator, Optional
+from database import DatabaseManager
+
+
+class StageProfiler:
+    def __init__(self, db_manager: DatabaseManager, cprofile_path: Optional[str] = None):
+        self.db = db_manager
+        self.cprofile_path = cprofile_path
+        self.queries = 0
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.total_seconds = 0.0
+        self._inicio = 0.0
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    # ── ACTIVACIÓN ────────────────────────────────────────────────────
+
+    def _count(self, sql: str):
+        self.queries += 1
+
+    def __enter__(self) -> 'StageProfiler':
+        self.db.add_trace_callback(self._count)
+        if self.cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.total_seconds = time.perf_counter() - self._inicio
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self._cprofile = None
+        self.db.remove_trace_callback(self._count)
+
+    # ── MEDICIÓN POR ETAPA ────────────────────────────────────────────
+
+    @contextlib.contextmanager
+    def __call__(self, etapa: str, filas: Optional[int] = None) -> Iterator[None]:
+        queries = self.queries
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - wall
+            self.stages[etapa] = {
+                'seconds':     round(seconds, 6),
+                'cpu_seconds': round(time.process_time() - cpu, 6),
+                'rows':        filas,
+                'rows_per_s':  round(filas / seconds, 1) if filas and seconds > 0 else None,
+                'queries':     self.queries - queries,
+            }
+
+    # ── RESULTADOS ────────────────────────────────────────────────────
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total_seconds': round(self.total_seconds, 6),
+            'total_queries': self.queries,
+            'stages':        self.stages,
+        }
+
+    def save_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        print(f"💾 Perfil guardado en {path}")
+
+    def report(self):
+        if not self.stages:
+            return
+        total = self.total_seconds or sum(s['seconds'] for s in self.stages.values())
+        print("\n⏱️  Perfil por etapa (ordenado por tiempo):")
+        print(f"   {'etapa'.ljust(22)} {'seg':>8} {'%':>6} {'CPU':>8} {'filas':>8} {'filas/s':>9} {'SQL':>8}")
+        ranked = sorted(self.stages.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        for etapa, s in ranked:
+            pct = s['seconds'] / total * 100 if total else 0
+            filas = s['rows'] if s['rows'] is not None else '-'
+            rps = f"{s['rows_per_s']:.0f}" if s['rows_per_s'] else '-'
+            print(
+                f"   {etapa.ljust(22)} {s['seconds']:>8.3f} {pct:>5.1f}% {s['cpu_seconds']:>8.3f} "
+                f"{filas:>8} {rps:>9} {s['queries']:>8}"
+            )
+        print(f"   {'TOTAL'.ljust(22)} {total:>8.3f} {'':>6} {'':>8} {'':>8} {'':>9} {self.queries:>8}")
+        if self.cprofile_path:
+            print(f"   🔬 cProfile en {self.cprofile_path} (python -m pstats {self.cprofile_path})")
@@ -0,0 +1,169 @@
+# ============================================
+# quota.py  — NUEVO en v3
+# Capa de pedidos a la API de Google Sheets.
+#   TokenBucket       cuota local de lecturas por minuto,
+#                     compartida entre hilos; cada pedido
+#                     reserva su turno (cola FIFO)
+#   RequestScheduler  pasa cada llamada por el bucket y
+#                     reintenta 429, 5xx y errores de red
+#                     con backoff exponencial con jitter
+#                     (respeta Retry-After); cada espera y
+#                     reintento se registra con su tiempo
+# Un error que no se puede reintentar, o que sigue
+# tras SHEETS_MAX_RETRIES, se propaga: una hoja que no
+# se pudo leer nunca se confunde con una hoja vacía.
+# ============================================
+
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+from config import (
+    SHEETS_READS_PER_MINUTE, SHEETS_BURST, SHEETS_MAX_RETRIES, SHEETS_BACKOFF_MAX,
+)
+
+# Respuestas de la API que vale la pena reintentar
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+
+# Esperas por cuota más cortas que esto no se registran
+_LOG_MIN_WAIT = 0.05
+
+
+class SheetsRequestError(Exception):
+    """Una llamada a la API de Sheets falló después de todos los reintentos."""
+
+
+class TokenBucket:
+    """
+    Bucket de `burst` fichas que se recarga a (per_minute - burst) / 60
+    fichas por segundo: en cualquier ventana de 60 s pasan como mucho
+    per_minute pedidos, la cuota de la API, sin esperar de más.
+    """
+    def __init__(self, per_minute: int, burst: int, clock: Callable[[], float] = time.monotonic):
+        burst = max(1, min(burst, per_minute - 1))
+        self.capacity = float(burst)
+        self.rate = (per_minute - burst) / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Toma una ficha y devuelve cuántos segundos hay que esperar antes
+        de usarla. Las fichas pueden quedar en negativo: cada pedido
+        reserva su turno y los hilos salen en orden de llegada.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def drain(self):
+        """Tras un 429: vacía el bucket para que los demás hilos también frenen."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, 0.0)
+
+
+def _status(error: Exception) -> Optional[int]:
+    """Código HTTP de un gspread.exceptions.APIError (None si no es de la API)."""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(error, 'code', None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """
+    call(descripcion, fn, *args) → fn(*args), respetando la cuota y
+    reintentando lo que se puede reintentar. Seguro entre hilos.
+    """
+    def __init__(
+        self,
+        per_minute: int = SHEETS_READS_PER_MINUTE,
+        burst: int = SHEETS_BURST,
+        max_retries: int = SHEETS_MAX_RETRIES,
+        max_backoff: float = SHEETS_BACKOFF_MAX,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket = TokenBucket(per_minute, burst, clock)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.waited = 0.0
+
+    def _count(self, calls: int = 0, retries: int = 0, waited: float = 0.0):
+        with self._lock:
+            self.calls += calls
+            self.retries += retries
+            self.waited += waited
+
+    def backoff(self, intento: int) -> float:
+        """2^intento segundos + hasta 1 s de jitter, con tope max_backoff."""
+        return min(self.max_backoff, 2 ** intento + random.random())
+
+    def call(self, descripcion: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        for intento in range(self.max_retries + 1):
+            espera = self.bucket.reserve()
+            if espera > 0:
+                if espera >= _LOG_MIN_WAIT:
+                    print(f"   ⏳ {descripcion}: cuota de la API, esperando {espera:.2f}s")
+                self._sleep(espera)
+                self._count(waited=espera)
+
+            inicio = time.perf_counter()
+            try:
+                self._count(calls=1)
+                return fn(*args, **kwargs)
+            except Exception as e:
+                status = _status(e)
+                if status is not None:
+                    reintentable, motivo = status in RETRY_STATUS, f"HTTP {status}"
+                else:
+                    # requests.ConnectionError/Timeout heredan de OSError
+                    reintentable, motivo = isinstance(e, OSError), type(e).__name__
+                if not reintentable:
+                    raise
+                duracion = time.perf_counter() - inicio
+                if intento == self.max_retries:
+                    raise SheetsRequestError(
+                        f"{descripcion}: {motivo} tras {self.max_retries + 1} intentos ({e})"
+                    ) from e
+
+                demora = self.backoff(intento)
+                if status == 429:
+                    self.bucket.drain()
+                    demora = max(demora, _retry_after(e) or 0.0)
+                print(
+                    f"   🔁 {descripcion}: {motivo} en {duracion:.2f}s; "
+                    f"reintento {intento + 1}/{self.max_retries} en {demora:.2f}s"
+                )
+                self._count(retries=1, waited=demora)
+                self._sleep(demora)
+
+    def summary(self) -> Optional[str]:
+        """Resumen de llamadas, reintentos y espera (None si no hubo esperas)."""
+        if not self.retries and self.waited < _LOG_MIN_WAIT:
+            return None
+        return (
+            f"🌐 API de Sheets: {self.calls} llamadas, {self.retries} reintentos, "
+            f"{self.waited:.1f}s de espera"
+        )
@@ -0,0 +1,123 @@
+# ============================================
+# records.py  — NUEVO en v3
+# Modelo de fila compartido por validador, huellas y
+# converters. Cada hoja se normaliza UNA sola vez:
+# de cada dict de get_all_records() sale un registro
+# compacto (namedtuple: tupla con __slots__ vacíos)
+# con los campos lógicos de COLUMN_MAPPING ya
+# limpios (texto sin espacios; distrito entero,
+# es_urbano booleano).
+# Los extractores se arman una vez por hoja al
+# importar el módulo; parse_sheet() funciona igual
+# con listas que con hojas leídas en streaming.
+# name_key() es la clave normalizada de un nombre
+# geográfico (columna clave de la base, GeoIndex).
+# ============================================
+
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple
+from config import COLUMN_MAPPING
+
+TRUE_VALUES = frozenset(['1', 'true', 'si', 'sí', 'yes'])
+
+
+def text(value: Any) -> str:
+    """Celda → texto sin espacios alrededor ('' si está vacía)."""
+    if type(value) is str:
+        return value.strip()
+    return '' if value is None else str(value).strip()
+
+
+@lru_cache(maxsize=65536)         # los nombres se repiten fila a fila
+def name_key(value: Any) -> str:
+    """
+    Clave de comparación de un nombre: sin mayúsculas, sin acentos y con
+    los espacios colapsados ('  Potosí  Norte' → 'potosi norte').
+    También es la función SQL normalizar_clave() de cada conexión.
+    """
+    if value is None:
+        return ''
+    s = unicodedata.normalize('NFKD', str(value).casefold())
+    return ' '.join(''.join(ch for ch in s if not unicodedata.combining(ch)).split())
+
+
+def to_int(value: str, default: int = 0) -> int:
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+
+def to_bool(value: str) -> bool:
+    return value.lower() in TRUE_VALUES
+
+
+# Campos con tipo distinto de texto: (hoja, campo) → conversión del texto
+TYPED_FIELDS: Dict[Tuple[str, str], Callable[[str], Any]] = {
+    ('provincias', 'es_urbano'): to_bool,
+    ('recintos',   'distrito'):  to_int,
+}
+
+
+def _record_type(sheet: str) -> type:
+    name = ''.join(part.capitalize() for part in sheet.split('_')) + 'Record'
+    return namedtuple(name, list(COLUMN_MAPPING[sheet]))
+
+
+# Una clase de registro por hoja, con los campos en el orden de COLUMN_MAPPING
+RECORD_TYPES: Dict[str, type] = {sheet: _record_type(sheet) for sheet in COLUMN_MAPPING}
+
+
+def _extractor(sheet: str) -> Callable[[Dict[str, Any]], tuple]:
+    """dict de la hoja → registro; columnas y conversiones resueltas una vez."""
+    record = RECORD_TYPES[sheet]
+    new = tuple.__new__
+    columns = [COLUMN_MAPPING[sheet][field] for field in record._fields]
+    typed = [
+        (i, TYPED_FIELDS[(sheet, field)])
+        for i, field in enumerate(record._fields)
+        if (sheet, field) in TYPED_FIELDS
+    ]
+
+    def parse(row: Dict[str, Any]) -> tuple:
+        get = row.get
+        values = [text(get(column)) for column in columns]
+        for i, convert in typed:
+            values[i] = convert(values[i])
+        return new(record, values)
+
+    return parse
+
+
+EXTRACTORS: Dict[str, Callable[[Dict[str, Any]], tuple]] = {
+    sheet: _extractor(sheet) for sheet in COLUMN_MAPPING
+}
+
+
+class _Parsed:
+    """Hoja en streaming ya parseada: cada recorrido vuelve a leer el origen."""
+    def __init__(self, sheet: str, rows: Iterable[Dict[str, Any]]):
+        self.sheet = sheet
+        self.rows = rows
+
+    def __iter__(self) -> Iterator[tuple]:
+        return map(EXTRACTORS[self.sheet], self.rows)
+
+    def __repr__(self) -> str:
+        return f"_Parsed({self.sheet!r}, {self.rows!r})"
+
+
+def parse_sheet(sheet: str, rows: Iterable[Dict[str, Any]]) -> Iterable[tuple]:
+    """
+    Registros de una hoja. Una lista se parsea entera (y los dicts
+    originales se pueden liberar); un iterable re-recorrible (SheetStream)
+    se parsea al vuelo en cada recorrido.
+    """
+    if isinstance(rows, list):
+        return list(map(EXTRACTORS[sheet], rows))
+    if iter(rows) is rows:
+        return map(EXTRACTORS[sheet], rows)
+    return _Parsed(sheet, rows)
+
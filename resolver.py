@@ -0,0 +1,162 @@
+# ============================================
+# resolver.py  — NUEVO en v3
+# Resolución de claves foráneas en memoria.
+# Cada tabla dimensión se carga una sola vez en
+# un dict {valor: id}; los converters lo mantienen
+# al día con lo que van insertando, así que cada
+# búsqueda es O(1) en vez de un SELECT por fila.
+# La geografía se busca por nombre normalizado en
+# GeoIndex, bajando por la jerarquía cuando la hoja
+# trae la ruta completa (recintos). Si la ruta de la
+# hoja no alcanza para desempatar homónimos se usa el
+# id más bajo y se avisa una vez por ruta
+# (warn_ambiguous, también desde el motor staging).
+# ============================================
+
+from collections import Counter
+from typing import Dict, Optional, Sequence, Tuple, Union
+from database import DatabaseManager, GEO_PARENTS
+from geoindex import GeoIndex, LEVELS
+from records import name_key
+
+
+class ForeignKeyResolver:
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self._maps: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self.geo = GeoIndex(db_manager)
+        self.hits:   Counter = Counter()
+        self.misses: Counter = Counter()
+        self.loads:  Counter = Counter()
+        self.ambiguous: Counter = Counter()
+
+    # ── CARGA ─────────────────────────────────────────────────────────
+
+    def _map(self, table: str, field: str) -> Dict[str, int]:
+        key = (table, field)
+        id_map = self._maps.get(key)
+        if id_map is None:
+            id_map = self.db.load_id_map(table, field)
+            self._maps[key] = id_map
+            self.loads[f"{table}.{field}"] += 1
+        return id_map
+
+    @staticmethod
+    def _geo_path(table: str, *nombres: Union[str, int, None]) -> Sequence:
+        """Ruta para GeoIndex con los últimos niveles dados ('' en los de arriba)."""
+        return [''] * (LEVELS.index(table) + 1 - len(nombres)) + list(nombres)
+
+    # ── BÚSQUEDA ──────────────────────────────────────────────────────
+
+    def _find_geo(self, table: str, path: Sequence) -> Optional[int]:
+        """GeoIndex.find que avisa si hay más de un candidato."""
+        ids = self.geo.candidates(path)
+        if not ids:
+            return None
+        row_id = min(ids)
+        if len(ids) > 1:
+            self.warn_ambiguous(table, path, len(ids), row_id)
+        return row_id
+
+    def warn_ambiguous(self, table: str, path: Sequence, n: int, row_id: int):
+        """
+        La ruta coincide con n filas de `table` y se usó la de id más bajo.
+        Se avisa la primera vez por ruta (normalizada) y se cuentan todas.
+        """
+        clave = (table, tuple(name_key(nombre) for nombre in path))
+        self.ambiguous[clave] += 1
+        if self.ambiguous[clave] == 1:
+            ruta = " / ".join(str(nombre).strip() for nombre in path if name_key(nombre))
+            print(f"   ⚠️  {table.replace('_', ' ').capitalize()} '{ruta}' ambiguo: "
+                  f"{n} coincidencias → se usa id {row_id}")
+
+    def _count(self, label: str, row_id: Optional[int]) -> Optional[int]:
+        if row_id is None:
+            self.misses[label] += 1
+        else:
+            self.hits[label] += 1
+        return row_id
+
+    def get_id(self, table: str, field: str, value: Union[str, int, None]) -> Optional[int]:
+        """
+        Equivalente en memoria de DatabaseManager.get_id_by_field. Los
+        nombres de geografía se comparan normalizados (GeoIndex).
+        """
+        if value is None:
+            return None
+        search = str(value).strip()
+        if not search:
+            return None
+        if table in GEO_PARENTS and field == 'nombre':
+            return self.get_geo_id(table, search)
+        return self._count(f"{table}.{field}", self._map(table, field).get(search))
+
+    def get_geo_id(self, table: str, *nombres: Union[str, int, None]) -> Optional[int]:
+        """
+        Id de `table` por su nombre y, si se dan, los de sus ancestros
+        inmediatos: get_geo_id('asiento_electoral', depto, prov, mun, asiento).
+        """
+        return self._count(f"{table}.nombre", self._find_geo(table, self._geo_path(table, *nombres)))
+
+    def get_recinto_id(self, asiento_nombre: str, recinto_nombre: str) -> Optional[int]:
+        """Equivalente en memoria de get_recinto_id_by_asiento_and_nombre."""
+        if not asiento_nombre or not recinto_nombre:
+            return None
+        row_id = self._find_geo('recinto', self._geo_path('recinto', asiento_nombre, recinto_nombre))
+        return self._count('recinto.asiento+nombre', row_id)
+
+    def has(self, table: str, field: str, value: Union[str, int, None]) -> bool:
+        """Como get_id() pero sin contar aciertos/fallos."""
+        if value is None or not str(value).strip():
+            return False
+        if table in GEO_PARENTS and field == 'nombre':
+            return self.geo.has(self._geo_path(table, value))
+        return str(value).strip() in self._map(table, field)
+
+    def has_recinto(self, asiento_nombre: str, recinto_nombre: str) -> bool:
+        if not asiento_nombre or not recinto_nombre:
+            return False
+        return self.geo.has(self._geo_path('recinto', asiento_nombre, recinto_nombre))
+
+    # ── ACTUALIZACIÓN ─────────────────────────────────────────────────
+
+    def remember(self, table: str, field: str, value: Union[str, int, None], row_id: int):
+        """
+        Registra un id recién insertado/actualizado.
+        Solo toca mapas ya cargados: los que aún no se cargaron
+        leerán la fila de la base cuando se pidan por primera vez.
+        """
+        if value is None:
+            return
+        id_map = self._maps.get((table, field))
+        if id_map is not None:
+            id_map.setdefault(str(value).strip(), row_id)
+
+    def remember_geo(self, table: str, parent_id: Optional[int], nombre: str, row_id: int):
+        """Registra una fila de geografía escrita (ver GeoIndex.add)."""
+        self.geo.add(table, row_id, parent_id, nombre)
+
+    def forget(self, table: str):
+        """
+        Descarta los mapas de una tabla escrita sin pasar por remember()
+        (motor staging): se recargan de la base la próxima vez.
+        """
+        for key in [k for k in self._maps if k[0] == table]:
+            del self._maps[key]
+        if table in GEO_PARENTS:
+            self.geo.reset()
+
+    # ── REPORTE ───────────────────────────────────────────────────────
+
+    def report(self):
+        if self.geo.loads:
+            self.loads['geografía'] = self.geo.loads
+        labels = sorted(set(self.hits) | set(self.misses) | set(self.loads))
+        if not labels:
+            return
+        print("\n🧭 Resolución de claves foráneas (caché en memoria):")
+        for label in labels:
+            print(
+                f"   {label.ljust(26)}: {self.hits[label]:>7} aciertos, "
+                f"{self.misses[label]:>5} sin resolver, {self.loads[label]} carga(s)"
+            )
@@ -0,0 +1,200 @@
+# ============================================
+# scheduler.py  — NUEVO en v3
+# Planificador de etapas de importación como grafo
+# de dependencias (DAG).
+# Cada etapa declara de qué etapas depende; la
+# preparación (lo que no toca SQLite: huellas de
+# fila, filtrado incremental) corre en un pool de
+# hilos en cuanto empieza la importación, mientras
+# que las escrituras pasan de a una por el hilo que
+# llama a run(): SQLite admite un solo escritor y la
+# sesión usa una única conexión.
+# El escritor toma la primera etapa (en orden de
+# declaración) cuyas dependencias ya se escribieron
+# y cuya preparación terminó; al final report()
+# muestra la ruta crítica del grafo con los tiempos
+# medidos.
+# ============================================
+
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# nombre: etapa; hojas: hojas que consume; depende: etapas que deben
+# estar escritas antes de escribir esta
+Stage = namedtuple('Stage', ['nombre', 'hojas', 'depende'])
+
+
+class StageGraph:
+    """Etapas validadas (dependencias existentes, sin ciclos) en orden topológico."""
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.nombre in self.stages:
+                raise ValueError(f"Etapa '{stage.nombre}' declarada dos veces")
+            self.stages[stage.nombre] = stage
+        for stage in self.stages.values():
+            for dep in stage.depende:
+                if dep not in self.stages:
+                    raise ValueError(f"Etapa '{stage.nombre}' depende de '{dep}', que no existe")
+        self.order: List[Stage] = self._topological()
+
+    def _topological(self) -> List[Stage]:
+        """Kahn estable: entre las etapas listas, la primera declarada."""
+        pendientes = list(self.stages.values())
+        hechas: set = set()
+        orden = []
+        while pendientes:
+            lista = next((s for s in pendientes if set(s.depende) <= hechas), None)
+            if lista is None:
+                ciclo = " → ".join(s.nombre for s in pendientes)
+                raise ValueError(f"Ciclo de dependencias entre las etapas: {ciclo}")
+            pendientes.remove(lista)
+            hechas.add(lista.nombre)
+            orden.append(lista)
+        return orden
+
+    def critical_path(self, seconds: Dict[str, float]) -> Tuple[List[str], float]:
+        """
+        Cadena de dependencias de mayor duración total según `seconds`
+        (por etapa); las etapas sin tiempo cuentan 0.
+        """
+        mejor: Dict[str, Tuple[float, List[str]]] = {}
+        for stage in self.order:
+            previo = max(
+                (mejor[dep] for dep in stage.depende),
+                key=lambda t: t[0], default=(0.0, []),
+            )
+            mejor[stage.nombre] = (
+                previo[0] + seconds.get(stage.nombre, 0.0),
+                previo[1] + [stage.nombre],
+            )
+        if not mejor:
+            return [], 0.0
+        total, ruta = max(mejor.values(), key=lambda t: t[0])
+        return ruta, total
+
+
+class StageScheduler:
+    """
+    Corre prepare(etapa) en `workers` hilos y write(etapa, preparado) en
+    el hilo que llama a run(), respetando las dependencias del grafo.
+    Con workers <= 1 todo es secuencial y en orden: cada etapa se prepara
+    justo antes de escribirla (lo que necesita --stream, que prepara
+    iteradores perezosos).
+    """
+
+    def __init__(self, stages: Iterable[Stage], workers: int = 1):
+        self.graph = stages if isinstance(stages, StageGraph) else StageGraph(stages)
+        self.workers = max(1, workers)
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._prepare: Optional[Callable[[Stage], Any]] = None
+        self._inicio = 0.0
+        self.total_seconds = 0.0
+
+    # ── PREPARACIÓN ───────────────────────────────────────────────────
+
+    def _timed_prepare(self, stage: Stage) -> Any:
+        inicio = time.perf_counter()
+        try:
+            return self._prepare(stage)
+        finally:
+            self.timings.setdefault(stage.nombre, {})['preparacion'] = time.perf_counter() - inicio
+
+    def start(self, prepare: Callable[[Stage], Any]):
+        """
+        Lanza la preparación de todas las etapas (en paralelo si workers > 1).
+        Se puede llamar antes de otro trabajo del hilo principal (p. ej. la
+        validación) para que se solapen.
+        """
+        self._prepare = prepare
+        self._inicio = time.perf_counter()
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+            self._futures = {
+                stage.nombre: self._pool.submit(self._timed_prepare, stage)
+                for stage in self.graph.order
+            }
+
+    def close(self):
+        """Cancela las preparaciones que no empezaron y espera las que corren."""
+        if self._pool is not None:
+            for future in self._futures.values():
+                future.cancel()
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def __enter__(self) -> 'StageScheduler':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ── ESCRITURA ─────────────────────────────────────────────────────
+
+    def run(self, write: Callable[[Stage, Any], None]):
+        """Escribe todas las etapas; una excepción corta el resto."""
+        if self._prepare is None:
+            raise RuntimeError("StageScheduler.run() sin start()")
+        escritas: set = set()
+        pendientes = list(self.graph.order)
+        try:
+            while pendientes:
+                stage, espera = self._next(pendientes, escritas)
+                preparado = (
+                    self._futures[stage.nombre].result() if self._pool is not None
+                    else self._timed_prepare(stage)
+                )
+                inicio = time.perf_counter()
+                write(stage, preparado)
+                t = self.timings.setdefault(stage.nombre, {})
+                t['escritura'] = time.perf_counter() - inicio
+                t['espera'] = espera
+                pendientes.remove(stage)
+                escritas.add(stage.nombre)
+        finally:
+            self.total_seconds = time.perf_counter() - self._inicio
+            self.close()
+
+    def _next(self, pendientes: List[Stage], escritas: set) -> Tuple[Stage, float]:
+        """
+        Primera etapa con dependencias escritas y preparación lista; si
+        ninguna lo está, espera a la próxima preparación que termine.
+        Devuelve (etapa, segundos esperados).
+        """
+        inicio = time.perf_counter()
+        while True:
+            listas = [s for s in pendientes if set(s.depende) <= escritas]
+            if self._pool is None:
+                return listas[0], 0.0
+            for stage in listas:
+                if self._futures[stage.nombre].done():
+                    return stage, time.perf_counter() - inicio
+            wait([self._futures[s.nombre] for s in listas], return_when=FIRST_COMPLETED)
+
+    # ── REPORTE ───────────────────────────────────────────────────────
+
+    def report(self):
+        if not self.timings:
+            return
+        # Peso de cada etapa: lo que ocupó al escritor (escritura + espera
+        # de su preparación); la preparación solapada no alarga la ruta
+        seconds = {
+            nombre: t.get('escritura', 0.0) + t.get('espera', 0.0)
+            for nombre, t in self.timings.items()
+        }
+        ruta, largo = self.graph.critical_path(seconds)
+        escritura = sum(t.get('escritura', 0.0) for t in self.timings.values())
+        preparacion = sum(t.get('preparacion', 0.0) for t in self.timings.values())
+        espera = sum(t.get('espera', 0.0) for t in self.timings.values())
+        hilos = f"{self.workers} hilos de preparación" if self.workers > 1 else "secuencial"
+        print(f"\n🧮 Planificador de etapas ({hilos}):")
+        print(
+            f"   preparación {preparacion:.2f}s, escritura {escritura:.2f}s, "
+            f"escritor esperando {espera:.2f}s, total {self.total_seconds:.2f}s"
+        )
+        print(f"   ⛓️  Ruta crítica ({largo:.2f}s): {' → '.join(ruta)}")
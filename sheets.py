@@ -1,15 +1,65 @@
 # sheets.py - Manejo de Google Sheets
+# Cambios v3:
+#   - Todas las llamadas a la API pasan por quota.RequestScheduler
+#     (cuota local + reintentos de 429/5xx con backoff); un error que
+#     persiste se propaga en vez de devolver la hoja como []
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gspread
+from gspread.utils import numericise_all
 from google.oauth2.service_account import Credentials
-from typing import List, Dict
-from config import CREDENTIALS_FILE, SPREADSHEET_ID, SHEET_NAMES
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Callable
+from snapshot_cache import SnapshotCache
+from quota import RequestScheduler
+from config import (
+    CREDENTIALS_FILE, SPREADSHEET_ID, SHEET_NAMES,
+    MAX_FETCH_WORKERS, STREAM_CHUNK_SIZE,
+)
+
+
+class SheetStream:
+    """
+    Hoja leída por bloques. Se puede recorrer varias veces (validación e
+    importación): cada recorrido vuelve a pedir los bloques a la API, así
+    que en memoria nunca hay más de chunk_size filas.
+    """
+    def __init__(self, sheets: 'SheetsManager', sheet_name: str, chunk_size: int = STREAM_CHUNK_SIZE):
+        self.sheets = sheets
+        self.sheet_name = sheet_name
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self.sheets.iter_sheet(self.sheet_name, self.chunk_size)
+
+    def __repr__(self) -> str:
+        return f"SheetStream({self.sheet_name!r}, chunk_size={self.chunk_size})"
+
 
 class SheetsManager:
-    def __init__(self, credentials_file: str = CREDENTIALS_FILE, spreadsheet_id: str = SPREADSHEET_ID):
+    def __init__(
+        self,
+        credentials_file: str = CREDENTIALS_FILE,
+        spreadsheet_id: str = SPREADSHEET_ID,
+        client: Optional[Any] = None,
+        cache: Optional[SnapshotCache] = None,
+        refresh: bool = False,
+        requests: Optional[RequestScheduler] = None,
+    ):
+        """
+        client permite inyectar un cliente ya autorizado (o uno falso
+        en pruebas) en vez de conectar con las credenciales.
+        cache: caché local de hojas (None = siempre descargar).
+        refresh: ignora lo guardado en caché, descarga y la reescribe.
+        requests: cuota y reintentos de la API (por defecto los de config).
+        """
         self.credentials_file = credentials_file
         self.spreadsheet_id = spreadsheet_id
-        self.client = None
-        self._connect()
+        self.client = client
+        self.cache = cache
+        self.refresh = refresh
+        self.requests = requests if requests is not None else RequestScheduler()
+        if self.client is None:
+            self._connect()
     
     def _connect(self):
         """Conecta con Google Sheets"""
@@ -32,12 +82,15 @@ class SheetsManager:
             raise
     
     def get_sheet_data(self, sheet_name: str) -> List[Dict[str, str]]:
-        """Obtiene datos de una hoja específica"""
+        """
+        Obtiene datos de una hoja específica. Una hoja que no existe da []
+        con un aviso; cualquier otro error (tras los reintentos) se propaga.
+        """
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            worksheet = spreadsheet.worksheet(sheet_name)
+            spreadsheet = self._open()
+            worksheet = self.requests.call(f"hoja '{sheet_name}'", spreadsheet.worksheet, sheet_name)
             
-            data = worksheet.get_all_records()
+            data = self.requests.call(f"hoja '{sheet_name}'", worksheet.get_all_records)
             print(f"📊 {sheet_name}: {len(data)} registros")
             return data
             
@@ -46,13 +99,283 @@ class SheetsManager:
             return []
         except Exception as e:
             print(f"❌ Error en hoja '{sheet_name}': {e}")
-            return []
+            raise
     
+    # ── LECTURA DE VARIAS HOJAS ───────────────────────────────────────
+
+    def fetch_sheets(
+        self, sheet_names: List[str], workers: int = 1
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Punto de entrada para leer varias hojas.
+        Con caché: compara la revisión del spreadsheet (modifiedTime) y
+        reutiliza las hojas guardadas si no cambió; solo descarga el resto.
+        workers=1 descarga en lote; workers>1 en paralelo.
+        Una hoja que no se pudo descargar es un error, no una hoja vacía.
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {name: [] for name in sheet_names}
+        try:
+            spreadsheet = self._open()
+        except Exception as e:
+            print(f"❌ Error abriendo el spreadsheet: {e}")
+            raise
+
+        revision = self._revision(spreadsheet) if self.cache is not None else None
+        pendientes = list(sheet_names)
+        if revision is not None and not self.refresh:
+            en_cache = set()
+            for name in sheet_names:
+                data = self.cache.load(self.spreadsheet_id, name, revision)
+                if data is not None:
+                    print(f"💾 {name}: {len(data)} registros (caché)")
+                    result[name] = data
+                    en_cache.add(name)
+            pendientes = [n for n in sheet_names if n not in en_cache]
+            if not pendientes:
+                print(f"  💾 Spreadsheet sin cambios desde {revision}: todo desde caché")
+                return result
+
+        existentes = self._existing(spreadsheet, pendientes)
+        if workers > 1:
+            fetched = self._fetch_concurrent(spreadsheet, existentes, workers)
+        else:
+            fetched = self._fetch_batch(spreadsheet, existentes)
+        result.update(fetched)
+
+        if revision is not None:
+            for name, data in fetched.items():
+                self.cache.save(self.spreadsheet_id, name, revision, data)
+        resumen = self.requests.summary()
+        if resumen:
+            print(f"  {resumen}")
+        return result
+
+    def get_all_sheets(self, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Obtiene varias hojas con una sola llamada values_batch_get.
+        Abre el spreadsheet una vez, lista las hojas existentes y pide
+        todos los rangos juntos: 3 llamadas HTTP en vez de 3 por hoja.
+        Devuelve {sheet_name: registros} en el mismo orden pedido;
+        las hojas que no existen quedan como [] (igual que get_sheet_data).
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {name: [] for name in sheet_names}
+        spreadsheet = self._open()
+        result.update(self._fetch_batch(spreadsheet, self._existing(spreadsheet, sheet_names)))
+        return result
+
+    def get_sheets_concurrent(
+        self, sheet_names: List[str], workers: int = 4
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Descarga cada hoja con su propio values_get en un pool de
+        `workers` hilos (máx. MAX_FETCH_WORKERS), respetando la cuota de
+        lecturas por minuto. El resultado conserva el orden pedido; si
+        una hoja falla tras los reintentos, se propaga el error.
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {name: [] for name in sheet_names}
+        spreadsheet = self._open()
+        existentes = self._existing(spreadsheet, sheet_names)
+        result.update(self._fetch_concurrent(spreadsheet, existentes, workers))
+        return result
+
+    def sheet_fetcher(self, sheet_names: List[str]) -> Callable[[str], List[Dict[str, Any]]]:
+        """
+        Para leer hojas de a una (--pipeline): abre el spreadsheet y
+        consulta revisión, caché y hojas existentes una sola vez, y
+        devuelve fetch(nombre) → registros (un values_get por hoja,
+        respetando la cuota). fetch se puede llamar desde varios hilos;
+        sus errores se propagan.
+        """
+        spreadsheet = self._open()
+        revision = self._revision(spreadsheet) if self.cache is not None else None
+        existentes = set(self._existing(spreadsheet, sheet_names))
+
+        def fetch(name: str) -> List[Dict[str, Any]]:
+            if revision is not None and not self.refresh:
+                data = self.cache.load(self.spreadsheet_id, name, revision)
+                if data is not None:
+                    print(f"💾 {name}: {len(data)} registros (caché)")
+                    return data
+            if name not in existentes:
+                return []
+            start = time.perf_counter()
+            response = self.requests.call(
+                f"hoja '{name}'", spreadsheet.values_get, self._a1_sheet(name)
+            )
+            data = self._to_records(response.get('values', []))
+            print(f"📊 {name}: {len(data)} registros ({time.perf_counter() - start:.2f}s)")
+            if revision is not None:
+                self.cache.save(self.spreadsheet_id, name, revision, data)
+            return data
+        return fetch
+
+    # ── LECTURA EN STREAMING ──────────────────────────────────────────
+
+    def iter_sheet(
+        self, sheet_name: str, chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Genera los registros de una hoja pidiendo bloques de chunk_size
+        filas ('Hoja'!2:5001, 'Hoja'!5002:10001, ...). Los registros son
+        los mismos que da get_all_records(); se recorre hasta row_count
+        y las filas vacías del final no generan registros.
+        Un error a mitad de camino se propaga: nunca se corta la hoja.
+        """
+        a1 = self._a1_sheet(sheet_name)
+        descripcion = f"hoja '{sheet_name}'"
+        spreadsheet = self._open()
+        try:
+            worksheet = self.requests.call(descripcion, spreadsheet.worksheet, sheet_name)
+        except gspread.WorksheetNotFound:
+            print(f"⚠️  Hoja '{sheet_name}' no encontrada - saltando")
+            return
+        row_count = worksheet.row_count
+        header = self.requests.call(descripcion, spreadsheet.values_get, f"{a1}!1:1").get('values', [])
+        if not header:
+            return
+
+        keys = header[0]
+        total = 0
+        huecos = 0      # filas vacías pendientes (la API recorta las del final de cada bloque)
+        for start in range(2, row_count + 1, chunk_size):
+            end = start + chunk_size - 1
+            values = self.requests.call(
+                f"{descripcion} (filas {start}-{end})", spreadsheet.values_get, f"{a1}!{start}:{end}"
+            ).get('values', [])
+            if values:
+                for record in self._to_records([keys] + [[]] * huecos + values):
+                    yield record
+                total += huecos + len(values)
+                huecos = 0
+            huecos += chunk_size - len(values)
+        print(f"📊 {sheet_name}: {total} registros (streaming, bloques de {chunk_size})")
+
+    def stream_sheets(
+        self, sheet_names: List[str], chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Dict[str, SheetStream]:
+        """{sheet_name: SheetStream}; no descarga nada hasta recorrerlas."""
+        return {name: SheetStream(self, name, chunk_size) for name in sheet_names}
+
+    # ── INTERNOS ──────────────────────────────────────────────────────
+
+    def _open(self):
+        return self.requests.call("abrir spreadsheet", self.client.open_by_key, self.spreadsheet_id)
+
+    def _revision(self, spreadsheet) -> Optional[str]:
+        """
+        modifiedTime del archivo en Drive (None si no se puede obtener:
+        sin revisión no se usa la caché). get_lastUpdateTime() lo pide a
+        Drive en cada llamada; la propiedad lastUpdateTime avisa con un
+        UserWarning y solo trae el valor de cuando se abrió.
+        """
+        try:
+            return self.requests.call("revisión del spreadsheet", spreadsheet.get_lastUpdateTime)
+        except Exception as e:
+            print(f"⚠️  No se pudo leer la revisión del spreadsheet ({e}); caché desactivada")
+            return None
+
+    def _existing(self, spreadsheet, sheet_names: List[str]) -> List[str]:
+        """Filtra las hojas que existen; avisa de las que no."""
+        existentes = {ws.title for ws in self.requests.call("listar hojas", spreadsheet.worksheets)}
+        pedir = []
+        for name in sheet_names:
+            if name in existentes:
+                pedir.append(name)
+            else:
+                print(f"⚠️  Hoja '{name}' no encontrada - saltando")
+        return pedir
+
+    def _fetch_batch(self, spreadsheet, sheet_names: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """values_batch_get de todas las hojas; un error se propaga."""
+        if not sheet_names:
+            return {}
+        try:
+            response = self.requests.call(
+                "lectura en lote", spreadsheet.values_batch_get,
+                [self._a1_sheet(n) for n in sheet_names],
+            )
+        except Exception as e:
+            print(f"❌ Error leyendo hojas en lote: {e}")
+            raise
+
+        fetched = {}
+        for name, value_range in zip(sheet_names, response.get('valueRanges', [])):
+            data = self._to_records(value_range.get('values', []))
+            print(f"📊 {name}: {len(data)} registros")
+            fetched[name] = data
+        faltan = [n for n in sheet_names if n not in fetched]
+        if faltan:
+            raise RuntimeError(f"La lectura en lote no devolvió: {', '.join(faltan)}")
+        return fetched
+
+    def _fetch_concurrent(
+        self, spreadsheet, sheet_names: List[str], workers: int
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Un values_get por hoja en un pool de hilos. Si alguna hoja falla
+        (tras los reintentos), se esperan las demás y se propaga el error.
+        """
+        workers = max(1, min(workers, MAX_FETCH_WORKERS))
+
+        def fetch(name: str) -> Tuple[List[Dict[str, Any]], float, Optional[Exception]]:
+            start = time.perf_counter()
+            try:
+                response = self.requests.call(
+                    f"hoja '{name}'", spreadsheet.values_get, self._a1_sheet(name)
+                )
+                data = self._to_records(response.get('values', []))
+                return data, time.perf_counter() - start, None
+            except Exception as e:
+                return [], time.perf_counter() - start, e
+
+        print(f"  ⚡ Descargando {len(sheet_names)} hojas con {workers} hilos...")
+        fetched = {}
+        failed = []
+        errores = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(fetch, name) for name in sheet_names}
+            for name in sheet_names:
+                data, elapsed, error = futures[name].result()
+                if error is None:
+                    print(f"📊 {name}: {len(data)} registros ({elapsed:.2f}s)")
+                    fetched[name] = data
+                else:
+                    print(f"❌ Error en hoja '{name}' ({elapsed:.2f}s): {error}")
+                    failed.append(name)
+                    errores.append(error)
+
+        if failed:
+            print(f"⚠️  {len(failed)} hoja(s) con error: {', '.join(failed)}")
+            raise errores[0]
+        return fetched
+
+    @staticmethod
+    def _a1_sheet(sheet_name: str) -> str:
+        """Rango A1 de la hoja completa ('Mi Hoja' → "'Mi Hoja'")."""
+        return "'" + sheet_name.replace("'", "''") + "'"
+
+    @staticmethod
+    def _to_records(values: List[List[Any]]) -> List[Dict[str, Any]]:
+        """
+        Convierte filas crudas (la primera es el encabezado) en registros,
+        igual que worksheet.get_all_records(): completa celdas vacías al
+        final de cada fila con '' y numeriza los valores.
+        """
+        if not values:
+            return []
+        keys = values[0]
+        width = len(keys)
+        records = []
+        for row in values[1:]:
+            row = list(row[:width]) + [''] * (width - len(row))
+            records.append(dict(zip(keys, numericise_all(row, default_blank=''))))
+        return records
+
     def list_sheets(self) -> List[str]:
         """Lista todas las hojas disponibles"""
         try:
-            spreadsheet = self.client.open_by_key(self.spreadsheet_id)
-            sheets = [ws.title for ws in spreadsheet.worksheets()]
+            spreadsheet = self._open()
+            sheets = [ws.title for ws in self.requests.call("listar hojas", spreadsheet.worksheets)]
             print(f"📋 Hojas disponibles: {sheets}")
             return sheets
         except Exception as e:
@@ -0,0 +1,67 @@
+# ============================================
+# snapshot_cache.py  — NUEVO en v3
+# Copia local (JSON comprimido) de cada hoja,
+# guardada por spreadsheet y nombre de hoja junto
+# con la revisión (modifiedTime) del spreadsheet.
+# Si la revisión no cambió, la hoja se lee del
+# disco en vez de descargarla otra vez.
+# ============================================
+
+import gzip
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from config import CACHE_DIR
+
+
+class SnapshotCache:
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, spreadsheet_id: str, sheet_name: str) -> Path:
+        safe = re.sub(r'[^\w.-]', '_', sheet_name)
+        return self.cache_dir / spreadsheet_id / f"{safe}.json.gz"
+
+    def load(
+        self, spreadsheet_id: str, sheet_name: str, revision: str
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Registros guardados si coinciden hoja y revisión; si no, None."""
+        path = self._path(spreadsheet_id, sheet_name)
+        if not path.exists():
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Caché ilegible para '{sheet_name}': {e}")
+            return None
+        if snapshot.get('revision') != revision or snapshot.get('sheet') != sheet_name:
+            return None
+        return snapshot.get('data', [])
+
+    def save(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        revision: str,
+        data: List[Dict[str, Any]],
+    ):
+        """Escribe la hoja en un temporal y lo renombra (nunca queda a medias)."""
+        path = self._path(spreadsheet_id, sheet_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        snapshot = {'sheet': sheet_name, 'revision': revision, 'data': data}
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def clear(self, spreadsheet_id: Optional[str] = None) -> int:
+        """Borra la caché (de un spreadsheet o completa). Devuelve archivos borrados."""
+        base = self.cache_dir / spreadsheet_id if spreadsheet_id else self.cache_dir
+        count = 0
+        for path in base.glob('**/*.json.gz'):
+            path.unlink()
+            count += 1
+        return count
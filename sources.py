@@ -0,0 +1,297 @@
+# ============================================
+# sources.py  — NUEVO en v3
+# Orígenes de datos intercambiables para importar
+# y validar: Google Sheets (SheetsManager) o
+# exportaciones locales (CSV, XLSX, JSON).
+# Todos exponen fetch_sheets() y stream_sheets()
+# con la misma forma de registro que
+# get_all_records(), así que validador, huellas y
+# converters no saben de dónde vienen las filas.
+#
+#   --source sheets               → Google Sheets (por defecto)
+#   --source file:export.xlsx     → un libro con una hoja por pestaña
+#   --source file:export.json     → {"NombreHoja": [registros]}
+#   --source dir:./csv/           → un NombreHoja.csv por hoja
+#
+# sheet_fetcher() lee hojas de a una (para --pipeline);
+# DelayedSource agrega una demora por hoja a otro
+# origen para simular la latencia de la API.
+# ============================================
+
+import csv
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from gspread.utils import numericise_all
+from config import SHEET_NAMES, STREAM_CHUNK_SIZE
+
+
+def _records(header: List[Any], rows: Iterable[List[Any]]) -> Iterator[Dict[str, Any]]:
+    """
+    Registros como los de get_all_records(): completa cada fila hasta el
+    ancho del encabezado con '' y numeriza los textos. Las filas vacías
+    solo se emiten si después viene una con datos (la API recorta las
+    del final).
+    """
+    keys = ['' if k is None else str(k) for k in header]
+    width = len(keys)
+    huecos = 0
+    for row in rows:
+        row = ['' if v is None else v for v in list(row)[:width]]
+        if not any(str(v).strip() for v in row):
+            huecos += 1
+            continue
+        for _ in range(huecos):
+            yield dict(zip(keys, [''] * width))
+        huecos = 0
+        row = row + [''] * (width - len(row))
+        texts = [i for i, v in enumerate(row) if isinstance(v, str)]
+        numeric = numericise_all([row[i] for i in texts], default_blank='')
+        for i, v in zip(texts, numeric):
+            row[i] = v
+        yield dict(zip(keys, row))
+
+
+class _Rows:
+    """Iterable que vuelve a abrir el origen en cada recorrido."""
+    def __init__(self, open_rows: Callable[[], Iterator[Dict[str, Any]]], label: str):
+        self._open_rows = open_rows
+        self.label = label
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._open_rows()
+
+    def __repr__(self) -> str:
+        return f"_Rows({self.label!r})"
+
+
+class FileSource(ABC):
+    """
+    Base de los orígenes locales. Las subclases implementan _has(nombre)
+    y _iter(nombre) (abstractos: una subclase sin ellos falla al crearse,
+    no a mitad de la importación); fetch_sheets y stream_sheets salen de ahí.
+    Sin cuota ni red: workers y chunk_size se aceptan y se ignoran.
+    """
+    label = "archivo local"
+
+    @abstractmethod
+    def _has(self, sheet_name: str) -> bool:
+        """¿Existe la hoja en este origen?"""
+
+    @abstractmethod
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        """Registros de la hoja, como get_all_records()."""
+
+    def fetch_sheets(self, sheet_names: List[str], workers: int = 1) -> Dict[str, List[Dict[str, Any]]]:
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        for name in sheet_names:
+            if not self._has(name):
+                print(f"⚠️  Hoja '{name}' no encontrada - saltando")
+                result[name] = []
+                continue
+            result[name] = list(self._iter(name))
+            print(f"📊 {name}: {len(result[name])} registros ({self.label})")
+        return result
+
+    def sheet_fetcher(self, sheet_names: List[str]) -> Callable[[str], List[Dict[str, Any]]]:
+        """
+        fetch(nombre) → registros de una hoja, como fetch_sheets([nombre]).
+        Se puede llamar desde varios hilos: las lecturas se serializan
+        (openpyxl y los archivos abiertos no son seguros entre hilos).
+        """
+        lock = threading.Lock()
+
+        def fetch(name: str) -> List[Dict[str, Any]]:
+            with lock:
+                return self.fetch_sheets([name])[name]
+        return fetch
+
+    def stream_sheets(
+        self, sheet_names: List[str], chunk_size: int = STREAM_CHUNK_SIZE
+    ) -> Dict[str, Iterable[Dict[str, Any]]]:
+        result: Dict[str, Iterable[Dict[str, Any]]] = {}
+        for name in sheet_names:
+            if self._has(name):
+                result[name] = _Rows(lambda name=name: self._iter(name), f"{self.label}: {name}")
+            else:
+                print(f"⚠️  Hoja '{name}' no encontrada - saltando")
+                result[name] = []
+        return result
+
+
+class CsvDirSource(FileSource):
+    """
+    Carpeta con un CSV por hoja, nombrado como la pestaña (Jefes.csv,
+    Asientos Electorales.csv, ...; sin distinguir mayúsculas). Es lo que
+    produce "Archivo → Descargar → CSV" de cada pestaña. Se lee en
+    streaming: en memoria solo está la fila actual.
+    """
+    label = "CSV"
+
+    def __init__(self, directory: str, encoding: str = 'utf-8-sig'):
+        self.directory = Path(directory)
+        self.encoding = encoding
+        if not self.directory.is_dir():
+            raise FileNotFoundError(f"Carpeta de CSV no encontrada: {self.directory}")
+        self._files = {p.stem.lower(): p for p in self.directory.glob('*.csv')}
+
+    def _has(self, sheet_name: str) -> bool:
+        return sheet_name.lower() in self._files
+
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        with open(self._files[sheet_name.lower()], newline='', encoding=self.encoding) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            yield from _records(header, reader)
+
+
+class ExcelSource(FileSource):
+    """
+    Libro .xlsx ("Archivo → Descargar → Microsoft Excel"), una pestaña por
+    hoja. Usa openpyxl en modo read_only, que recorre las filas sin cargar
+    el libro entero.
+    """
+    label = "XLSX"
+
+    def __init__(self, path: str):
+        try:
+            import openpyxl
+        except ImportError:
+            raise ImportError(
+                "Para leer archivos .xlsx instala openpyxl: pip install openpyxl"
+            ) from None
+        self._openpyxl = openpyxl
+        self.path = Path(path)
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Archivo no encontrado: {self.path}")
+        wb = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            self._titles = {title.lower(): title for title in wb.sheetnames}
+        finally:
+            wb.close()
+
+    def _has(self, sheet_name: str) -> bool:
+        return sheet_name.lower() in self._titles
+
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        wb = self._openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = wb[self._titles[sheet_name.lower()]].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            yield from _records(list(header), (self._cells(r) for r in rows))
+        finally:
+            wb.close()
+
+    @staticmethod
+    def _cells(row) -> List[Any]:
+        # Números enteros guardados como float (1234.0) se ven como en Sheets
+        return [
+            int(v) if isinstance(v, float) and v.is_integer() else v
+            for v in row
+        ]
+
+
+class JsonSource(FileSource):
+    """
+    Archivo JSON {"NombreHoja": [registros]} (o con la clave lógica,
+    p. ej. "actas"); cada hoja puede ser una lista de objetos o una lista
+    de filas con el encabezado primero. JSON no se puede leer por partes
+    sin dependencias extra: se carga entero al abrirlo.
+    """
+    label = "JSON"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.path}: se esperaba un objeto {{hoja: filas}}")
+        self._sheets = {
+            SHEET_NAMES.get(name, name).lower(): rows for name, rows in data.items()
+        }
+
+    def _has(self, sheet_name: str) -> bool:
+        return sheet_name.lower() in self._sheets
+
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        rows = self._sheets[sheet_name.lower()]
+        if rows and isinstance(rows[0], list):
+            yield from _records(rows[0], rows[1:])
+        else:
+            yield from (dict(r) for r in rows)
+
+
+class MemorySource(FileSource):
+    """
+    Hojas ya en memoria ({NombreHoja o clave lógica: [registros]}).
+    Sirve de origen falso en pruebas y benchmarks.
+    """
+    label = "memoria"
+
+    def __init__(self, data: Dict[str, List[Dict[str, Any]]]):
+        self._sheets = {SHEET_NAMES.get(name, name): rows for name, rows in data.items()}
+
+    def _has(self, sheet_name: str) -> bool:
+        return sheet_name in self._sheets
+
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        return iter(self._sheets[sheet_name])
+
+
+class DelayedSource(FileSource):
+    """
+    Otro origen con una demora fija al leer cada hoja: simula la latencia
+    de la API de Sheets sin red (benchmark.py --latency, pruebas de
+    --pipeline). La demora no toma el lock de sheet_fetcher, así que
+    varias lecturas pueden esperar a la vez, como descargas reales.
+    """
+    def __init__(self, inner: FileSource, seconds: float):
+        self.inner = inner
+        self.seconds = seconds
+        self.label = f"{inner.label}, +{seconds:g}s por hoja"
+
+    def _has(self, sheet_name: str) -> bool:
+        return self.inner._has(sheet_name)
+
+    def _iter(self, sheet_name: str) -> Iterator[Dict[str, Any]]:
+        time.sleep(self.seconds)
+        return self.inner._iter(sheet_name)
+
+    def sheet_fetcher(self, sheet_names: List[str]) -> Callable[[str], List[Dict[str, Any]]]:
+        fetch = self.inner.sheet_fetcher(sheet_names)
+
+        def delayed(name: str) -> List[Dict[str, Any]]:
+            time.sleep(self.seconds)
+            return fetch(name)
+        return delayed
+
+
+def open_source(spec: Optional[str]) -> Optional[FileSource]:
+    """
+    Interpreta --source. Devuelve None para Google Sheets ('sheets' o
+    vacío) y el origen local correspondiente para file:/dir:.
+    """
+    if not spec or spec == 'sheets':
+        return None
+    kind, sep, target = spec.partition(':')
+    if not sep or not target:
+        raise ValueError(f"Origen no válido: '{spec}' (usa sheets, file:RUTA o dir:RUTA)")
+    if kind == 'dir':
+        return CsvDirSource(target)
+    if kind == 'file':
+        suffix = Path(target).suffix.lower()
+        if suffix in ('.xlsx', '.xlsm'):
+            return ExcelSource(target)
+        if suffix == '.json':
+            return JsonSource(target)
+        if suffix == '.csv':
+            raise ValueError("Un CSV tiene una sola hoja: usa dir:CARPETA con un CSV por hoja")
+        raise ValueError(f"Formato no soportado: '{suffix}' (usa .xlsx o .json)")
+    raise ValueError(f"Origen no válido: '{spec}' (usa sheets, file:RUTA o dir:RUTA)")
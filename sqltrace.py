@@ -0,0 +1,179 @@
+# ============================================
+# sqltrace.py  — NUEVO en v3
+# Traza de sentencias SQL por etapa (--trace-sql).
+# Registra cada sentencia que ejecuta la base durante
+# el comando, la normaliza a su "forma" (literales →
+# ?, listas IN/VALUES colapsadas) y agrupa cantidad y
+# tiempo aproximado por etapa y forma. Marca como
+# posible N+1 los SELECT que se repiten fila a fila,
+# como el de get_id_by_field dentro de un bucle.
+# check_budget() permite fijar un tope de sentencias
+# por etapa; benchmark.py --check-sql-budget lo usa
+# sobre una carga completa sintética.
+# ============================================
+
+import contextlib
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+from database import DatabaseManager
+
+# Un SELECT que se repite al menos esto en una etapa se marca como N+1
+N_PLUS_ONE_MIN = 20
+FUERA_DE_ETAPA = '(fuera de etapa)'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b")
+_NULL_VALUE = re.compile(r"([(,]\s*)NULL\b", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\((?:\?, …|\?)\))(?:\s*,\s*\((?:\?, …|\?)\))+")
+
+
+def normalize(sql: str) -> str:
+    """
+    Forma de una sentencia: el trace callback de sqlite3 entrega el SQL
+    con los parámetros ya expandidos, así que se reemplazan los literales
+    por ? y se colapsan listas (?, ?, ?) y filas de VALUES repetidas.
+    """
+    s = _STRING.sub('?', sql)
+    s = _NUMBER.sub('?', s)
+    s = _NULL_VALUE.sub(r'\1?', s)
+    s = _SPACES.sub(' ', s).strip()
+    s = _LIST.sub('(?, …)', s)
+    s = _ROWS.sub(r'\1, …', s)
+    return s
+
+
+class SqlTracer:
+    """
+    Se activa con `with SqlTracer(db):` y sirve también como medidor
+    para run_import(medir=...), que le indica en qué etapa está.
+    El tiempo de cada sentencia es aproximado: va desde que SQLite la
+    empieza hasta la siguiente sentencia (o el fin de la etapa), e
+    incluye el Python que corre entremedio.
+    """
+    def __init__(self, db_manager: DatabaseManager, n_plus_one_min: int = N_PLUS_ONE_MIN):
+        self.db = db_manager
+        self.n_plus_one_min = n_plus_one_min
+        self.etapa = FUERA_DE_ETAPA
+        self.stats: Dict[str, Dict[str, List[float]]] = defaultdict(dict)   # etapa → forma → [n, seg]
+        self.rows: Dict[str, Optional[int]] = {}
+        self._ultima: Optional[List[float]] = None
+        self._desde = 0.0
+        self._formas: Dict[str, str] = {}
+
+    # ── ACTIVACIÓN ────────────────────────────────────────────────────
+
+    def __enter__(self) -> 'SqlTracer':
+        self.db.add_trace_callback(self._record)
+        return self
+
+    def __exit__(self, *exc):
+        self._cerrar()
+        self.db.remove_trace_callback(self._record)
+
+    def _cerrar(self):
+        if self._ultima is not None:
+            self._ultima[1] += time.perf_counter() - self._desde
+            self._ultima = None
+
+    def _record(self, sql: str):
+        ahora = time.perf_counter()
+        if self._ultima is not None:
+            self._ultima[1] += ahora - self._desde
+        forma = self._formas.get(sql)
+        if forma is None:
+            forma = normalize(sql)
+            if len(self._formas) < 10000:
+                self._formas[sql] = forma
+        entry = self.stats[self.etapa].setdefault(forma, [0, 0.0])
+        entry[0] += 1
+        self._ultima = entry
+        self._desde = ahora
+
+    @contextlib.contextmanager
+    def __call__(self, etapa: str, filas: Optional[int] = None) -> Iterator[None]:
+        anterior = self.etapa
+        self._cerrar()
+        self.etapa = etapa
+        self.rows[etapa] = filas
+        try:
+            yield
+        finally:
+            self._cerrar()
+            self.etapa = anterior
+
+    # ── ANÁLISIS ──────────────────────────────────────────────────────
+
+    def count(self, etapa: Optional[str] = None) -> int:
+        """Sentencias de una etapa (o de todo el comando si etapa es None)."""
+        etapas = [etapa] if etapa is not None else list(self.stats)
+        return sum(int(n) for e in etapas for n, _ in self.stats.get(e, {}).values())
+
+    def n_plus_one(self) -> List[Dict[str, Any]]:
+        """
+        SELECT que se repiten al menos n_plus_one_min veces en una etapa.
+        Los que ya van por lotes (IN (?, …) / VALUES colapsado) no cuentan.
+        """
+        sospechosos = []
+        for etapa, formas in self.stats.items():
+            for forma, (n, seg) in formas.items():
+                if (n >= self.n_plus_one_min and forma.upper().startswith('SELECT')
+                        and '…' not in forma):
+                    sospechosos.append({
+                        'etapa': etapa, 'forma': forma, 'veces': int(n),
+                        'seconds': seg, 'rows': self.rows.get(etapa),
+                    })
+        return sorted(sospechosos, key=lambda s: s['veces'], reverse=True)
+
+    def check_budget(self, budget: Dict[str, float], per_row: bool = False) -> List[str]:
+        """
+        Etapas que superan su tope de sentencias. Con per_row=True el tope
+        es por fila de entrada de la etapa (p. ej. {'actas': 1.2}).
+        Devuelve los excesos como texto; lista vacía si todo está en orden.
+        """
+        excesos = []
+        for etapa, tope in budget.items():
+            n = self.count(etapa)
+            limite = tope * (self.rows.get(etapa) or 0) if per_row else tope
+            if n > limite:
+                excesos.append(f"{etapa}: {n} sentencias SQL (tope {limite:.0f})")
+        return excesos
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.count(),
+            'stages': {
+                etapa: {
+                    'rows': self.rows.get(etapa),
+                    'statements': [
+                        {'forma': forma, 'veces': int(n), 'seconds': round(seg, 6)}
+                        for forma, (n, seg) in sorted(formas.items(), key=lambda i: -i[1][0])
+                    ],
+                }
+                for etapa, formas in self.stats.items()
+            },
+            'n_plus_one': self.n_plus_one(),
+        }
+
+    # ── REPORTE ───────────────────────────────────────────────────────
+
+    def report(self, top: int = 5):
+        if not self.stats:
+            return
+        print(f"\n🧾 Sentencias SQL por etapa ({self.count()} en total, tiempo aproximado):")
+        for etapa, formas in self.stats.items():
+            total = sum(int(n) for n, _ in formas.values())
+            print(f"   ── {etapa}: {total} sentencias, {len(formas)} formas")
+            ranked = sorted(formas.items(), key=lambda i: i[1][0], reverse=True)
+            for forma, (n, seg) in ranked[:top]:
+                texto = forma if len(forma) <= 90 else forma[:87] + '...'
+                print(f"      {int(n):>8} × {seg:>7.3f}s  {texto}")
+        sospechosos = self.n_plus_one()
+        if sospechosos:
+            print(f"\n   🔁 Posibles N+1 (mismo SELECT repetido ≥ {self.n_plus_one_min} veces en una etapa):")
+            for s in sospechosos:
+                filas = f" para {s['rows']} filas" if s['rows'] else ''
+                print(f"      • {s['etapa']}: {s['veces']} ×{filas}  {s['forma'][:90]}")
@@ -0,0 +1,503 @@
+# ============================================
+# staging.py  — NUEVO en v3
+# Motor de importación por conjuntos (--engine staging).
+# Cada hoja se carga tal cual, con un executemany, en
+# una tabla temporal stg_<hoja>; después cada entidad
+# se escribe con un INSERT ... SELECT ... JOIN ...
+# ON CONFLICT DO UPDATE que resuelve las claves
+# foráneas dentro de SQLite. Las filas omitidas y los
+# errores que reportan los convert_* salen de
+# anti-joins (LEFT JOIN ... WHERE padre.id IS NULL).
+#
+# Misma interfaz y mismo resultado que DataConverters:
+#   - la geografía se une por clave normalizada
+#     (función SQL normalizar_clave); los nombres no
+#     únicos se resuelven al id más bajo y los recintos
+#     por su ruta completa, igual que ForeignKeyResolver;
+#     las rutas ambiguas se avisan con
+#     ForeignKeyResolver.warn_ambiguous
+#   - la división de la celda de códigos de actas se
+#     hace en Python (actas.parse_codes) al cargar
+#     stg_actas; los códigos que reclaman varios
+#     operadores se informan igual que en DataConverters
+# ============================================
+
+import sqlite3
+from typing import Iterable, List, Sequence, Tuple
+from actas import ActaLedger, parse_codes
+from converters import DataConverters
+from resolver import ForeignKeyResolver
+from records import RECORD_TYPES, TYPED_FIELDS
+
+# Padres de geografía: se unen por clave normalizada (normalizar_clave)
+# a una tabla de referencia clave → id más bajo, como GeoIndex
+_REFERENCIAS = ('departamento', 'provincia', 'municipio', 'asiento_electoral')
+
+
+class StagingConverters(DataConverters):
+    """
+    convert_<etapa>() por conjuntos: mismas firmas y mensajes que
+    DataConverters, pero cada entidad se escribe con una sentencia SQL.
+    """
+
+    # ── UTILIDADES ────────────────────────────────────────────────────
+
+    def _stage(
+        self, conn: sqlite3.Connection, sheet: str, data: Iterable[tuple],
+    ) -> str:
+        """
+        Carga la hoja en temp.stg_<hoja> (fila, <campos del registro>)
+        con un solo executemany; fila es la posición 1..n en la hoja.
+        """
+        table = f"stg_{sheet}"
+        fields = RECORD_TYPES[sheet]._fields
+        columns = ", ".join(
+            f"{f} {'INTEGER' if (sheet, f) in TYPED_FIELDS else 'TEXT'}" for f in fields
+        )
+        conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        conn.execute(f"CREATE TEMP TABLE {table} (fila INTEGER PRIMARY KEY, {columns})")
+        conn.executemany(
+            f"INSERT INTO temp.{table} VALUES ({', '.join('?' * (len(fields) + 1))})",
+            ((i, *row) for i, row in enumerate(data, 1)),
+        )
+        return table
+
+    def _reference(self, conn: sqlite3.Connection, table: str):
+        """
+        temp.stg_ref_<tabla> (clave PRIMARY KEY, id, n): el id más bajo por
+        clave y cuántas filas la comparten.
+        """
+        ref = f"stg_ref_{table}"
+        conn.execute(f"DROP TABLE IF EXISTS temp.{ref}")
+        conn.execute(
+            f"CREATE TEMP TABLE {ref} (clave TEXT PRIMARY KEY, id INTEGER, n INTEGER) WITHOUT ROWID"
+        )
+        conn.execute(
+            f"INSERT INTO temp.{ref} SELECT clave, MIN(id), COUNT(*) FROM {table} GROUP BY clave"
+        )
+
+    def _recinto_reference(self, conn: sqlite3.Connection):
+        """
+        temp.stg_ref_recinto: (asiento, recinto) por clave → id más bajo, como
+        get_recinto_id, y n = cuántos recintos comparten esa ruta.
+        """
+        conn.execute("DROP TABLE IF EXISTS temp.stg_ref_recinto")
+        conn.execute("""
+            CREATE TEMP TABLE stg_ref_recinto (
+                asiento TEXT, recinto TEXT, id INTEGER, n INTEGER,
+                PRIMARY KEY (asiento, recinto)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            INSERT INTO temp.stg_ref_recinto
+            SELECT ae.clave, r.clave, MIN(r.id), COUNT(*)
+            FROM recinto r JOIN asiento_electoral ae ON ae.id = r.asiento_id
+            GROUP BY ae.clave, r.clave
+        """)
+
+    def _recinto_asientos(self, conn: sqlite3.Connection):
+        """
+        temp.stg_recinto_asiento (fila, asiento_id, n): el asiento de cada
+        fila de stg_recintos por su ruta completa, como
+        ForeignKeyResolver.get_geo_id (las columnas vacías no restringen),
+        y n = cuántos asientos coinciden con esa ruta.
+        """
+        for ddl in (
+            "DROP TABLE IF EXISTS temp.stg_asiento_clave",
+            "DROP TABLE IF EXISTS temp.stg_recinto_asiento",
+            # Los índices de la base pueden estar diferidos (carga completa)
+            """CREATE TEMP TABLE stg_asiento_clave (
+                   clave TEXT, id INTEGER, PRIMARY KEY (clave, id)
+               ) WITHOUT ROWID""",
+            "INSERT INTO temp.stg_asiento_clave SELECT clave, id FROM asiento_electoral",
+            """CREATE TEMP TABLE stg_recinto_asiento (
+                   fila INTEGER PRIMARY KEY, asiento_id INTEGER, n INTEGER
+               )""",
+        ):
+            conn.execute(ddl)
+        conn.execute("""
+            INSERT INTO temp.stg_recinto_asiento
+            SELECT s.fila, MIN(ae.id), COUNT(*)
+            FROM stg_recintos s
+            JOIN temp.stg_asiento_clave k ON k.clave = normalizar_clave(s.asiento_electoral)
+            JOIN asiento_electoral ae ON ae.id = k.id
+            JOIN municipio m          ON m.id = ae.municipio_id
+            JOIN provincia pr         ON pr.id = m.provincia_id
+            JOIN departamento d       ON d.id = pr.departamento_id
+            WHERE s.nombre <> ''
+              AND (normalizar_clave(s.municipio) = ''    OR m.clave  = normalizar_clave(s.municipio))
+              AND (normalizar_clave(s.provincia) = ''    OR pr.clave = normalizar_clave(s.provincia))
+              AND (normalizar_clave(s.departamento) = '' OR d.clave  = normalizar_clave(s.departamento))
+            GROUP BY s.fila
+        """)
+
+    def _upsert_select(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        columns: Sequence[str],
+        conflict: Sequence[str],
+        select: str,
+    ) -> int:
+        """
+        INSERT INTO table (columns) <select> ON CONFLICT(conflict) DO UPDATE.
+        `select` debe traer las columnas en el mismo orden, un WHERE (SQLite
+        lo exige para no leer ON CONFLICT como parte de un JOIN) y un ORDER BY
+        fila para que los ids nuevos salgan en el orden de la hoja (y, ante
+        filas repetidas, gane la última, como con executemany).
+        Devuelve las filas escritas (insertadas o actualizadas).
+        """
+        update = [c for c in columns if c not in conflict]
+        action = (
+            "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in update)
+            if update else "DO NOTHING"
+        )
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) {select} "
+            f"ON CONFLICT({', '.join(conflict)}) {action}"
+        )
+        try:
+            if not update:
+                # DO NOTHING no cuenta las filas que ya existían
+                n = self._count(conn, f"SELECT COUNT(*) FROM ({select})")
+                conn.execute(sql)
+                return n
+            return conn.execute(sql).rowcount
+        except sqlite3.IntegrityError as e:
+            print(f"  ⚠️  Integridad en {table}: {e}")
+            raise
+        except sqlite3.Error as e:
+            print(f"  ⚠️  Error en {table}: {e}")
+            raise
+
+    def _omitidas(
+        self, conn: sqlite3.Connection, sql: str, mensaje: str,
+    ) -> int:
+        """Imprime `mensaje` por cada fila del anti-join; devuelve cuántas hubo."""
+        n = 0
+        for row in conn.execute(sql):
+            print(mensaje.format(*row))
+            n += 1
+        return n
+
+    def _ambiguas(self, conn: sqlite3.Connection, table: str, sql: str):
+        """
+        Avisa las rutas ambiguas con ForeignKeyResolver.warn_ambiguous.
+        `sql` trae, en orden de hoja, la fila, los nombres de la ruta (los
+        que da la hoja, desde arriba), cuántas filas coinciden y el id
+        elegido.
+        """
+        for _, *nombres, n, row_id in conn.execute(sql):
+            self.resolver.warn_ambiguous(
+                table, ForeignKeyResolver._geo_path(table, *nombres), n, row_id
+            )
+
+    def _count(self, conn: sqlite3.Connection, sql: str) -> int:
+        return conn.execute(sql).fetchone()[0]
+
+    # ── ORGANIZACIÓN ──────────────────────────────────────────────────
+
+    def convert_jefes(self, data: Iterable[tuple]):
+        print("👔 Procesando jefes...")
+        with self.db.session() as conn:
+            self._stage(conn, 'jefes', data)
+            n = self._upsert_select(
+                conn, 'jefe', ('nombre', 'cargo', 'celular'), ('nombre',), """
+                    SELECT nombre, cargo, celular FROM stg_jefes
+                    WHERE nombre <> '' ORDER BY fila
+                """)
+        self.resolver.forget('jefe')
+        print(f"   ✅ {n} jefes procesados")
+
+    def convert_coordinadores(self, data: Iterable[tuple]):
+        print("👥 Procesando coordinadores (con grupo)...")
+        with self.db.session() as conn:
+            self._stage(conn, 'coordinadores', data)
+            n = self._upsert_select(
+                conn, 'coordinador',
+                ('ci', 'nombre', 'expedido', 'celular', 'correo', 'cargo',
+                 'nombre_grupo', 'jefe_id'),
+                ('ci',), """
+                    SELECT s.ci, s.nombre, s.expedido, s.celular, s.correo, s.cargo,
+                           s.nombre_grupo, j.id
+                    FROM stg_coordinadores s
+                    LEFT JOIN jefe j ON j.nombre = s.jefe
+                    WHERE s.ci <> '' ORDER BY s.fila
+                """)
+        self.resolver.forget('coordinador')
+        print(f"   ✅ {n} coordinadores procesados")
+
+    # ── GEOGRAFÍA ─────────────────────────────────────────────────────
+
+    def convert_departamentos(self, data: Iterable[tuple]):
+        print("🏛️  Procesando departamentos...")
+        with self.db.session() as conn:
+            self._stage(conn, 'departamentos', data)
+            n = self._upsert_select(
+                conn, 'departamento', ('nombre', 'clave'), ('nombre',), """
+                    SELECT nombre, normalizar_clave(nombre) FROM stg_departamentos
+                    WHERE nombre <> '' ORDER BY fila
+                """)
+        self.resolver.forget('departamento')
+        print(f"   ✅ {n} departamentos procesados")
+
+    def _convert_nivel(
+        self,
+        data: Iterable[tuple],
+        sheet: str,
+        table: str,
+        parent: str,
+        extra: Tuple[str, ...],
+        aviso: str,
+    ) -> Tuple[int, int]:
+        """
+        Provincias, municipios y asientos: UNIQUE(padre_id, nombre) con el
+        padre resuelto por clave en su tabla de referencia.
+        Devuelve (procesadas, omitidas).
+        """
+        parent_id = f"{parent}_id"
+        columns = (parent_id, 'nombre', 'clave') + extra
+        with self.db.session() as conn:
+            stg = self._stage(conn, sheet, data)
+            self._reference(conn, parent)
+            parent_join = f"temp.stg_ref_{parent} p ON p.clave = normalizar_clave(s.{parent})"
+            omitidas = self._omitidas(conn, f"""
+                SELECT s.{parent}, s.nombre FROM {stg} s
+                LEFT JOIN {parent_join}
+                WHERE s.nombre <> '' AND p.id IS NULL ORDER BY s.fila
+            """, aviso)
+            self._ambiguas(conn, parent, f"""
+                SELECT MIN(s.fila) AS primera, s.{parent}, p.n, p.id FROM {stg} s
+                JOIN {parent_join}
+                WHERE s.nombre <> '' AND p.n > 1
+                GROUP BY p.clave ORDER BY primera
+            """)
+            n = self._upsert_select(
+                conn, table, columns, (parent_id, 'nombre'), f"""
+                    SELECT p.id, s.nombre, normalizar_clave(s.nombre)
+                           {''.join(f', s.{c}' for c in extra)}
+                    FROM {stg} s JOIN {parent_join}
+                    WHERE s.nombre <> '' ORDER BY s.fila
+                """)
+        self.resolver.forget(table)
+        return n, omitidas
+
+    def convert_provincias(self, data: Iterable[tuple]):
+        print("🌄 Procesando provincias...")
+        n, skipped = self._convert_nivel(
+            data, 'provincias', 'provincia', 'departamento', ('es_urbano',),
+            "   ⚠️  Departamento '{}' no encontrado → provincia '{}' omitida",
+        )
+        print(f"   ✅ {n} provincias procesadas, {skipped} omitidas")
+
+    def convert_municipios(self, data: Iterable[tuple]):
+        print("🏘️  Procesando municipios...")
+        n, skipped = self._convert_nivel(
+            data, 'municipios', 'municipio', 'provincia', (),
+            "   ⚠️  Provincia '{}' no encontrada → municipio '{}' omitido",
+        )
+        print(f"   ✅ {n} municipios procesados, {skipped} omitidos")
+
+    def convert_asientos_electorales(self, data: Iterable[tuple]):
+        print("🗳️  Procesando asientos electorales...")
+        n, skipped = self._convert_nivel(
+            data, 'asientos_electorales', 'asiento_electoral', 'municipio', (),
+            "   ⚠️  Municipio '{}' no encontrado → asiento '{}' omitido",
+        )
+        print(f"   ✅ {n} asientos procesados, {skipped} omitidos")
+
+    def convert_recintos(self, data: Iterable[tuple]):
+        print("🏫 Procesando recintos...")
+        with self.db.session() as conn:
+            self._stage(conn, 'recintos', data)
+            self._recinto_asientos(conn)
+            skipped = self._omitidas(conn, """
+                SELECT s.asiento_electoral, s.nombre FROM stg_recintos s
+                LEFT JOIN temp.stg_recinto_asiento a ON a.fila = s.fila
+                WHERE s.nombre <> '' AND a.asiento_id IS NULL ORDER BY s.fila
+            """, "   ⚠️  Asiento '{}' no encontrado → recinto '{}' omitido")
+            self._ambiguas(conn, 'asiento_electoral', """
+                SELECT s.fila, s.departamento, s.provincia, s.municipio, s.asiento_electoral,
+                       a.n, a.asiento_id
+                FROM stg_recintos s
+                JOIN temp.stg_recinto_asiento a ON a.fila = s.fila
+                WHERE a.n > 1 ORDER BY s.fila
+            """)
+            # Nuevos vs actualizados: se miran antes del upsert, contra lo que ya había
+            updated = self._count(conn, """
+                SELECT COUNT(*) FROM stg_recintos s
+                JOIN temp.stg_recinto_asiento a ON a.fila = s.fila
+                WHERE EXISTS (
+                    SELECT 1 FROM recinto r
+                    WHERE r.asiento_id = a.asiento_id AND r.clave = normalizar_clave(s.nombre)
+                )
+            """)
+            n = self._upsert_select(
+                conn, 'recinto', ('asiento_id', 'nombre', 'clave', 'direccion', 'distrito'),
+                ('asiento_id', 'nombre'), """
+                    SELECT a.asiento_id, s.nombre, normalizar_clave(s.nombre),
+                           s.direccion, s.distrito
+                    FROM stg_recintos s
+                    JOIN temp.stg_recinto_asiento a ON a.fila = s.fila
+                    WHERE s.nombre <> '' ORDER BY s.fila
+                """)
+        self.resolver.forget('recinto')
+        print(f"   ✅ {n - updated} nuevos, {updated} actualizados, {skipped} omitidos")
+
+    # ── PERSONAS ──────────────────────────────────────────────────────
+
+    def convert_personas(
+        self,
+        operadores_data: Iterable[tuple],
+        notarios_data:   Iterable[tuple],
+    ):
+        print("👷 Procesando personas (operadores + notarios)...")
+        columns = (
+            'tipo', 'nombre', 'ci', 'expedido', 'celular', 'correo', 'cargo',
+            'recinto_id', 'coordinador_id', 'user', 'password',
+        )
+        with self.db.session() as conn:
+            self._recinto_reference(conn)
+            self._stage(conn, 'operadores', operadores_data)
+            self._stage(conn, 'notarios', notarios_data)
+
+            errors = 0
+            for sheet, tipo in (('operadores', 'operador'), ('notarios', 'notario')):
+                errors += self._omitidas(conn, f"""
+                    SELECT s.recinto, s.asiento_electoral, s.ci FROM stg_{sheet} s
+                    LEFT JOIN temp.stg_ref_recinto r
+                      ON r.asiento = normalizar_clave(s.asiento_electoral)
+                     AND r.recinto = normalizar_clave(s.recinto)
+                    WHERE s.ci <> '' AND r.id IS NULL ORDER BY s.fila
+                """, "   ⚠️  Recinto '{}' / '{}' no encontrado (" + tipo + " CI {})")
+                self._ambiguas(conn, 'recinto', f"""
+                    SELECT MIN(s.fila) AS primera, s.asiento_electoral, s.recinto, r.n, r.id
+                    FROM stg_{sheet} s
+                    JOIN temp.stg_ref_recinto r
+                      ON r.asiento = normalizar_clave(s.asiento_electoral)
+                     AND r.recinto = normalizar_clave(s.recinto)
+                    WHERE s.ci <> '' AND r.n > 1
+                    GROUP BY r.asiento, r.recinto ORDER BY primera
+                """)
+
+            operadores = self._upsert_select(conn, 'persona', columns, ('ci',), """
+                SELECT 'operador', s.nombre, s.ci, s.expedido, s.celular, s.correo, s.cargo,
+                       r.id, c.id, NULLIF(s.user, ''), NULLIF(s.password, '')
+                FROM stg_operadores s
+                JOIN temp.stg_ref_recinto r
+                  ON r.asiento = normalizar_clave(s.asiento_electoral)
+                 AND r.recinto = normalizar_clave(s.recinto)
+                LEFT JOIN coordinador c ON c.ci = s.coordinador_ci
+                WHERE s.ci <> '' ORDER BY s.fila
+            """)
+            notarios = self._upsert_select(conn, 'persona', columns, ('ci',), """
+                SELECT 'notario', s.nombre, s.ci, s.expedido, s.celular, s.correo, s.cargo,
+                       r.id, NULL, NULL, NULL
+                FROM stg_notarios s
+                JOIN temp.stg_ref_recinto r
+                  ON r.asiento = normalizar_clave(s.asiento_electoral)
+                 AND r.recinto = normalizar_clave(s.recinto)
+                WHERE s.ci <> '' ORDER BY s.fila
+            """)
+        self.resolver.forget('persona')
+        print(
+            f"   ✅ {operadores} operadores, {notarios} notarios procesados, "
+            f"{errors} errores"
+        )
+
+    # ── ACTAS ─────────────────────────────────────────────────────────
+
+    def _stage_actas(self, conn: sqlite3.Connection, data: Iterable[tuple]) -> int:
+        """
+        stg_actas_fila (fila, operador_ci): filas con operador y códigos;
+        stg_actas (fila, codigo): un registro por código válido.
+        Devuelve los errores que no dependen de la base (sin CI, sin códigos).
+        """
+        for ddl in (
+            "DROP TABLE IF EXISTS temp.stg_actas_fila",
+            "DROP TABLE IF EXISTS temp.stg_actas",
+            "CREATE TEMP TABLE stg_actas_fila (fila INTEGER PRIMARY KEY, operador_ci TEXT)",
+            "CREATE TEMP TABLE stg_actas (fila INTEGER, codigo TEXT)",
+        ):
+            conn.execute(ddl)
+
+        errors = 0
+        filas: List[Tuple[int, str]] = []
+        codigos: List[Tuple[int, str]] = []
+        for i, row in enumerate(data, 1):
+            operador_ci = row.operador_ci
+            if not operador_ci:
+                errors += 1
+                continue
+            if not row.codigos:
+                self._warn_fila(operador_ci, "sin códigos")
+                errors += 1
+                continue
+            filas.append((i, operador_ci))
+            codigos.extend((i, codigo) for codigo in parse_codes(row.codigos))
+            if len(codigos) >= self.chunk_size:
+                self._flush_actas(conn, filas, codigos)
+        self._flush_actas(conn, filas, codigos)
+        return errors
+
+    def _flush_actas(
+        self, conn: sqlite3.Connection,
+        filas: List[Tuple[int, str]], codigos: List[Tuple[int, str]],
+    ):
+        conn.executemany("INSERT INTO temp.stg_actas_fila VALUES (?, ?)", filas)
+        conn.executemany("INSERT INTO temp.stg_actas VALUES (?, ?)", codigos)
+        filas.clear()
+        codigos.clear()
+
+    def convert_actas(self, data: Iterable[tuple]):
+        print("📄 Procesando actas...")
+        with self.db.session() as conn:
+            errors = self._stage_actas(conn, data)
+            errors += self._omitidas(conn, """
+                SELECT f.operador_ci FROM stg_actas_fila f
+                LEFT JOIN persona p ON p.ci = f.operador_ci
+                WHERE p.id IS NULL ORDER BY f.fila
+            """, "   ⚠️  Operador CI '{}' no encontrado")
+            # Códigos con operador existente, en orden de hoja
+            conn.execute("DROP TABLE IF EXISTS temp.stg_actas_ok")
+            conn.execute("""
+                CREATE TEMP TABLE stg_actas_ok (
+                    orden INTEGER PRIMARY KEY, fila INTEGER, codigo TEXT,
+                    persona_id INTEGER, operador_ci TEXT
+                )
+            """)
+            conn.execute("""
+                INSERT INTO temp.stg_actas_ok
+                SELECT a.rowid, a.fila, a.codigo, p.id, f.operador_ci
+                FROM stg_actas a
+                JOIN stg_actas_fila f ON f.fila = a.fila
+                JOIN persona p ON p.ci = f.operador_ci
+                ORDER BY a.rowid
+            """)
+            total, distintos, asignaciones_ok = conn.execute("""
+                SELECT COUNT(*), COUNT(DISTINCT codigo), COUNT(DISTINCT fila) FROM stg_actas_ok
+            """).fetchone()
+            # Reclamos de los códigos con más de un operador, en orden de hoja
+            disputas = ActaLedger()
+            for codigo, persona_id, operador_ci in conn.execute("""
+                SELECT codigo, persona_id, operador_ci FROM stg_actas_ok
+                WHERE codigo IN (
+                    SELECT codigo FROM stg_actas_ok
+                    GROUP BY codigo HAVING COUNT(DISTINCT persona_id) > 1
+                )
+                ORDER BY orden
+            """):
+                disputas.claim(codigo, persona_id, operador_ci)
+            # Cada código una vez, con su último operador, en el orden de su
+            # primera aparición (mismos ids que DataConverters)
+            self._upsert_select(conn, 'acta', ('codigo', 'persona_id'), ('codigo',), """
+                SELECT ok.codigo, ok.persona_id
+                FROM (
+                    SELECT MIN(orden) AS primera, MAX(orden) AS ultima
+                    FROM stg_actas_ok GROUP BY codigo
+                ) u
+                JOIN stg_actas_ok ok ON ok.orden = u.ultima
+                WHERE true ORDER BY u.primera
+            """)
+        self._report_actas(distintos, total - distintos, asignaciones_ok, errors)
+        disputas.report()
@@ -3,15 +3,27 @@
 # Valida los datos de Google Sheets ANTES de
 # tocar la base de datos. Muestra un reporte
 # claro de errores y advertencias.
+# Cambios v3:
+#   - una sola pasada por hoja: cada validate_* guarda lo que necesita
+#     validate_cross (CIs y referencias), así las hojas pueden llegar
+#     como iteradores en streaming y no hace falta tenerlas en memoria
+#   - recibe registros ya normalizados (records.py) en vez de dicts:
+#     los campos llegan limpios y se leen como atributos
 # ============================================
 
-from typing import Dict, List, Any, Tuple
+from typing import List, Tuple, Iterable, Set
 
 
 class DataValidator:
     def __init__(self):
         self.errors:   List[str] = []
         self.warnings: List[str] = []
+        # Estado para validate_cross (solo claves, no filas completas)
+        self._coord_cis:   Set[str] = set()
+        self._op_cis:      Set[str] = set()
+        self._notario_cis: Set[str] = set()
+        self._op_coord_refs: List[Tuple[str, str]] = []   # (ci, coordinador_ci)
+        self._acta_cis:      List[str] = []                # operador_ci por fila
 
     def _err(self, msg: str):
         self.errors.append(msg)
@@ -19,16 +31,12 @@ class DataValidator:
     def _warn(self, msg: str):
         self.warnings.append(msg)
 
-    def _str(self, row: Dict, key: str) -> str:
-        v = row.get(key, '')
-        return str(v).strip() if v is not None else ''
-
     # ── VALIDACIONES POR HOJA ────────────────────────────────────────
 
-    def validate_jefes(self, data: List[Dict]) -> bool:
+    def validate_jefes(self, data: Iterable[tuple]) -> bool:
         nombres = set()
         for i, row in enumerate(data, 1):
-            nombre = self._str(row, 'nombre')
+            nombre = row.nombre
             if not nombre:
                 self._err(f"Jefes fila {i}: 'nombre' vacío")
                 continue
@@ -37,11 +45,11 @@ class DataValidator:
             nombres.add(nombre)
         return True
 
-    def validate_coordinadores(self, data: List[Dict]) -> bool:
-        cis = set()
+    def validate_coordinadores(self, data: Iterable[tuple]) -> bool:
+        cis = self._coord_cis
         for i, row in enumerate(data, 1):
-            ci     = self._str(row, 'ci')
-            nombre = self._str(row, 'nombre')
+            ci     = row.ci
+            nombre = row.nombre
             if not ci:
                 self._err(f"Coordinadores fila {i}: 'ci' vacío (nombre: '{nombre}')")
                 continue
@@ -50,67 +58,70 @@ class DataValidator:
             cis.add(ci)
             if not nombre:
                 self._warn(f"Coordinadores CI {ci}: 'nombre' vacío")
-            if not self._str(row, 'nombre_grupo'):
+            if not row.nombre_grupo:
                 self._warn(f"Coordinadores CI {ci}: 'nombre_grupo' vacío (sin grupo asignado)")
         return True
 
-    def validate_operadores(self, data: List[Dict]) -> bool:
-        cis  = set()
+    def validate_operadores(self, data: Iterable[tuple]) -> bool:
+        cis  = self._op_cis
         for i, row in enumerate(data, 1):
-            ci     = self._str(row, 'ci')
-            nombre = self._str(row, 'nombre')
+            ci     = row.ci
+            nombre = row.nombre
             if not ci:
                 self._err(f"Operadores fila {i}: 'ci' vacío (nombre: '{nombre}')")
                 continue
             if ci in cis:
                 self._err(f"Operadores: CI duplicado '{ci}' (fila {i})")
             cis.add(ci)
-            if not self._str(row, 'recinto'):
+            if not row.recinto:
                 self._err(f"Operadores CI {ci}: 'recinto' vacío")
-            if not self._str(row, 'asiento_electoral'):
+            if not row.asiento_electoral:
                 self._err(f"Operadores CI {ci}: 'asiento_electoral' vacío")
-            if not self._str(row, 'coordinador_ci'):
+            coord_ci = row.coordinador_ci
+            if coord_ci:
+                self._op_coord_refs.append((ci, coord_ci))
+            else:
                 self._warn(f"Operadores CI {ci}: 'coordinador_ci' vacío (sin grupo asignado)")
 
             # Si tiene user pero no password (o viceversa) es sospechoso
-            user     = self._str(row, 'user')
-            password = self._str(row, 'password')
+            user     = row.user
+            password = row.password
             if bool(user) != bool(password):
                 self._warn(f"Operadores CI {ci}: tiene user sin password (o viceversa)")
         return True
 
-    def validate_notarios(self, data: List[Dict]) -> bool:
-        cis = set()
+    def validate_notarios(self, data: Iterable[tuple]) -> bool:
+        cis = self._notario_cis
         for i, row in enumerate(data, 1):
-            ci = self._str(row, 'ci')
+            ci = row.ci
             if not ci:
                 self._err(f"Notarios fila {i}: 'ci' vacío")
                 continue
             if ci in cis:
                 self._err(f"Notarios: CI duplicado '{ci}' (fila {i})")
             cis.add(ci)
-            if not self._str(row, 'recinto'):
+            if not row.recinto:
                 self._err(f"Notarios CI {ci}: 'recinto' vacío")
 
-    def validate_actas(self, data: List[Dict]) -> bool:
+    def validate_actas(self, data: Iterable[tuple]) -> bool:
         for i, row in enumerate(data, 1):
-            if not self._str(row, 'operador_ci'):
+            ci = row.operador_ci
+            if ci:
+                self._acta_cis.append(ci)
+            else:
                 self._err(f"Actas fila {i}: 'operador_ci' vacío")
-            if not self._str(row, 'codigos'):
+            if not row.codigos:
                 self._warn(f"Actas fila {i}: 'codigos' vacío")
         return True
 
-    def validate_cross(
-        self,
-        operadores: List[Dict],
-        notarios:   List[Dict],
-        coordinadores: List[Dict],
-        actas:      List[Dict],
-    ):
-        """Validaciones cruzadas entre hojas."""
-        coord_cis  = {self._str(r, 'ci') for r in coordinadores if self._str(r, 'ci')}
-        op_cis     = {self._str(r, 'ci') for r in operadores    if self._str(r, 'ci')}
-        notario_cis = {self._str(r, 'ci') for r in notarios     if self._str(r, 'ci')}
+    def validate_cross(self):
+        """
+        Validaciones cruzadas entre hojas.
+        Usa lo recogido por los validate_* anteriores (se llama al final).
+        """
+        coord_cis   = self._coord_cis
+        op_cis      = self._op_cis
+        notario_cis = self._notario_cis
 
         # CI en operadores Y notarios al mismo tiempo
         duplicados = op_cis & notario_cis
@@ -118,17 +129,15 @@ class DataValidator:
             self._err(f"CI '{ci}' aparece como operador Y notario")
 
         # Actas que referencian CIs inexistentes
-        for row in actas:
-            ci = self._str(row, 'operador_ci')
-            if ci and ci not in op_cis:
+        for ci in self._acta_cis:
+            if ci not in op_cis:
                 self._err(f"Actas: operador_ci '{ci}' no existe en hoja Operadores")
 
         # Operadores que referencian coordinadores inexistentes
-        for row in operadores:
-            coord_ci = self._str(row, 'coordinador_ci')
-            if coord_ci and coord_ci not in coord_cis:
+        for ci, coord_ci in self._op_coord_refs:
+            if coord_ci not in coord_cis:
                 self._warn(
-                    f"Operadores CI {self._str(row, 'ci')}: "
+                    f"Operadores CI {ci}: "
                     f"coordinador_ci '{coord_ci}' no existe en hoja Coordinadores"
                 )
 
@@ -167,14 +176,14 @@ class DataValidator:
 
 
 def run_validation(
-    jefes_data:        List[Dict],
-    coordinadores_data: List[Dict],
-    operadores_data:   List[Dict],
-    notarios_data:     List[Dict],
-    actas_data:        List[Dict],
+    jefes_data:        Iterable[tuple],
+    coordinadores_data: Iterable[tuple],
+    operadores_data:   Iterable[tuple],
+    notarios_data:     Iterable[tuple],
+    actas_data:        Iterable[tuple],
 ) -> bool:
     """
-    Ejecuta todas las validaciones.
+    Ejecuta todas las validaciones (una sola pasada por hoja).
     Retorna True si se puede continuar (0 errores).
     """
     print("🔍 Validando datos antes de importar...")
@@ -185,7 +194,7 @@ def run_validation(
     v.validate_operadores(operadores_data)
     v.validate_notarios(notarios_data)
     v.validate_actas(actas_data)
-    v.validate_cross(operadores_data, notarios_data, coordinadores_data, actas_data)
+    v.validate_cross()
 
     can_proceed, n_err, n_warn = v.report()
     return can_proceed
\ No newline at end of file